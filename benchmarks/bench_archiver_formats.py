@@ -0,0 +1,65 @@
+"""
+Compare decoding the archiver's JSON and PB/raw range responses.
+
+Uses the synthetic payloads in tests/datasets/archiver (regenerate them with
+make_payloads.py there), repeated to a realistic size. Run from the
+repository root:
+
+    python benchmarks/bench_archiver_formats.py
+"""
+
+import argparse
+import json
+import os
+import timeit
+
+from lcls_tools.common.data.archiver import (
+    ColumnarArchiveDataHandler,
+    _decode_raw_response,
+)
+
+DATA_LOCATION = os.path.join("tests", "datasets", "archiver")
+PAYLOADS = ["scalar_double", "scalar_enum", "scalar_string", "waveform_double"]
+
+
+def load(name, repeat):
+    with open(os.path.join(DATA_LOCATION, name + ".raw"), "rb") as raw_file:
+        raw = raw_file.read()
+    with open(os.path.join(DATA_LOCATION, name + ".json"), "r") as json_file:
+        element = json.load(json_file)[0]
+    # raw chunks can simply be appended; JSON gets the same samples repeated
+    element["data"] = element["data"] * repeat
+    return b"\n".join([raw] * repeat), json.dumps([element])
+
+
+def decode_json(text):
+    return [
+        ColumnarArchiveDataHandler.from_records(e["data"], meta=e["meta"])
+        for e in json.loads(text)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--number", type=int, default=5)
+    args = parser.parse_args()
+
+    print(
+        f"{'payload':<16}{'samples':>9}{'json MB':>9}{'raw MB':>8}"
+        f"{'json ms':>10}{'raw ms':>9}{'speedup':>9}"
+    )
+    for name in PAYLOADS:
+        raw, text = load(name, args.repeat)
+        samples = len(_decode_raw_response(raw))
+        json_s = timeit.timeit(lambda: decode_json(text), number=args.number)
+        raw_s = timeit.timeit(lambda: _decode_raw_response(raw), number=args.number)
+        print(
+            f"{name:<16}{samples:>9}{len(text) / 1e6:>9.2f}{len(raw) / 1e6:>8.2f}"
+            f"{json_s / args.number * 1e3:>10.1f}{raw_s / args.number * 1e3:>9.1f}"
+            f"{json_s / raw_s:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
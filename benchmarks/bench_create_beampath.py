@@ -0,0 +1,62 @@
+"""
+Time building the largest beampaths, eagerly and with lazy=True.
+
+PVs are created and magnet ctrl enum strings read on first use, so building
+a beampath does no channel access at all. All of the time goes into
+validating devices, pure pydantic work under the GIL: a thread pool ran at
+0.4-1.5x of serial, and areas cannot be built in a process pool because the
+models do not pickle. Run from the repository root:
+
+    python benchmarks/bench_create_beampath.py
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import time
+
+from lcls_tools.common.devices.index import get_device_index
+from lcls_tools.common.devices.reader import (
+    DEFAULT_YAML_LOCATION,
+    _flatten,
+    create_beampath,
+)
+
+
+def largest_beampaths(count):
+    definitions = get_device_index().load(
+        os.path.join(DEFAULT_YAML_LOCATION, "beampaths.yaml")
+    )
+    sizes = {
+        name: len(_flatten(areas))
+        for name, areas in definitions.items()
+        if isinstance(areas, list)
+    }
+    return sorted(sizes, key=sizes.get, reverse=True)[:count]
+
+
+def build(beampath, lazy):
+    # create_beampath prints every area it could not create
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = create_beampath(beampath, lazy=lazy)
+        return time.perf_counter() - start, len(result.area_names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--beampaths", nargs="*", default=None)
+    args = parser.parse_args()
+    beampaths = args.beampaths or largest_beampaths(3)
+    # parse every YAML file up front so only construction is timed
+    get_device_index().compile()
+    print(f"{'beampath':<12}{'areas':>6}{'eager s':>9}{'lazy s':>9}")
+    for beampath in beampaths:
+        eager, areas = build(beampath, lazy=False)
+        lazy, _ = build(beampath, lazy=True)
+        print(f"{beampath:<12}{areas:>6}{eager:>9.3f}{lazy:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Compare writing screen images to HDF5 one dataset per image and streamed.
+
+"per image" is how Screen.save_images used to work: keep every capture in a
+list, then write one dataset per image with all metadata on each. The
+others stream frames through ImageHDF5Writer into one chunked dataset, with
+and without compression. Frames are noisy Gaussian spots like a camera's.
+Peak memory is what tracemalloc sees during a second, untimed run. Run from
+the repository root:
+
+    python benchmarks/bench_screen_hdf5.py --frames 200 --shape 1024 1024
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import h5py
+import numpy as np
+
+from lcls_tools.common.devices.screen import ImageHDF5Writer
+
+METADATA = {"area": "BC1", "beam_path": ["CU_HXR", "CU_SXR"], "sum_l_meters": 1.0}
+
+
+def make_frames(shape, n_unique, seed=0):
+    rng = np.random.default_rng(seed)
+    axes = [np.arange(size) - size / 2 for size in shape]
+    beam = np.outer(*[np.exp(-0.5 * (axis / (len(axis) / 10)) ** 2) for axis in axes])
+    return [
+        np.clip(3000 * beam + rng.normal(40, 10, shape), 0, 4095).astype(np.uint16)
+        for _ in range(n_unique)
+    ]
+
+
+def write_per_image(filename, frames, n):
+    captures = [frames[i % len(frames)].copy() for i in range(n)]
+    with h5py.File(filename, "a") as f:
+        for i, image in enumerate(captures):
+            dataset = f.create_dataset(str(i), data=image, dtype=np.ushort)
+            dataset.attrs.update(METADATA)
+
+
+def write_streamed(filename, frames, n, compression):
+    with ImageHDF5Writer(
+        filename, frames[0].shape, attrs=METADATA, compression=compression
+    ) as writer:
+        for i in range(n):
+            writer.append(frames[i % len(frames)], timestamp=float(i), pulse_id=i)
+
+
+def measure(function, directory, label):
+    # time without tracemalloc, it slows down allocations
+    filename = os.path.join(directory, label.replace(" ", "_") + ".h5")
+    start = time.perf_counter()
+    function(filename)
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(filename)
+    os.remove(filename)
+    tracemalloc.start()
+    function(filename)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--shape", type=int, nargs=2, default=[1024, 1024])
+    args = parser.parse_args()
+    frames = make_frames(tuple(args.shape), n_unique=10)
+    raw_mb = args.frames * frames[0].nbytes / 1e6
+    writers = {
+        "per image": lambda name: write_per_image(name, frames, args.frames),
+        "streamed": lambda name: write_streamed(name, frames, args.frames, None),
+        "streamed lzf": lambda name: write_streamed(name, frames, args.frames, "lzf"),
+        "streamed gzip": lambda name: write_streamed(name, frames, args.frames, "gzip"),
+    }
+    print(f"{args.frames} frames of {'x'.join(map(str, args.shape))}, {raw_mb:.0f} MB")
+    print(f"{'writer':<16}{'MB/s':>9}{'file MB':>9}{'peak MB':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for label, write in writers.items():
+            elapsed, peak, size = measure(write, directory, label)
+            print(
+                f"{label:<16}{raw_mb / elapsed:>9.0f}{size / 1e6:>9.1f}"
+                f"{peak / 1e6:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Time device operations against the simulated EPICS backend.
+
+Everything runs in-process on a SimulatedIOC, so the numbers show what the
+device layer costs for a given CA latency, without the control system:
+reading BACT of every magnet of an area, setting them one by one and all
+at once, and reading screen images. Run from the repository root:
+
+    python benchmarks/bench_simulated_devices.py --latency 0.002 --jitter 0.001
+"""
+
+import argparse
+import time
+
+from lcls_tools.common.controls.pyepics.simulation import SimulatedIOC
+from lcls_tools.common.devices.reader import create_magnet, create_screen
+
+
+def timed(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--area", default="DIAG0")
+    parser.add_argument("--latency", type=float, default=0.002)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--update-rate", type=float, default=120.0)
+    parser.add_argument("--time-constant", type=float, default=0.05)
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--shape", type=int, nargs=2, default=[1024, 1024])
+    args = parser.parse_args()
+    ioc = SimulatedIOC(
+        latency=args.latency,
+        jitter=args.jitter,
+        update_rate=args.update_rate,
+        waveform_shape=tuple(args.shape),
+        magnet_time_constant=args.time_constant,
+        seed=0,
+    )
+    with ioc.installed():
+        magnets = create_magnet(area=args.area)
+        names = magnets.device_names
+        print(
+            f"{len(names)} magnets in {args.area}, {args.latency * 1e3:.1f} ms latency"
+        )
+        elapsed = timed(lambda: [magnet.bact for magnet in magnets.magnets.values()])
+        print(f"{'read BACT one by one':<32}{elapsed:>8.3f} s")
+        for step, concurrent in enumerate([False, True], start=1):
+            settings = {name: 0.1 * step for name in names}
+            if concurrent:
+                elapsed = timed(lambda: magnets.set_bdes(settings, concurrent=True))
+            else:
+                elapsed = timed(
+                    lambda: [
+                        magnets.magnets[name].set_bdes_with_validation(value)
+                        for name, value in settings.items()
+                    ]
+                )
+            label = "set_bdes concurrent" if concurrent else "set_bdes one by one"
+            print(f"{label:<32}{elapsed:>8.3f} s")
+        screens = create_screen(area=args.area)
+        if not screens or not screens.screens:
+            return
+        screen = next(iter(screens.screens.values()))
+        elapsed = timed(lambda: [screen.image for _ in range(args.frames)])
+        print(
+            f"{'Screen.image ' + 'x'.join(map(str, args.shape)):<32}"
+            f"{args.frames / elapsed:>8.1f} frames/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,548 @@
+"""
+In-process simulated EPICS backend.
+
+SimulatedIOC serves PVs from memory, so devices can be exercised at
+realistic load without the control system:
+
+    ioc = SimulatedIOC(latency=0.002, jitter=0.001, update_rate=10)
+    with ioc.installed():
+        magnets = create_magnet(area="GUNB")
+        magnets.set_bdes({"SOL1B": 0.1}, concurrent=True)
+
+installed() makes it the PV factory of lcls_tools.common.devices.device,
+so device PVs created from then on are SimulatedPVs. What a PV does is
+decided by the end of its name:
+
+- magnets (BDES, BACT, BCTRL, CTRL, ...): BACT settles on BDES as a
+  first-order system after a TRIM or PERTURB on CTRL, or a write to BCTRL
+- screens (Image:ArrayData or IMAGE, ArraySize0_RBV or N_OF_ROW, ...): a
+  new Gaussian beam image every 1 / update_rate seconds, of waveform_shape
+- everything else holds whatever was last written to it, 0.0 at first
+
+Every get and put takes latency plus up to jitter seconds, and fails
+(returns None) with probability failure_rate. disconnect() makes single
+PVs unreachable. Monitor callbacks of changing PVs run on a thread of the
+IOC at update_rate.
+"""
+
+import contextlib
+import math
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+from epics import PV as EPICS_PV
+
+MAGNET_CTRL_STATES = (
+    "Ready",
+    "TRIM",
+    "PERTURB",
+    "BCON_TO_BDES",
+    "SAVE_BDES",
+    "LOAD_BDES",
+    "UNDO_BDES",
+    "DAC_ZERO",
+    "CALIB",
+    "STDZ",
+    "RESET",
+    "TURN_OFF",
+    "TURN_ON",
+    "DEGAUSS",
+)
+ORIENTATIONS = ("Positive", "Negative")
+
+
+class _Record:
+    """A simulated PV's value; subclasses compute values that change"""
+
+    def __init__(self, value: Any = 0.0, enum_strs: Optional[Tuple[str, ...]] = None):
+        self.value = value
+        self.enum_strs = enum_strs
+        self.timestamp = time.time()
+
+    def read(self, now: float) -> Any:
+        return self.value
+
+    def write(self, value: Any, now: float) -> None:
+        if self.enum_strs and isinstance(value, str):
+            value = self.enum_strs.index(value)
+        self.value = value
+        self.timestamp = time.time()
+
+    def changed(self, now: float) -> bool:
+        """Whether monitors should fire on this tick"""
+        return False
+
+
+class _Magnet:
+    """BACT follows BDES as a first-order system once trimmed"""
+
+    def __init__(self, time_constant: float, bdes: float = 0.0):
+        self.time_constant = time_constant
+        self.bdes = bdes
+        self.start = bdes
+        self.target = bdes
+        self.trimmed_at = 0.0
+        self.last_bact = bdes
+
+    def bact(self, now: float) -> float:
+        elapsed = max(now - self.trimmed_at, 0.0)
+        decay = math.exp(-elapsed / self.time_constant) if self.time_constant else 0.0
+        return self.target + (self.start - self.target) * decay
+
+    def trim(self, now: float) -> None:
+        self.start = self.bact(now)
+        self.target = self.bdes
+        self.trimmed_at = now
+
+
+class _BDESRecord(_Record):
+    def __init__(self, magnet: _Magnet):
+        super().__init__(magnet.bdes)
+        self.magnet = magnet
+
+    def read(self, now: float) -> float:
+        return self.magnet.bdes
+
+    def write(self, value: float, now: float) -> None:
+        super().write(value, now)
+        self.magnet.bdes = value
+
+
+class _BCTRLRecord(_BDESRecord):
+    def write(self, value: float, now: float) -> None:
+        super().write(value, now)
+        self.magnet.trim(now)
+
+
+class _BACTRecord(_Record):
+    def __init__(self, magnet: _Magnet):
+        super().__init__(magnet.bdes)
+        self.magnet = magnet
+
+    def read(self, now: float) -> float:
+        return self.magnet.bact(now)
+
+    def write(self, value: float, now: float) -> None:
+        pass
+
+    def changed(self, now: float) -> bool:
+        bact = self.magnet.bact(now)
+        if abs(bact - self.magnet.last_bact) < 1e-9:
+            return False
+        self.magnet.last_bact = bact
+        self.timestamp = time.time()
+        return True
+
+
+class _CTRLRecord(_Record):
+    def __init__(self, magnet: _Magnet):
+        super().__init__(0, MAGNET_CTRL_STATES)
+        self.magnet = magnet
+
+    def write(self, value: Any, now: float) -> None:
+        if isinstance(value, str):
+            value = self.enum_strs.index(value)
+        if self.enum_strs[int(value)] in ("TRIM", "PERTURB"):
+            self.magnet.trim(now)
+        # the command is done right away, so the magnet is Ready again
+        self.timestamp = time.time()
+
+
+class _ImageRecord(_Record):
+    """A new frame of a Gaussian beam every 1 / update_rate seconds"""
+
+    def __init__(
+        self,
+        shape: Tuple[int, int],
+        update_rate: float,
+        n_bits: int,
+        rng: np.random.Generator,
+    ):
+        super().__init__(None)
+        self.shape = shape
+        self.update_rate = update_rate
+        self.max_count = 2**n_bits - 1
+        self.rng = rng
+        self.created_at = time.monotonic()
+        self.frame_number = -1
+        self.frame = None
+        self._axes = [np.arange(size, dtype=float) for size in shape]
+        self._lock = threading.Lock()
+
+    def _frame_number(self, now: float) -> int:
+        return int((now - self.created_at) * self.update_rate)
+
+    def _make_frame(self) -> np.ndarray:
+        profiles = []
+        for axis, size in zip(self._axes, self.shape):
+            center = size / 2 + self.rng.normal(0, size / 100)
+            sigma = size / 10 * (1 + self.rng.normal(0, 0.02))
+            profiles.append(np.exp(-0.5 * ((axis - center) / sigma) ** 2))
+        beam = np.outer(profiles[0], profiles[1]) * 0.8 * self.max_count
+        noise = self.rng.normal(0, 0.01 * self.max_count, self.shape)
+        frame = np.clip(beam + noise, 0, self.max_count).astype(np.uint16)
+        return frame.ravel()
+
+    def read(self, now: float) -> np.ndarray:
+        with self._lock:
+            frame_number = self._frame_number(now)
+            if frame_number != self.frame_number:
+                self.frame = self._make_frame()
+                self.frame_number = frame_number
+                self.timestamp = time.time()
+            return self.frame.copy()
+
+    def changed(self, now: float) -> bool:
+        return self._frame_number(now) != self.frame_number
+
+
+class SimulatedIOC:
+    """
+    In-memory PVs for SimulatedPV, see the module docstring.
+
+    :param latency: seconds every get and put takes
+    :param jitter: up to this many seconds more, uniformly distributed
+    :param update_rate: Hz of new images and of monitor callbacks
+    :param waveform_shape: (columns, rows) of screen images
+    :param failure_rate: probability that a get or put fails
+    :param magnet_time_constant: seconds for BACT to get 63% of the way
+    :param seed: for reproducible images, jitter and failures
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        update_rate: float = 10.0,
+        waveform_shape: Tuple[int, int] = (640, 480),
+        failure_rate: float = 0.0,
+        magnet_time_constant: float = 0.2,
+        n_bits: int = 12,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.update_rate = update_rate
+        self.waveform_shape = waveform_shape
+        self.failure_rate = failure_rate
+        self.magnet_time_constant = magnet_time_constant
+        self.n_bits = n_bits
+        self._random = random.Random(seed)
+        self._rng = np.random.default_rng(seed)
+        self._records: Dict[str, _Record] = {}
+        self._magnets: Dict[str, _Magnet] = {}
+        self._disconnected = set()
+        self._subscribers: Dict[str, list] = {}
+        self._lock = threading.RLock()
+        self._ticker: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.gets = 0
+        self.puts = 0
+
+    def _magnet(self, base: str) -> _Magnet:
+        if base not in self._magnets:
+            self._magnets[base] = _Magnet(self.magnet_time_constant)
+        return self._magnets[base]
+
+    def _make_record(self, pvname: str) -> _Record:
+        base, _, field = pvname.rpartition(":")
+        if field == "BDES":
+            return _BDESRecord(self._magnet(base))
+        if field == "BCTRL":
+            return _BCTRLRecord(self._magnet(base))
+        if field == "BACT":
+            return _BACTRecord(self._magnet(base))
+        if field == "CTRL":
+            return _CTRLRecord(self._magnet(base))
+        if field == "BMAX":
+            return _Record(100.0)
+        if field == "BMIN":
+            return _Record(-100.0)
+        if pvname.endswith("Image:ArrayData") or field == "IMAGE":
+            return _ImageRecord(
+                self.waveform_shape, self.update_rate, self.n_bits, self._rng
+            )
+        if pvname.endswith("ArraySize1_RBV") or field == "N_OF_COL":
+            return _Record(self.waveform_shape[0])
+        if pvname.endswith("ArraySize0_RBV") or field == "N_OF_ROW":
+            return _Record(self.waveform_shape[1])
+        if field == "N_OF_BITS":
+            return _Record(self.n_bits)
+        if field == "RESOLUTION":
+            return _Record(10.0)
+        if field in ("X_ORIENT", "Y_ORIENT"):
+            return _Record(0, ORIENTATIONS)
+        if field == "SYS_TYPE":
+            return _Record("LinuxRT")
+        if field in ("ArrayRate_RBV", "FRAME_RATE"):
+            return _Record(float(self.update_rate))
+        return _Record(0.0)
+
+    def record(self, pvname: str) -> _Record:
+        with self._lock:
+            if pvname not in self._records:
+                self._records[pvname] = self._make_record(pvname)
+            return self._records[pvname]
+
+    def set(self, pvname: str, value: Any) -> None:
+        """Set a PV's value directly, without latency or failures"""
+        self.record(pvname).write(value, time.monotonic())
+        self._notify(pvname)
+
+    def disconnect(self, pvname: str) -> None:
+        """Make pvname unreachable until reconnect() is called"""
+        self._disconnected.add(pvname)
+
+    def reconnect(self, pvname: str) -> None:
+        self._disconnected.discard(pvname)
+
+    def is_connected(self, pvname: str) -> bool:
+        return pvname not in self._disconnected
+
+    def _delay(self) -> None:
+        delay = self.latency + self._random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _fails(self) -> bool:
+        return self.failure_rate > 0 and self._random.random() < self.failure_rate
+
+    def get(self, pvname: str) -> Optional[Any]:
+        self._delay()
+        self.gets += 1
+        if not self.is_connected(pvname) or self._fails():
+            return None
+        return self.record(pvname).read(time.monotonic())
+
+    def put(self, pvname: str, value: Any) -> bool:
+        self._delay()
+        self.puts += 1
+        if not self.is_connected(pvname) or self._fails():
+            return False
+        self.record(pvname).write(value, time.monotonic())
+        self._notify(pvname)
+        return True
+
+    def subscribe(self, pv: "SimulatedPV") -> None:
+        """Run pv's callbacks whenever its value changes"""
+        with self._lock:
+            subscribers = self._subscribers.setdefault(pv.pvname, [])
+            if pv not in subscribers:
+                subscribers.append(pv)
+            if self._ticker is None and self.update_rate > 0:
+                self._stop.clear()
+                self._ticker = threading.Thread(target=self._tick, daemon=True)
+                self._ticker.start()
+
+    def _notify(self, pvname: str) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(pvname, ()))
+        for pv in subscribers:
+            pv.run_callbacks()
+
+    def _tick(self) -> None:
+        while not self._stop.wait(1 / self.update_rate):
+            now = time.monotonic()
+            with self._lock:
+                changed = [
+                    pvname
+                    for pvname in self._subscribers
+                    if pvname not in self._disconnected
+                    and self.record(pvname).changed(now)
+                ]
+            for pvname in changed:
+                self._notify(pvname)
+
+    def stop(self) -> None:
+        """Stop running monitor callbacks"""
+        self._stop.set()
+        if self._ticker is not None:
+            self._ticker.join()
+            self._ticker = None
+
+    def pv(self, pvname: str, **kwargs) -> "SimulatedPV":
+        """PV factory, takes (and ignores) the keyword arguments of epics.PV"""
+        return SimulatedPV(pvname, self)
+
+    @contextlib.contextmanager
+    def installed(self) -> Iterator["SimulatedIOC"]:
+        """
+        Create device PVs on this IOC while in the block. PVs that devices
+        have already used stay as they are.
+        """
+        from lcls_tools.common.devices.device import set_pv_factory
+
+        previous = set_pv_factory(self.pv)
+        try:
+            yield self
+        finally:
+            set_pv_factory(previous)
+            self.stop()
+
+
+class SimulatedPV(EPICS_PV):
+    """
+    The parts of epics.PV that devices use, served by a SimulatedIOC.
+    It is an instance of epics.PV so type checks keep working.
+    """
+
+    def __init__(self, pvname: str, ioc: SimulatedIOC):
+        self.pvname = pvname
+        self.ioc = ioc
+        self.callbacks: Dict[int, Tuple[Callable, dict]] = {}
+        self._put_complete = True
+        self._last_value = None
+
+    def __repr__(self):
+        return f"<SimulatedPV '{self.pvname}'>"
+
+    def __del__(self):
+        pass
+
+    @property
+    def connected(self) -> bool:
+        return self.ioc.is_connected(self.pvname)
+
+    @property
+    def auto_monitor(self) -> bool:
+        return True
+
+    def connect(self, timeout: Optional[float] = None) -> bool:
+        return self.wait_for_connection(timeout)
+
+    def wait_for_connection(self, timeout: Optional[float] = None) -> bool:
+        if not self.connected and timeout:
+            time.sleep(timeout)
+        return self.connected
+
+    def disconnect(self, deep: bool = False) -> None:
+        self.callbacks = {}
+
+    @property
+    def enum_strs(self) -> Optional[Tuple[str, ...]]:
+        return self.ioc.record(self.pvname).enum_strs
+
+    @property
+    def timestamp(self) -> float:
+        return self.ioc.record(self.pvname).timestamp
+
+    @property
+    def severity(self) -> int:
+        return 0
+
+    @property
+    def status(self) -> int:
+        return 0
+
+    @property
+    def value(self) -> Any:
+        return self.get()
+
+    @property
+    def char_value(self) -> Optional[str]:
+        return self.get(as_string=True)
+
+    @property
+    def count(self) -> int:
+        value = self._last_value
+        return len(value) if isinstance(value, np.ndarray) else 1
+
+    @property
+    def put_complete(self) -> bool:
+        return self._put_complete
+
+    def _as_string(self, value: Any) -> str:
+        enum_strs = self.enum_strs
+        if enum_strs and not isinstance(value, str):
+            return enum_strs[int(value)]
+        return str(value)
+
+    def get(
+        self,
+        count=None,
+        as_string=False,
+        as_numpy=True,
+        timeout=None,
+        with_ctrlvars=False,
+        use_monitor=True,
+        **kwargs,
+    ):
+        value = self.ioc.get(self.pvname)
+        if value is None:
+            return None
+        self._last_value = value
+        if as_string:
+            return self._as_string(value)
+        if isinstance(value, np.ndarray):
+            if count is not None:
+                value = value[:count]
+            return value if as_numpy else value.tolist()
+        return value
+
+    def put(
+        self,
+        value,
+        wait=False,
+        timeout=30.0,
+        use_complete=False,
+        callback=None,
+        callback_data=None,
+        **kwargs,
+    ):
+        self._put_complete = False
+        written = self.ioc.put(self.pvname, value)
+        self._put_complete = written
+        if written and callable(callback):
+            callback(pvname=self.pvname, data=callback_data)
+        return 1 if written else None
+
+    def get_ctrlvars(self, timeout: float = 5.0, warn: bool = True):
+        if self.ioc.get(self.pvname) is None:
+            return None
+        enum_strs = self.enum_strs
+        return {"enum_strs": enum_strs} if enum_strs else {}
+
+    def add_callback(
+        self, callback=None, index=None, run_now=False, with_ctrlvars=True, **kw
+    ):
+        if callable(callback):
+            if index is None:
+                index = 1 + max(self.callbacks, default=0)
+            self.callbacks[index] = (callback, kw)
+            self.ioc.subscribe(self)
+        if run_now:
+            self.run_callback(index)
+        return index
+
+    def remove_callback(self, index=None) -> None:
+        self.callbacks.pop(index, None)
+
+    def clear_callbacks(self) -> None:
+        self.callbacks = {}
+
+    def run_callback(self, index) -> None:
+        try:
+            callback, kwargs = self.callbacks[index]
+        except KeyError:
+            return
+        record = self.ioc.record(self.pvname)
+        value = record.read(time.monotonic())
+        callback(
+            pvname=self.pvname,
+            value=value,
+            char_value=self._as_string(value),
+            timestamp=record.timestamp,
+            posixseconds=int(record.timestamp),
+            nanoseconds=int(record.timestamp % 1 * 1e9),
+            status=0,
+            severity=0,
+            cb_info=(index, self),
+            **kwargs,
+        )
+
+    def run_callbacks(self) -> None:
+        for index in list(self.callbacks):
+            self.run_callback(index)
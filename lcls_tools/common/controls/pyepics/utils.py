@@ -1,7 +1,19 @@
-from time import sleep
+import inspect
+import logging
+from threading import Event
+from time import monotonic, sleep
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Union
 from unittest.mock import MagicMock
 
-from epics import PV as EPICS_PV, caget as epics_caget, caput as epics_caput
+from epics import (
+    PV as EPICS_PV,
+    ca,
+    caget as epics_caget,
+    caput as epics_caput,
+    get_pv,
+)
+
+logger = logging.getLogger(__name__)
 
 # These are the values that decide whether a PV is alarming (and if so, how)
 EPICS_NO_ALARM_VAL = 0
@@ -15,7 +27,109 @@ class PVInvalidError(Exception):
         super(PVInvalidError, self).__init__(message)
 
 
-class PV(EPICS_PV):
+class MonitorCacheMixin:
+    """
+    Cached read mode for PV classes.
+
+    With max_age set, get returns the value pyepics already holds from the
+    PV's monitor as long as it arrived (or was last read fresh) at most
+    max_age seconds ago. Older values, disconnected PVs and PVs that are not
+    monitored (e.g. large waveforms) are read fresh instead. Hits and misses
+    are counted in cache_hits and cache_misses. With max_age None (default)
+    every get is passed straight through.
+    """
+
+    def __init__(self, pvname, max_age: Optional[float] = None, **kwargs):
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._cache_time = None
+        self._max_age = None
+        self._cache_callback = None
+        if max_age is not None and kwargs.get("auto_monitor") is None:
+            kwargs["auto_monitor"] = True
+        super().__init__(pvname=pvname, **kwargs)
+        self.max_age = max_age
+
+    @property
+    def max_age(self) -> Optional[float]:
+        return self._max_age
+
+    @max_age.setter
+    def max_age(self, max_age: Optional[float]):
+        if max_age is not None and self._max_age is None:
+            self._cache_time = None
+            self._cache_callback = self.add_callback(
+                self._on_monitor, with_ctrlvars=False
+            )
+        elif max_age is None and self._max_age is not None:
+            self.remove_callback(self._cache_callback)
+        self._max_age = max_age
+
+    def _on_monitor(self, **kwargs):
+        self._cache_time = monotonic()
+
+    def is_cache_fresh(self, max_age: Optional[float] = None) -> bool:
+        """Whether the monitored value is at most max_age seconds old"""
+        if max_age is None:
+            max_age = self.max_age
+        return (
+            max_age is not None
+            and self._cache_time is not None
+            and bool(self.auto_monitor)
+            and self.connected
+            and monotonic() - self._cache_time <= max_age
+        )
+
+    def get(
+        self,
+        count=None,
+        as_string=False,
+        as_numpy=True,
+        timeout=None,
+        with_ctrlvars=False,
+        use_monitor=True,
+        max_age: Optional[float] = None,
+        **kwargs,
+    ):
+        if max_age is None:
+            max_age = self.max_age
+        if max_age is None or not use_monitor or with_ctrlvars:
+            return self._get(
+                count,
+                as_string,
+                as_numpy,
+                timeout,
+                with_ctrlvars,
+                use_monitor,
+                **kwargs,
+            )
+        if self.is_cache_fresh(max_age):
+            self.cache_hits += 1
+            return EPICS_PV.get(
+                self, count=count, as_string=as_string, as_numpy=as_numpy
+            )
+        self.cache_misses += 1
+        value = self._get(
+            count, as_string, as_numpy, timeout, with_ctrlvars, False, **kwargs
+        )
+        if value is not None:
+            self._cache_time = monotonic()
+        return value
+
+    def _get(self, *args, **kwargs):
+        """The uncached read, overridden by classes that change how PVs are read"""
+        return super().get(*args, **kwargs)
+
+    def cache_stats(self) -> dict:
+        """Number of cached reads served ("hits") and read fresh ("misses")"""
+        return {"hits": self.cache_hits, "misses": self.cache_misses}
+
+
+class CachedPV(MonitorCacheMixin, EPICS_PV):
+    """An epics.PV with the cached read mode of MonitorCacheMixin"""
+
+
+class PV(MonitorCacheMixin, EPICS_PV):
     def __init__(
         self,
         pvname,
@@ -27,9 +141,11 @@ class PV(EPICS_PV):
         count=None,
         connection_callback=None,
         access_callback=None,
+        max_age: Optional[float] = None,
     ):
         super().__init__(
             pvname=pvname,
+            max_age=max_age,
             connection_timeout=connection_timeout,
             callback=callback,
             form=form,
@@ -80,7 +196,7 @@ class PV(EPICS_PV):
             sleep(0.5)
         return status
 
-    def get(
+    def _get(
         self,
         count=None,
         as_string=False,
@@ -90,6 +206,8 @@ class PV(EPICS_PV):
         use_monitor=True,
         use_caget=True,
     ):
+        # called by MonitorCacheMixin.get, which takes the same arguments
+        # plus max_age
         if use_caget:
             return self.caget(
                 as_string=as_string, as_numpy=as_numpy, use_monitor=use_monitor
@@ -98,8 +216,8 @@ class PV(EPICS_PV):
         else:
             self.connect()
 
-            value = super().get(
-                count, as_string, as_numpy, timeout, with_ctrlvars, use_monitor
+            value = EPICS_PV.get(
+                self, count, as_string, as_numpy, timeout, with_ctrlvars, use_monitor
             )
             if value is not None:
                 return value
@@ -137,6 +255,225 @@ class PV(EPICS_PV):
             self.caput(value)
 
 
+def _calls_back_on_put(pv: EPICS_PV) -> bool:
+    """
+    Whether pv.put(value, use_complete=True, callback=f) calls f once the
+    put completed. PV above puts with caput by default, which has no
+    callback, and so does any put without a callback argument.
+    """
+    try:
+        parameters = inspect.signature(pv.put).parameters
+    except (TypeError, ValueError):
+        return True
+    use_caput = parameters.get("use_caput")
+    if use_caput is not None and use_caput.default:
+        return False
+    return "callback" in parameters or any(
+        parameter.kind is inspect.Parameter.VAR_KEYWORD
+        for parameter in parameters.values()
+    )
+
+
+class PVGroup:
+    """
+    Many PVs read and written together.
+
+    The PVs are created once and kept, so every read and write reuses their
+    connections. Names are turned into PVs with pv_factory(pvname), by
+    default epics.get_pv, which shares connections with any other get_pv
+    user; PV objects (e.g. a device's own PVs) are used as they are. All of
+    them are connected at the same time, and a read or write is sent to every
+    PV before waiting on any of them, like pyepics caget_many/caput_many.
+    PVs that fail are retried on their own, up to retries more times,
+    sleeping backoff seconds before the first retry and twice as long before
+    each one after that. The PVs that still fail are logged as warnings.
+
+    Reads of PVs with a fresh monitor cache (see MonitorCacheMixin) are
+    served from it, and PVs without a CA channel (such as simulated ones)
+    are read with their own get.
+
+    :param pvnames: PV names or PV objects, the order of the values returned
+    :param timeout: seconds to wait for connections, values and put
+        completion in each attempt
+    :param pv_factory: creates the PV for each name, epics.get_pv if None
+    """
+
+    def __init__(
+        self,
+        pvnames: Iterable[Union[str, EPICS_PV]],
+        timeout: float = 1.0,
+        retries: int = 2,
+        backoff: float = 0.1,
+        pv_factory: Optional[Callable[[str], EPICS_PV]] = None,
+    ):
+        pvnames = list(pvnames)
+        self.pvnames = [pv if isinstance(pv, str) else pv.pvname for pv in pvnames]
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._pv_factory = pv_factory
+        given = {pv.pvname: pv for pv in pvnames if not isinstance(pv, str)}
+        self._pvs: Optional[Dict[str, EPICS_PV]] = None
+        self._given_pvs = given
+
+    def __len__(self) -> int:
+        return len(self.pvnames)
+
+    @property
+    def pvs(self) -> Dict[str, EPICS_PV]:
+        """The PV for each name, created (but not waited on) on first use"""
+        if self._pvs is None:
+            pvs = {}
+            for pvname in self.pvnames:
+                if pvname in self._given_pvs:
+                    pvs[pvname] = self._given_pvs[pvname]
+                elif self._pv_factory is not None:
+                    pvs[pvname] = self._pv_factory(pvname)
+                else:
+                    pvs[pvname] = get_pv(pvname, connect=False)
+            self._pvs = pvs
+        return self._pvs
+
+    def connect(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every PV is connected, True if all of them are"""
+        return not self._connect(self.pvnames, timeout)
+
+    def _connect(self, pvnames: List[str], timeout: Optional[float] = None):
+        """Wait for the connections, the names that did not connect"""
+        timeout = self.timeout if timeout is None else timeout
+        pvs = self.pvs
+        # every channel is being searched for already, so this waits about
+        # as long as the slowest one rather than the sum of all
+        return [
+            pvname
+            for pvname in pvnames
+            if not pvs[pvname].wait_for_connection(timeout=timeout)
+        ]
+
+    def _with_retries(self, attempt_all, pvnames: List[str]) -> List[str]:
+        """
+        Call attempt_all(pvnames), then again with those it returns.
+        The names that failed every attempt.
+        """
+        failed = attempt_all(pvnames)
+        for attempt in range(self.retries):
+            if not failed:
+                return []
+            sleep(self.backoff * 2**attempt)
+            failed = attempt_all(failed)
+        if failed:
+            logger.warning(
+                "%d PVs failed %d times, giving up: %s",
+                len(failed),
+                self.retries + 1,
+                ", ".join(failed),
+            )
+        return failed
+
+    def get(
+        self,
+        as_string: bool = False,
+        as_numpy: bool = True,
+        count: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Values of every PV, {pvname: value} in the order of pvnames.
+        Values that could not be read are None.
+        """
+        values = dict.fromkeys(self.pvnames)
+
+        def read(pvnames: List[str]) -> List[str]:
+            unconnected = self._connect(pvnames)
+            requested = {}
+            for pvname in pvnames:
+                if pvname in unconnected:
+                    continue
+                pv = self.pvs[pvname]
+                is_cache_fresh = getattr(pv, "is_cache_fresh", None)
+                chid = getattr(pv, "chid", None)
+                if (is_cache_fresh is not None and is_cache_fresh()) or chid is None:
+                    values[pvname] = pv.get(
+                        count=count,
+                        as_string=as_string,
+                        as_numpy=as_numpy,
+                        timeout=self.timeout,
+                    )
+                else:
+                    ca.get(chid, count=count, wait=False)
+                    requested[pvname] = chid
+            for pvname, chid in requested.items():
+                values[pvname] = ca.get_complete(
+                    chid,
+                    count=count,
+                    as_string=as_string,
+                    as_numpy=as_numpy,
+                    timeout=self.timeout,
+                )
+            return [pvname for pvname in pvnames if values[pvname] is None]
+
+        self._with_retries(read, list(dict.fromkeys(self.pvnames)))
+        return values
+
+    def put(
+        self,
+        values: Union[Dict[str, Any], Sequence[Any]],
+        wait: bool = True,
+    ) -> Dict[str, int]:
+        """
+        Write values, given as {pvname: value} or in the order of pvnames.
+        With wait, block until every put has completed, as signalled by
+        each put's completion callback. PVs whose put has no callback (such
+        as PV above, which uses caput) are judged by the put's return value.
+        Puts that were sent but did not complete within timeout are not
+        sent again, which could write a setpoint twice.
+
+        :returns: {pvname: 1 if written, 0 if sent but not completed in
+            time, -1 if not written}
+        """
+        if not isinstance(values, dict):
+            if len(values) != len(self.pvnames):
+                raise ValueError("Need exactly one value for each PV.")
+            values = dict(zip(self.pvnames, values))
+        unknown = set(values) - set(self.pvnames)
+        if unknown:
+            raise ValueError(f"PVs not in this group: {sorted(unknown)}")
+        status = dict.fromkeys(values, -1)
+
+        def write(pvnames: List[str]) -> List[str]:
+            unconnected = self._connect(pvnames)
+            written = []
+            completed = {}
+            for pvname in pvnames:
+                if pvname in unconnected:
+                    continue
+                pv = self.pvs[pvname]
+                try:
+                    if wait and _calls_back_on_put(pv):
+                        done = completed[pvname] = Event()
+                        result = pv.put(
+                            values[pvname],
+                            use_complete=True,
+                            callback=lambda done=done, **kwargs: done.set(),
+                        )
+                    else:
+                        result = pv.put(values[pvname])
+                except PVInvalidError:
+                    continue
+                if result == 1:
+                    written.append(pvname)
+            deadline = monotonic() + self.timeout
+            for pvname in written:
+                done = completed.get(pvname)
+                if done is None or done.wait(max(0.0, deadline - monotonic())):
+                    status[pvname] = 1
+                else:
+                    status[pvname] = 0
+            return [pvname for pvname in pvnames if pvname not in written]
+
+        self._with_retries(write, list(values))
+        return status
+
+
 def make_mock_pv(
     pv_name: str = None, get_val=None, severity=EPICS_NO_ALARM_VAL
 ) -> MagicMock:
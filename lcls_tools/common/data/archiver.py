@@ -4,22 +4,38 @@ Client for the SLAC LCLS-II Archiver Appliance.
 https://epicsarchiver.readthedocs.io/en/latest/user/userguide.html
 """
 
+import calendar
 import json
 import logging
 import threading
 import time
-from collections import defaultdict
+from collections import defaultdict, deque
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
-from datetime import datetime, timedelta
-from typing import Callable, DefaultDict, Dict, List, Optional, Union
-
+from functools import wraps
+from datetime import datetime, timedelta, timezone
+from typing import (
+    Any,
+    Callable,
+    DefaultDict,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import numpy as np
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+from urllib.parse import quote_plus
 from zoneinfo import ZoneInfo
 
 from lcls_tools.common.controls.pyepics.utils import EPICS_INVALID_VAL
+from lcls_tools.common.data.archiver_metrics import RequestRecord
 
 logger = logging.getLogger(__name__)
 
@@ -28,10 +44,55 @@ ARCHIVER_URL_FORMATTER = "http://lcls-archapp.slac.stanford.edu/retrieval/data/{
 SINGLE_RESULT_SUFFIX = "getDataAtTime?at={TIME}{OFFSET}&includeProxies=true"
 RANGE_RESULT_SUFFIX = "getData.json"
 RANGE_MULTI_PV_SUFFIX = "getDataForPVs.json"
+RANGE_RAW_SUFFIX = "getData.raw"
+
+RETRIEVAL_FORMATS = ("json", "raw")
 
 TIMEOUT: int = 15
 DEFAULT_MAX_WORKERS: int = 4
+# Multi-PV range requests are split so no query string grows past what the
+# appliance's servlet container accepts and no single request is too heavy
+MAX_URL_LENGTH: int = 6000
+MAX_PVS_PER_REQUEST: int = 100
+# post-processing operators that take a bin size, as operator_<seconds>
+BINNING_OPERATORS = (
+    "mean",
+    "median",
+    "min",
+    "max",
+    "firstSample",
+    "lastSample",
+    "rms",
+    "std",
+    "count",
+)
+# bin sizes (s) the planner rounds up to, so queries over similar spans ask
+# for the same operator and share cache entries
+BIN_SIZES = (
+    1,
+    2,
+    5,
+    10,
+    15,
+    30,
+    60,
+    120,
+    300,
+    600,
+    900,
+    1800,
+    3600,
+    7200,
+    10800,
+    21600,
+    43200,
+    86400,
+)
 _PACIFIC = ZoneInfo("America/Los_Angeles")
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+# stands in for a missing severity in the int16 severity column, which makes
+# the sample invalid just like ArchiverValue(severity=None)
+_NO_SEVERITY = -1
 
 # Legacy constant kept for backward compatibility
 if time.localtime().tm_isdst:
@@ -84,6 +145,115 @@ def _get_session() -> requests.Session:
     return s
 
 
+_metrics_hooks: List[Callable[[RequestRecord], None]] = []
+
+
+def add_metrics_hook(hook: Callable[[RequestRecord], None]) -> None:
+    """
+    Call hook with a RequestRecord after every request to the appliance
+    (see lcls_tools.common.data.archiver_metrics for a ready-made one).
+    """
+    if hook not in _metrics_hooks:
+        _metrics_hooks.append(hook)
+
+
+def remove_metrics_hook(hook: Callable[[RequestRecord], None]) -> None:
+    if hook in _metrics_hooks:
+        _metrics_hooks.remove(hook)
+
+
+class _Observation:
+    """Fills in one RequestRecord and hands it to the hooks on exit"""
+
+    def __init__(self, endpoint: str, pv_count: int):
+        self.record = RequestRecord(endpoint=endpoint, pv_count=pv_count)
+        self._started = time.perf_counter()
+        self._received = None
+
+    def sending(self) -> None:
+        """The request is sent now, e.g. again after waiting or backing off"""
+        self._started = time.perf_counter()
+
+    def received(
+        self,
+        status: int,
+        bytes_received: int,
+        retries: int = 0,
+        server_time: Optional[float] = None,
+    ) -> None:
+        self._received = time.perf_counter()
+        self.record.latency = self._received - self._started
+        self.record.status = status
+        self.record.bytes_received = bytes_received
+        self.record.retries = retries
+        self.record.server_time = server_time
+
+    def received_response(self, response: requests.Response) -> None:
+        # urllib3 leaves the Retry that was used, with one history entry per
+        # retry, on the raw response
+        retry = getattr(getattr(response, "raw", None), "retries", None)
+        self.received(
+            response.status_code,
+            len(response.content),
+            len(getattr(retry, "history", ())),
+            response.elapsed.total_seconds(),
+        )
+
+    def parsed(self, samples: int) -> None:
+        self.record.samples = samples
+        if self._received is not None:
+            self.record.parse_time = time.perf_counter() - self._received
+
+    def __enter__(self) -> "_Observation":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc is not None:
+            self.record.error = type(exc).__name__
+            if self._received is None:
+                self.record.latency = time.perf_counter() - self._started
+        for hook in list(_metrics_hooks):
+            try:
+                hook(self.record)
+            except Exception:
+                logger.exception("Archiver metrics hook %r failed", hook)
+
+
+class _NullObservation:
+    """Stands in for _Observation while no hook is registered"""
+
+    def sending(self) -> None:
+        pass
+
+    def received(self, *args, **kwargs) -> None:
+        pass
+
+    def received_response(self, response) -> None:
+        pass
+
+    def parsed(self, samples: int) -> None:
+        pass
+
+    def __enter__(self) -> "_NullObservation":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+_NULL_OBSERVATION = _NullObservation()
+
+
+def _observe(endpoint: str, pv_count: int) -> Union[_Observation, _NullObservation]:
+    if _metrics_hooks:
+        return _Observation(endpoint, pv_count)
+    return _NULL_OBSERVATION
+
+
+def _endpoint(url: str) -> str:
+    return url.rsplit("/", 1)[-1].split("?", 1)[0]
+
+
 def _resolve_timeout(timeout):
     return TIMEOUT if timeout is _UNSET else timeout
 
@@ -97,6 +267,9 @@ def _get_utc_offset(dt: Optional[datetime] = None) -> str:
 
 
 def _iso_with_offset(dt: datetime, offset: str) -> str:
+    if dt.tzinfo is not None:
+        # aware datetimes carry their own offset, which is never ambiguous
+        return dt.isoformat(timespec="microseconds")
     return dt.isoformat(timespec="microseconds") + offset
 
 
@@ -112,7 +285,9 @@ class ArchiverValue:
     _timestamp: Optional[datetime] = None
 
     def __hash__(self):
-        return self.secs ^ hash(self.val) ^ self.nanos ^ self.severity ^ self.status
+        return (
+            self.secs ^ hash(self.val) ^ self.nanos ^ hash(self.severity) ^ self.status
+        )
 
     @property
     def timestamp(self) -> datetime:
@@ -144,6 +319,12 @@ class ArchiveDataHandler:
             return False
         return set(self.value_list) == set(other.value_list)
 
+    def __len__(self) -> int:
+        return len(self.value_list)
+
+    def __iter__(self) -> Iterator[ArchiverValue]:
+        return iter(self.value_list)
+
     @property
     def timestamps(self) -> List[datetime]:
         return [v.timestamp for v in self.value_list]
@@ -157,68 +338,987 @@ class ArchiveDataHandler:
         return [v.is_valid for v in self.value_list]
 
 
-def _fetch_pv_batch_range(
-    pv_list: List[str],
-    start_time: datetime,
-    end_time: datetime,
-    timeout: int,
-    operator: Optional[str] = None,
-) -> Dict[str, ArchiveDataHandler]:
-    start_off = _get_utc_offset(start_time)
-    end_off = _get_utc_offset(end_time)
+def _as_column(values: List[Any]) -> np.ndarray:
+    """
+    Pack a list of archiver values into one array. Scalars and equal-length
+    waveforms become a numeric array, anything ragged or mixed becomes an
+    object array so no sample is lost.
+    """
+    try:
+        column = np.asarray(values)
+    except ValueError:
+        column = None
+    if column is not None and column.dtype.kind in "US":
+        # NumPy turns e.g. [1.5, "Disabled"] into strings, keep the numbers
+        text = str if column.dtype.kind == "U" else bytes
+        if not all(isinstance(value, text) for value in values):
+            column = None
+    if column is None or column.dtype.kind not in "biufcUS":
+        column = np.empty(len(values), dtype=object)
+        column[:] = values
+    return column
+
+
+def _concatenate_columns(parts: List[np.ndarray]) -> np.ndarray:
+    """Concatenate value columns, falling back to object if they do not mix"""
+    numeric = all(p.dtype.kind in "biuf" for p in parts)
+    if not numeric and len({p.dtype for p in parts}) > 1:
+        parts = [p.astype(object) for p in parts]
+    return np.concatenate(parts)
+
+
+class _ValueList(list):
+    """
+    value_list of a ColumnarArchiveDataHandler. A plain list of its samples,
+    except that changing it marks the handler's columns stale, so they are
+    rebuilt from the list the next time they are used.
+    """
+
+    def __init__(self, values: Iterable[ArchiverValue], handler):
+        super().__init__(values)
+        self._handler = handler
+
+
+def _marks_columns_stale(method):
+    @wraps(method)
+    def changed(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        self._handler._columns_stale = True
+        return result
 
-    if operator:
-        query_pvs = [f"{operator}({pv})" for pv in pv_list]
-        wrapped_to_raw = {f"{operator}({pv})": pv for pv in pv_list}
+    return changed
+
+
+for _name in (
+    "append",
+    "extend",
+    "insert",
+    "pop",
+    "remove",
+    "clear",
+    "sort",
+    "reverse",
+    "__setitem__",
+    "__delitem__",
+    "__iadd__",
+    "__imul__",
+):
+    setattr(_ValueList, _name, _marks_columns_stale(getattr(list, _name)))
+
+
+def _column(name: str) -> property:
+    """A column of ColumnarArchiveDataHandler, rebuilt from value_list if stale"""
+    private = "_" + name
+
+    def get(self):
+        if self._columns_stale:
+            self._rebuild_columns()
+        return getattr(self, private)
+
+    def set(self, column):
+        if self._columns_stale:
+            self._rebuild_columns()
+        setattr(self, private, column)
+        self._value_list = None
+        self._timestamps = None
+
+    return property(get, set)
+
+
+class ColumnarArchiveDataHandler(ArchiveDataHandler):
+    """
+    ArchiveDataHandler that keeps samples in contiguous NumPy columns
+    (secs, nanos, val, severity, status) instead of one ArchiverValue per
+    sample. ArchiverValue objects are only built when the handler is iterated
+    or when value_list is read, so the legacy API keeps working as a view.
+    value_list can still be changed (e.g. appended to), the columns follow.
+    A missing severity is kept as invalid, see valid_mask.
+    """
+
+    secs = _column("secs")
+    nanos = _column("nanos")
+    val = _column("val")
+    severity = _column("severity")
+    status = _column("status")
+    fields = _column("fields")
+
+    def __init__(
+        self,
+        secs: Optional[np.ndarray] = None,
+        nanos: Optional[np.ndarray] = None,
+        val: Optional[np.ndarray] = None,
+        severity: Optional[np.ndarray] = None,
+        status: Optional[np.ndarray] = None,
+        meta: Optional[dict] = None,
+        fields: Optional[Dict[int, Dict]] = None,
+    ):
+        self._columns_stale = False
+        self._value_list: Optional[_ValueList] = None
+        self._timestamps: Optional[List[datetime]] = None
+        self.secs: np.ndarray = np.asarray(
+            secs if secs is not None else [], dtype=np.int64
+        )
+        n = len(self.secs)
+        self.nanos: np.ndarray = np.asarray(
+            nanos if nanos is not None else np.zeros(n), dtype=np.int64
+        )
+        self.val: np.ndarray = val if val is not None else np.full(n, np.nan)
+        self.severity: np.ndarray = np.asarray(
+            severity if severity is not None else np.zeros(n), dtype=np.int16
+        )
+        self.status: np.ndarray = np.asarray(
+            status if status is not None else np.zeros(n), dtype=np.int16
+        )
+        self.meta: Optional[dict] = meta
+        # fields are rare (only present on samples where e.g. HIHI changed),
+        # so they are kept sparsely by sample index
+        self.fields: Dict[int, Dict] = fields if fields else {}
+
+    @classmethod
+    def from_records(
+        cls, records: List[Dict[str, Any]], meta: Optional[dict] = None
+    ) -> "ColumnarArchiveDataHandler":
+        """Build the columns from the list of sample dicts of a JSON response"""
+        n = len(records)
+        secs = np.fromiter((r["secs"] for r in records), dtype=np.int64, count=n)
+        nanos = np.fromiter((r["nanos"] for r in records), dtype=np.int64, count=n)
+        severity = np.fromiter(
+            (
+                _NO_SEVERITY if r.get("severity") is None else r["severity"]
+                for r in records
+            ),
+            dtype=np.int16,
+            count=n,
+        )
+        status = np.fromiter(
+            (r.get("status") or 0 for r in records), dtype=np.int16, count=n
+        )
+        val = _as_column([r["val"] for r in records])
+        fields = {i: r["fields"] for i, r in enumerate(records) if "fields" in r}
+        return cls(
+            secs=secs,
+            nanos=nanos,
+            val=val,
+            severity=severity,
+            status=status,
+            meta=meta,
+            fields=fields,
+        )
+
+    @classmethod
+    def from_values(
+        cls, value_list: List[ArchiverValue]
+    ) -> "ColumnarArchiveDataHandler":
+        """Build the columns from existing ArchiverValue objects"""
+        handler = cls.from_records(
+            [
+                {
+                    "secs": v.secs,
+                    "nanos": v.nanos,
+                    "val": v.val,
+                    "severity": v.severity,
+                    "status": v.status,
+                }
+                for v in value_list
+            ]
+        )
+        handler.fields = {
+            i: v.fields for i, v in enumerate(value_list) if v.fields is not None
+        }
+        return handler
+
+    @classmethod
+    def concatenate(
+        cls, handlers: List["ColumnarArchiveDataHandler"]
+    ) -> "ColumnarArchiveDataHandler":
+        """
+        Join handlers that cover consecutive time windows into one. Samples
+        that are not newer than the last sample already kept are dropped, so
+        the value the archiver repeats at the start of each window only
+        appears once.
+        """
+        handlers = [h for h in handlers if len(h)]
+        if not handlers:
+            return cls()
+        if len(handlers) == 1:
+            return handlers[0]
+
+        keep = []
+        last_ns = None
+        for handler in handlers:
+            ns = handler.epoch_ns
+            mask = np.ones(len(ns), dtype=bool) if last_ns is None else ns > last_ns
+            keep.append(mask)
+            if mask.any():
+                last_ns = ns[mask][-1]
+
+        fields = {}
+        offset = 0
+        for handler, mask in zip(handlers, keep):
+            new_index = np.cumsum(mask) - 1 + offset
+            for index, value in handler.fields.items():
+                if mask[index]:
+                    fields[int(new_index[index])] = value
+            offset += int(mask.sum())
+
+        def join(column: str) -> np.ndarray:
+            return _concatenate_columns(
+                [getattr(h, column)[m] for h, m in zip(handlers, keep)]
+            )
+
+        return cls(
+            secs=join("secs"),
+            nanos=join("nanos"),
+            val=join("val"),
+            severity=join("severity"),
+            status=join("status"),
+            meta=handlers[0].meta,
+            fields=fields,
+        )
+
+    def take(self, indices: np.ndarray) -> "ColumnarArchiveDataHandler":
+        """New handler holding the samples at the given indices, in that order"""
+        indices = np.asarray(indices, dtype=np.intp)
+        fields = {
+            new: self.fields[int(old)]
+            for new, old in enumerate(indices)
+            if int(old) in self.fields
+        }
+        return ColumnarArchiveDataHandler(
+            secs=self.secs[indices],
+            nanos=self.nanos[indices],
+            val=self.val[indices],
+            severity=self.severity[indices],
+            status=self.status[indices],
+            meta=self.meta,
+            fields=fields,
+        )
+
+    def asof(self, epoch_ns: np.ndarray) -> "ColumnarArchiveDataHandler":
+        """
+        Resample onto the given times (integer ns since the epoch): for each
+        time, pick the last sample at or before it. Times that precede the
+        first sample are skipped, as getDataAtTime would do.
+        """
+        indices = np.searchsorted(self.epoch_ns, epoch_ns, side="right") - 1
+        return self.take(indices[indices >= 0])
+
+    def __eq__(self, other):
+        if isinstance(other, ColumnarArchiveDataHandler):
+            return (
+                np.array_equal(self.secs, other.secs)
+                and np.array_equal(self.nanos, other.nanos)
+                and np.array_equal(self.severity, other.severity)
+                and np.array_equal(self.status, other.status)
+                and np.array_equal(self.val, other.val)
+            )
+        return super().__eq__(other)
+
+    def __len__(self) -> int:
+        return len(self.secs)
+
+    def _value_at(self, index: int) -> ArchiverValue:
+        val = self.val[index]
+        severity = int(self.severity[index])
+        return ArchiverValue(
+            secs=int(self.secs[index]),
+            val=val.tolist() if isinstance(val, (np.ndarray, np.generic)) else val,
+            nanos=int(self.nanos[index]),
+            severity=None if severity == _NO_SEVERITY else severity,
+            status=int(self.status[index]),
+            fields=self.fields.get(index),
+        )
+
+    def _iter_columns(self) -> Iterator[ArchiverValue]:
+        for index in range(len(self)):
+            yield self._value_at(index)
+
+    def __iter__(self) -> Iterator[ArchiverValue]:
+        if self._columns_stale:
+            return iter(list(self._value_list))
+        return self._iter_columns()
+
+    @property
+    def value_list(self) -> List[ArchiverValue]:
+        """
+        Per-sample ArchiverValue objects, built once on first access.
+        Changes to the list, or assigning a new one, replace the samples;
+        the columns are rebuilt from it when they are next used.
+        """
+        if self._columns_stale:
+            return self._value_list
+        if self._value_list is None:
+            self._value_list = _ValueList(self._iter_columns(), self)
+        return self._value_list
+
+    @value_list.setter
+    def value_list(self, value_list: List[ArchiverValue]):
+        self._value_list = _ValueList(value_list, self)
+        self._columns_stale = True
+
+    def _rebuild_columns(self) -> None:
+        other = ColumnarArchiveDataHandler.from_values(self._value_list)
+        self._columns_stale = False
+        for name in ("secs", "nanos", "val", "severity", "status", "fields"):
+            private = "_" + name
+            setattr(self, private, getattr(other, private))
+        self._timestamps = None
+
+    @property
+    def epoch_ns(self) -> np.ndarray:
+        """Sample times as integer nanoseconds since the UNIX epoch"""
+        return self.secs * 1_000_000_000 + self.nanos
+
+    @property
+    def datetimes(self) -> np.ndarray:
+        """Sample times as a UTC datetime64[ns] array"""
+        return self.epoch_ns.astype("datetime64[ns]")
+
+    @property
+    def valid_mask(self) -> np.ndarray:
+        """Boolean array, True where the sample severity is known and not INVALID"""
+        return (self.severity != EPICS_INVALID_VAL) & (self.severity != _NO_SEVERITY)
+
+    @property
+    def timestamps(self) -> List[datetime]:
+        if self._timestamps is None:
+            self._timestamps = [
+                datetime.fromtimestamp(s) + timedelta(microseconds=n / 1000)
+                for s, n in zip(self.secs.tolist(), self.nanos.tolist())
+            ]
+        return self._timestamps
+
+    @property
+    def values(self) -> List[Union[str, int, float]]:
+        return self.val.tolist()
+
+    @property
+    def validities(self) -> List[bool]:
+        return self.valid_mask.tolist()
+
+
+class ArchiveResult(defaultdict):
+    """
+    The DefaultDict[str, ArchiveDataHandler] returned by range queries.
+
+    errors maps each PV whose request failed to the exception it raised, so
+    callers can tell an empty handler for a PV with no data from one whose
+    shard of the request did not come back. meta describes how the query was
+    run, e.g. the operator and bin size chosen for max_points.
+    """
+
+    def __init__(self, default_factory=ColumnarArchiveDataHandler, *args, **kwargs):
+        super().__init__(default_factory, *args, **kwargs)
+        self.errors: Dict[str, ArchiverError] = {}
+        self.meta: Dict[str, Any] = {}
+
+
+# PayloadType values from the appliance's EPICSEvent.proto
+_PB_SCALAR_STRING = 0
+_PB_SCALAR_SHORT = 1
+_PB_SCALAR_FLOAT = 2
+_PB_SCALAR_ENUM = 3
+_PB_SCALAR_BYTE = 4
+_PB_SCALAR_INT = 5
+_PB_SCALAR_DOUBLE = 6
+_PB_WAVEFORM_STRING = 7
+_PB_WAVEFORM_SHORT = 8
+_PB_WAVEFORM_FLOAT = 9
+_PB_WAVEFORM_ENUM = 10
+_PB_WAVEFORM_BYTE = 11
+_PB_WAVEFORM_INT = 12
+_PB_WAVEFORM_DOUBLE = 13
+
+# Payload types whose val is a fixed-width little-endian number or a packed
+# array of them, so a whole chunk can be read with one np.frombuffer
+_PB_FIXED_DTYPES = {
+    _PB_SCALAR_FLOAT: "<f4",
+    _PB_SCALAR_INT: "<i4",
+    _PB_SCALAR_DOUBLE: "<f8",
+    _PB_WAVEFORM_FLOAT: "<f4",
+    _PB_WAVEFORM_INT: "<i4",
+    _PB_WAVEFORM_DOUBLE: "<f8",
+    _PB_SCALAR_BYTE: "i1",
+    _PB_WAVEFORM_BYTE: "i1",
+}
+_PB_ZIGZAG_TYPES = {
+    _PB_SCALAR_SHORT,
+    _PB_SCALAR_ENUM,
+    _PB_WAVEFORM_SHORT,
+    _PB_WAVEFORM_ENUM,
+}
+_PB_SCALAR_TYPES = {
+    _PB_SCALAR_STRING,
+    _PB_SCALAR_SHORT,
+    _PB_SCALAR_FLOAT,
+    _PB_SCALAR_ENUM,
+    _PB_SCALAR_BYTE,
+    _PB_SCALAR_INT,
+    _PB_SCALAR_DOUBLE,
+}
+
+
+def _unescape_raw_line(line: bytes) -> bytes:
+    """Undo the appliance's escaping of ESC, newline and carriage return"""
+    if b"\x1b" not in line:
+        return line
+    return (
+        line.replace(b"\x1b\x02", b"\n")
+        .replace(b"\x1b\x03", b"\r")
+        .replace(b"\x1b\x01", b"\x1b")
+    )
+
+
+def _read_varint(buf: bytes, pos: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _zigzag(n: int) -> int:
+    return (n >> 1) ^ -(n & 1)
+
+
+def _pb_fields(buf: bytes) -> Iterator[Tuple[int, int, Union[int, bytes]]]:
+    """Yield (field number, wire type, value) for one protobuf message"""
+    pos = 0
+    end = len(buf)
+    while pos < end:
+        key, pos = _read_varint(buf, pos)
+        field, wire_type = key >> 3, key & 0x07
+        if wire_type == 0:
+            value, pos = _read_varint(buf, pos)
+        elif wire_type == 1:
+            value, pos = buf[pos : pos + 8], pos + 8
+        elif wire_type == 2:
+            length, pos = _read_varint(buf, pos)
+            value, pos = buf[pos : pos + length], pos + length
+        elif wire_type == 5:
+            value, pos = buf[pos : pos + 4], pos + 4
+        else:
+            raise ValueError(f"Unsupported protobuf wire type {wire_type}")
+        if pos > end:
+            raise ValueError("Truncated protobuf message")
+        yield field, wire_type, value
+
+
+def _decode_field_value(buf: bytes) -> Tuple[str, str]:
+    name = value = ""
+    for field, _, data in _pb_fields(buf):
+        if field == 1:
+            name = data.decode()
+        elif field == 2:
+            value = data.decode()
+    return name, value
+
+
+def _decode_raw_sample(
+    line: bytes,
+) -> Tuple[int, int, List[Union[int, bytes]], int, int, Dict[str, str]]:
+    """Decode one unescaped sample message with the generic field walker"""
+    seconds = nanos = severity = status = 0
+    parts: List[Union[int, bytes]] = []
+    fields: Dict[str, str] = {}
+    for field, _, data in _pb_fields(line):
+        if field == 1:
+            seconds = data
+        elif field == 2:
+            nanos = data
+        elif field == 3:
+            parts.append(data)
+        elif field == 4:
+            severity = data
+        elif field == 5:
+            status = data
+        elif field == 7:
+            name, value = _decode_field_value(data)
+            fields[name] = value
+    return seconds, nanos, parts, severity, status, fields
+
+
+def _raw_sample_value(payload_type: int, parts: List[Union[int, bytes]]) -> Any:
+    dtype = _PB_FIXED_DTYPES.get(payload_type)
+    if payload_type == _PB_SCALAR_STRING:
+        return parts[0].decode()
+    if payload_type == _PB_WAVEFORM_STRING:
+        return [p.decode() for p in parts]
+    if payload_type in _PB_ZIGZAG_TYPES:
+        if payload_type in _PB_SCALAR_TYPES:
+            return _zigzag(parts[0])
+        unpacked = []
+        for part in parts:
+            if isinstance(part, int):
+                # not packed: one varint field per element
+                unpacked.append(_zigzag(part))
+                continue
+            pos = 0
+            while pos < len(part):
+                raw, pos = _read_varint(part, pos)
+                unpacked.append(_zigzag(raw))
+        return unpacked
+    if dtype is None:
+        raise ValueError(f"Unsupported PB payload type {payload_type}")
+    if not all(isinstance(part, bytes) for part in parts):
+        raise ValueError(f"PB payload type {payload_type} with varint values")
+    value = np.frombuffer(b"".join(parts), dtype=dtype)
+    if payload_type in _PB_SCALAR_TYPES:
+        if len(value) != 1:
+            raise ValueError("Scalar PB sample without exactly one value")
+        return value[0]
+    return value
+
+
+def _gather_varints(buf: np.ndarray, pos: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Decode the varint starting at every position in pos at once. Only up to
+    five bytes (enough for the uint32/sint32 fields of a sample) are read;
+    longer ones come back with the returned position set to -1.
+    """
+    window = buf[pos[:, None] + np.arange(5)]
+    more = window >= 0x80
+    length = np.argmin(more, axis=1) + 1
+    parts = (window & 0x7F).astype(np.int64) << (7 * np.arange(5))
+    parts[np.arange(5) >= length[:, None]] = 0
+    end = np.where(more.all(axis=1), -1, pos + length)
+    return parts.sum(axis=1), end
+
+
+def _decode_scalar_columns(
+    payload_type: int, lines: List[bytes]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Vectorized decode of scalar samples laid out as the appliance writes them:
+    secondsintoyear, nano, val and nothing else. Returns seconds, nanos, val
+    and a mask of the samples that matched; the rest (alarms, repeat counts,
+    field values) are left for the generic decoder.
+    """
+    n = len(lines)
+    lengths = np.fromiter(map(len, lines), dtype=np.int64, count=n)
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    # padding keeps every gather in bounds even for malformed samples
+    buf = np.frombuffer(b"".join(lines) + bytes(32), dtype=np.uint8)
+
+    ok = buf[starts] == 0x08
+    seconds, pos = _gather_varints(buf, starts + 1)
+    ok &= pos >= 0
+    pos = np.where(ok, pos, starts)
+    ok &= buf[pos] == 0x10
+    nanos, pos = _gather_varints(buf, pos + 1)
+    ok &= pos >= 0
+    pos = np.where(ok, pos, starts)
+
+    dtype = _PB_FIXED_DTYPES.get(payload_type)
+    if payload_type in _PB_ZIGZAG_TYPES:
+        ok &= buf[pos] == 0x18
+        raw, pos = _gather_varints(buf, pos + 1)
+        ok &= pos >= 0
+        val = (raw >> 1) ^ -(raw & 1)
     else:
-        query_pvs = list(pv_list)
-        wrapped_to_raw = {pv: pv for pv in pv_list}
+        width = np.dtype(dtype).itemsize
+        # double is wire type 1, float and sfixed32 are wire type 5
+        ok &= buf[pos] == (0x19 if width == 8 else 0x1D)
+        window = buf[(pos + 1)[:, None] + np.arange(width)]
+        val = np.ascontiguousarray(window).view(dtype).ravel().copy()
+        pos = pos + 1 + width
+    ok &= pos == ends
+    return seconds, nanos, val, ok
+
+
+_PB_COLUMNAR_SCALARS = {
+    _PB_SCALAR_SHORT,
+    _PB_SCALAR_FLOAT,
+    _PB_SCALAR_ENUM,
+    _PB_SCALAR_INT,
+    _PB_SCALAR_DOUBLE,
+}
+
+
+def _decode_raw_chunk(
+    payload_type: int, year: int, lines: List[bytes], escaped: bool = True
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, Dict]:
+    """Decode the sample lines of one chunk (one PV, one year) into columns"""
+    n = len(lines)
+    if escaped:
+        lines = [
+            _unescape_raw_line(line) if b"\x1b" in line else line for line in lines
+        ]
+    severity = np.zeros(n, dtype=np.int16)
+    status = np.zeros(n, dtype=np.int16)
+    fields: Dict[int, Dict] = {}
+
+    if payload_type in _PB_COLUMNAR_SCALARS and n:
+        seconds, nanos, val, ok = _decode_scalar_columns(payload_type, lines)
+        slow = np.flatnonzero(~ok).tolist()
+        values = None
+    else:
+        seconds = np.zeros(n, dtype=np.int64)
+        nanos = np.zeros(n, dtype=np.int64)
+        slow = range(n)
+        values: List[Any] = [None] * n
+
+    for i in slow:
+        sec, nano, parts, sev, stat, sample_fields = _decode_raw_sample(lines[i])
+        seconds[i], nanos[i], severity[i], status[i] = sec, nano, sev, stat
+        if sample_fields:
+            fields[i] = sample_fields
+        if values is None:
+            val[i] = _raw_sample_value(payload_type, parts)
+        else:
+            values[i] = _raw_sample_value(payload_type, parts)
+
+    if values is not None:
+        dtype = _PB_FIXED_DTYPES.get(payload_type)
+        if dtype and payload_type in _PB_SCALAR_TYPES:
+            val = np.array(values, dtype=dtype)
+        elif dtype and n and len({len(v) for v in values}) == 1:
+            val = np.stack(values)
+        elif dtype:
+            val = np.empty(n, dtype=object)
+            val[:] = values
+        else:
+            val = _as_column(values)
+    seconds = seconds + calendar.timegm((year, 1, 1, 0, 0, 0))
+    return seconds, nanos, val, severity, status, fields
+
+
+def _decode_raw_response(content: bytes) -> ColumnarArchiveDataHandler:
+    """
+    Decode a getData.raw response, a sequence of chunks separated by empty
+    lines. Each chunk starts with a PayloadInfo header (PV, payload type,
+    year) followed by one escaped protobuf sample per line.
+    """
+    chunks: List[Tuple[int, int, List[bytes]]] = []
+    meta: Dict[str, Any] = {}
+    expect_header = True
+    for line in content.split(b"\n"):
+        if not line:
+            expect_header = True
+            continue
+        if expect_header:
+            payload_type = year = None
+            for field, _, data in _pb_fields(_unescape_raw_line(line)):
+                if field == 1:
+                    payload_type = data
+                elif field == 2:
+                    meta["name"] = data.decode()
+                elif field == 3:
+                    year = data
+                elif field == 15:
+                    name, value = _decode_field_value(data)
+                    meta[name] = value
+            if payload_type is None or year is None:
+                raise ValueError("PB chunk header without payload type or year")
+            chunks.append((payload_type, year, []))
+            expect_header = False
+        else:
+            chunks[-1][2].append(line)
+
+    escaped = b"\x1b" in content
+    handlers = []
+    for payload_type, year, lines in chunks:
+        secs, nanos, val, severity, status, fields = _decode_raw_chunk(
+            payload_type, year, lines, escaped=escaped
+        )
+        handlers.append(
+            ColumnarArchiveDataHandler(
+                secs=secs,
+                nanos=nanos,
+                val=val,
+                severity=severity,
+                status=status,
+                meta=meta,
+                fields=fields,
+            )
+        )
+    if not handlers:
+        return ColumnarArchiveDataHandler(meta=meta or None)
+    if len(handlers) == 1:
+        return handlers[0]
+    offsets = np.cumsum([0] + [len(h) for h in handlers])
+    return ColumnarArchiveDataHandler(
+        secs=np.concatenate([h.secs for h in handlers]),
+        nanos=np.concatenate([h.nanos for h in handlers]),
+        val=_concatenate_columns([h.val for h in handlers]),
+        severity=np.concatenate([h.severity for h in handlers]),
+        status=np.concatenate([h.status for h in handlers]),
+        meta=meta,
+        fields={
+            int(offset) + index: value
+            for h, offset in zip(handlers, offsets)
+            for index, value in h.fields.items()
+        },
+    )
 
-    # getData.json silently drops all but the first PV
-    suffix = RANGE_MULTI_PV_SUFFIX if len(pv_list) > 1 else RANGE_RESULT_SUFFIX
-    url = ARCHIVER_URL_FORMATTER.format(SUFFIX=suffix)
-    params = {
-        "pv": query_pvs,
-        "from": _iso_with_offset(start_time, start_off),
-        "to": _iso_with_offset(end_time, end_off),
-    }
 
+def _get_range_response(
+    url: str,
+    params: Dict[str, Any],
+    timeout: int,
+    pv_count: int,
+    start_time: datetime,
+    end_time: datetime,
+    obs: Union[_Observation, _NullObservation] = _NULL_OBSERVATION,
+) -> requests.Response:
     session = _get_session()
     try:
         response = session.get(url=url, timeout=timeout, params=params)
+        obs.received_response(response)
         response.raise_for_status()
     except requests.exceptions.Timeout as exc:
         raise ArchiverTimeoutError(
-            f"Timeout fetching {len(pv_list)} PVs [{start_time} - {end_time}]"
+            f"Timeout fetching {pv_count} PVs [{start_time} - {end_time}]"
         ) from exc
     except requests.exceptions.ConnectionError as exc:
         raise ArchiverConnectionError(
-            f"Connection error fetching {len(pv_list)} PVs"
+            f"Connection error fetching {pv_count} PVs"
         ) from exc
     except requests.exceptions.HTTPError as exc:
         logger.error(
             "HTTP %s for %d PVs: %s",
             response.status_code,
-            len(pv_list),
+            pv_count,
             response.text[:200],
         )
         raise ArchiverError(
-            f"HTTP {response.status_code} fetching {len(pv_list)} PVs"
+            f"HTTP {response.status_code} fetching {pv_count} PVs"
         ) from exc
+    return response
+
 
-    result: Dict[str, ArchiveDataHandler] = {}
+def _fetch_pv_range_raw(
+    pv: str,
+    start_time: datetime,
+    end_time: datetime,
+    timeout: int,
+    operator: Optional[str] = None,
+) -> ColumnarArchiveDataHandler:
+    """Fetch one PV in the appliance's native PB/raw format"""
+    url, params = _raw_range_request(pv, start_time, end_time, operator)
+    with _observe(RANGE_RAW_SUFFIX, 1) as obs:
+        response = _get_range_response(
+            url, params, timeout, 1, start_time, end_time, obs
+        )
+        handler = _parse_raw_range(response.content)
+        obs.parsed(len(handler))
+    return handler
+
+
+def _raw_range_request(
+    pv: str,
+    start_time: datetime,
+    end_time: datetime,
+    operator: Optional[str] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    params = {
+        "pv": f"{operator}({pv})" if operator else pv,
+        "from": _iso_with_offset(start_time, _get_utc_offset(start_time)),
+        "to": _iso_with_offset(end_time, _get_utc_offset(end_time)),
+    }
+    return ARCHIVER_URL_FORMATTER.format(SUFFIX=RANGE_RAW_SUFFIX), params
+
+
+def _parse_raw_range(content: bytes) -> ColumnarArchiveDataHandler:
     try:
-        json_data = json.loads(response.text)
+        return _decode_raw_response(content)
+    except IndexError as exc:
+        raise ValueError(f"Truncated PB payload: {exc}") from exc
+    except TypeError as exc:
+        # e.g. a field with an unexpected wire type, so JSON is used instead
+        raise ValueError(f"Unexpected PB payload: {exc}") from exc
+
+
+def _json_range_request(
+    pv_list: List[str],
+    start_time: datetime,
+    end_time: datetime,
+    operator: Optional[str] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    query_pvs = [f"{operator}({pv})" for pv in pv_list] if operator else pv_list
+    # getData.json silently drops all but the first PV
+    suffix = RANGE_MULTI_PV_SUFFIX if len(pv_list) > 1 else RANGE_RESULT_SUFFIX
+    params = {
+        "pv": list(query_pvs),
+        "from": _iso_with_offset(start_time, _get_utc_offset(start_time)),
+        "to": _iso_with_offset(end_time, _get_utc_offset(end_time)),
+    }
+    return ARCHIVER_URL_FORMATTER.format(SUFFIX=suffix), params
+
+
+def _parse_json_range(
+    text: str, pv_list: List[str], operator: Optional[str] = None
+) -> Dict[str, ColumnarArchiveDataHandler]:
+    if operator:
+        wrapped_to_raw = {f"{operator}({pv})": pv for pv in pv_list}
+    else:
+        wrapped_to_raw = {pv: pv for pv in pv_list}
+
+    result: Dict[str, ColumnarArchiveDataHandler] = {}
+    try:
+        json_data = json.loads(text)
         for element in json_data:
-            meta_name = element.get("meta", {}).get("name", "")
+            meta = element.get("meta", {})
+            meta_name = meta.get("name", "")
             raw_pv = wrapped_to_raw.get(meta_name, meta_name)
-            handler = ArchiveDataHandler()
-            for datum in element.get("data", []):
-                handler.value_list.append(ArchiverValue(**datum))
-            result[raw_pv] = handler
+            result[raw_pv] = ColumnarArchiveDataHandler.from_records(
+                element.get("data", []), meta=meta
+            )
     except (ValueError, KeyError, IndexError) as exc:
         logger.warning("JSON parse error for %d PVs: %s", len(pv_list), exc)
+    return result
+
+
+def _fetch_pv_batch_range(
+    pv_list: List[str],
+    start_time: datetime,
+    end_time: datetime,
+    timeout: int,
+    operator: Optional[str] = None,
+    retrieval_format: str = "json",
+) -> Dict[str, ColumnarArchiveDataHandler]:
+    if retrieval_format not in RETRIEVAL_FORMATS:
+        raise ValueError(
+            f"retrieval_format must be one of {RETRIEVAL_FORMATS}, "
+            f"got {retrieval_format!r}"
+        )
+
+    if retrieval_format == "raw":
+        # getData.raw serves one PV per request; anything the raw path cannot
+        # serve (HTTP errors, V4 generic bytes, malformed payloads) is
+        # retried below in one JSON request
+        result: Dict[str, ColumnarArchiveDataHandler] = {}
+        fallback = []
+        for pv in pv_list:
+            try:
+                result[pv] = _fetch_pv_range_raw(
+                    pv, start_time, end_time, timeout, operator=operator
+                )
+            except (ArchiverTimeoutError, ArchiverConnectionError):
+                raise
+            except (ArchiverError, ValueError) as exc:
+                logger.info("Raw retrieval failed for %s, using JSON: %s", pv, exc)
+                fallback.append(pv)
+        if fallback:
+            result.update(
+                _fetch_pv_batch_range(
+                    fallback, start_time, end_time, timeout, operator=operator
+                )
+            )
+        return result
+
+    url, params = _json_range_request(pv_list, start_time, end_time, operator)
+    with _observe(_endpoint(url), len(pv_list)) as obs:
+        response = _get_range_response(
+            url, params, timeout, len(pv_list), start_time, end_time, obs
+        )
+        result = _parse_json_range(response.text, pv_list, operator)
+        obs.parsed(sum(len(handler) for handler in result.values()))
+    return result
+
+
+def _shard_pv_list(
+    pv_list: List[str],
+    operator: Optional[str] = None,
+    max_url_length: Optional[int] = None,
+    max_pvs: Optional[int] = None,
+) -> List[List[str]]:
+    """
+    Split pv_list into groups whose getDataForPVs.json URL stays under
+    max_url_length and that hold at most max_pvs PVs each.
+    """
+    max_url_length = max_url_length or MAX_URL_LENGTH
+    max_pvs = max_pvs or MAX_PVS_PER_REQUEST
+    url = ARCHIVER_URL_FORMATTER.format(SUFFIX=RANGE_MULTI_PV_SUFFIX)
+    # "?from=<iso time with offset>&to=<...>", with the colons percent-encoded
+    fixed = len(url) + 2 * len("&from=") + 2 * 40
+    shards: List[List[str]] = []
+    current: List[str] = []
+    length = fixed
+    for pv in pv_list:
+        query_pv = f"{operator}({pv})" if operator else pv
+        cost = len("&pv=") + len(quote_plus(query_pv))
+        if current and (len(current) >= max_pvs or length + cost > max_url_length):
+            shards.append(current)
+            current, length = [], fixed
+        current.append(pv)
+        length += cost
+    if current:
+        shards.append(current)
+    return shards
+
+
+def _fetch_pv_range_sharded(
+    pv_list: List[str],
+    start_time: datetime,
+    end_time: datetime,
+    timeout: int,
+    operator: Optional[str] = None,
+    retrieval_format: str = "json",
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+) -> ArchiveResult:
+    """
+    Fetch a range for any number of PVs by splitting them into shards that
+    run concurrently on up to max_workers threads. A failing shard only
+    loses its own PVs: they are recorded in the result's errors and the
+    rest is returned. Only if every shard fails is the last error raised.
+    progress_callback gets (pvs_done, pvs_total) as each shard lands.
+    """
+    if retrieval_format not in RETRIEVAL_FORMATS:
+        raise ValueError(
+            f"retrieval_format must be one of {RETRIEVAL_FORMATS}, "
+            f"got {retrieval_format!r}"
+        )
+    # a PV listed twice is fetched once, so failures count distinct PVs
+    pv_list = list(dict.fromkeys(pv_list))
+    if retrieval_format == "raw":
+        # raw is one PV per request anyway, so every PV is its own shard
+        shards = [[pv] for pv in pv_list]
+    else:
+        shards = _shard_pv_list(pv_list, operator)
+
+    result = ArchiveResult()
+    last_error = None
+    done = 0
+    workers = max(1, min(max_workers, len(shards)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        future_to_shard = {
+            pool.submit(
+                _fetch_pv_batch_range,
+                shard,
+                start_time,
+                end_time,
+                timeout,
+                operator=operator,
+                retrieval_format=retrieval_format,
+            ): shard
+            for shard in shards
+        }
+        for future in as_completed(future_to_shard):
+            shard = future_to_shard[future]
+            try:
+                result.update(future.result())
+            except ArchiverError as exc:
+                logger.warning(
+                    "Failed to fetch shard of %d PVs starting at %s: %s",
+                    len(shard),
+                    shard[0],
+                    exc,
+                )
+                result.errors.update({pv: exc for pv in shard})
+                last_error = exc
+            done += len(shard)
+            if progress_callback:
+                progress_callback(done, len(pv_list))
 
+    if last_error is not None and len(result.errors) == len(pv_list):
+        raise last_error
     return result
 
 
@@ -228,36 +1328,53 @@ def get_data_at_time(
     timeout=_UNSET,
 ) -> Dict[str, ArchiverValue]:
     timeout = _resolve_timeout(timeout)
-    offset = _get_utc_offset(time_requested)
+    url, data = _data_at_time_request(pv_list, time_requested)
+
+    session = _get_session()
+    with _observe(_endpoint(url), len(pv_list)) as obs:
+        try:
+            response = session.post(url=url, data=data, timeout=timeout)
+            obs.received_response(response)
+            response.raise_for_status()
+        except requests.exceptions.Timeout as exc:
+            raise ArchiverTimeoutError(
+                f"Timeout in get_data_at_time for {len(pv_list)} PVs "
+                f"at {time_requested}"
+            ) from exc
+        except requests.exceptions.ConnectionError as exc:
+            raise ArchiverConnectionError(
+                "Connection error in get_data_at_time"
+            ) from exc
+        except requests.exceptions.HTTPError:
+            logger.warning(
+                "HTTP %s in get_data_at_time for %s at %s",
+                response.status_code,
+                pv_list,
+                time_requested,
+            )
+            return {}
+
+        result = _parse_data_at_time(response.text, pv_list, time_requested)
+        obs.parsed(len(result))
+    return result
+
+
+def _data_at_time_request(
+    pv_list: List[str], time_requested: datetime
+) -> Tuple[str, Dict[str, str]]:
     suffix = SINGLE_RESULT_SUFFIX.format(
         TIME=time_requested.isoformat(timespec="microseconds"),
-        OFFSET=offset,
+        OFFSET=_get_utc_offset(time_requested),
     )
-    url = ARCHIVER_URL_FORMATTER.format(SUFFIX=suffix)
-    data = {"pv": ",".join(pv_list)}
+    return ARCHIVER_URL_FORMATTER.format(SUFFIX=suffix), {"pv": ",".join(pv_list)}
 
-    session = _get_session()
-    try:
-        response = session.post(url=url, data=data, timeout=timeout)
-        response.raise_for_status()
-    except requests.exceptions.Timeout as exc:
-        raise ArchiverTimeoutError(
-            f"Timeout in get_data_at_time for {len(pv_list)} PVs at {time_requested}"
-        ) from exc
-    except requests.exceptions.ConnectionError as exc:
-        raise ArchiverConnectionError("Connection error in get_data_at_time") from exc
-    except requests.exceptions.HTTPError:
-        logger.warning(
-            "HTTP %s in get_data_at_time for %s at %s",
-            response.status_code,
-            pv_list,
-            time_requested,
-        )
-        return {}
 
+def _parse_data_at_time(
+    text: str, pv_list: List[str], time_requested: datetime
+) -> Dict[str, ArchiverValue]:
     result: Dict[str, ArchiverValue] = {}
     try:
-        json_data = json.loads(response.text)
+        json_data = json.loads(text)
         for pv, pv_data in json_data.items():
             result[pv] = ArchiverValue(**pv_data)
     except (ValueError, KeyError) as exc:
@@ -267,10 +1384,95 @@ def get_data_at_time(
             time_requested,
             exc,
         )
+    return result
+
+
+def _to_epoch_ns(dt: datetime) -> int:
+    """Epoch ns for a naive datetime in Pacific time (as the archiver reads it)"""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=_PACIFIC)
+    return (dt - _EPOCH) // timedelta(microseconds=1) * 1000
 
+
+def _from_epoch_ns(epoch_ns: int) -> datetime:
+    """Naive Pacific datetime for epoch ns, the inverse of _to_epoch_ns"""
+    aware = _EPOCH + timedelta(microseconds=int(epoch_ns) // 1000)
+    return aware.astimezone(_PACIFIC).replace(tzinfo=None)
+
+
+def _resample_grid(
+    start_time: datetime, end_time: datetime, time_delta: timedelta
+) -> np.ndarray:
+    """Epoch ns of start_time, start_time + time_delta, ... before end_time"""
+    delta_us = time_delta // timedelta(microseconds=1)
+    span_us = (end_time - start_time) // timedelta(microseconds=1)
+    if delta_us <= 0 or span_us <= 0:
+        return np.empty(0, dtype=np.int64)
+    n_samples = -(-span_us // delta_us)
+    return _to_epoch_ns(start_time) + np.arange(n_samples, dtype=np.int64) * (
+        delta_us * 1000
+    )
+
+
+def _sample_times(
+    start_time: datetime, end_time: datetime, time_delta: timedelta
+) -> List[datetime]:
+    sample_times: List[datetime] = []
+    curr = start_time
+    while curr < end_time:
+        sample_times.append(curr)
+        curr += time_delta
+    return sample_times
+
+
+def _resample_time_interval(
+    pv_list: List[str],
+    start_time: datetime,
+    end_time: datetime,
+    time_delta: timedelta,
+    timeout: int,
+    max_workers: int,
+    chunk_size: Optional[timedelta],
+) -> DefaultDict[str, ArchiveDataHandler]:
+    result = ArchiveResult(ArchiveDataHandler)
+    grid_ns = _resample_grid(start_time, end_time, time_delta)
+    if not len(grid_ns) or not pv_list:
+        return result
+
+    raw = get_values_over_time_range(
+        pv_list,
+        start_time,
+        end_time,
+        timeout=timeout,
+        max_workers=max_workers,
+        chunk_size=chunk_size,
+    )
+    _resample_onto(raw, pv_list, grid_ns, result)
     return result
 
 
+def _resample_onto(
+    raw: ArchiveResult,
+    pv_list: List[str],
+    grid_ns: np.ndarray,
+    result: ArchiveResult,
+) -> None:
+    """
+    Fill result with raw sampled on grid_ns. Failed PVs are logged and kept
+    in result.errors; if every PV failed, the last error is raised, as when
+    every getDataAtTime request fails.
+    """
+    result.errors.update(raw.errors)
+    for pv, error in raw.errors.items():
+        logger.warning("Failed to fetch %s for resampling: %s", pv, error)
+    if raw.errors and all(pv in raw.errors for pv in pv_list):
+        raise raw.errors[pv_list[-1]]
+    for pv in pv_list:
+        resampled = raw[pv].asof(grid_ns)
+        if len(resampled):
+            result[pv] = resampled
+
+
 def get_data_with_time_interval(
     pv_list: List[str],
     start_time: datetime,
@@ -278,15 +1480,31 @@ def get_data_with_time_interval(
     time_delta: timedelta,
     timeout=_UNSET,
     max_workers: int = DEFAULT_MAX_WORKERS,
+    resample: bool = False,
+    chunk_size: Optional[timedelta] = None,
 ) -> DefaultDict[str, ArchiveDataHandler]:
+    """
+    Sample pv_list every time_delta from start_time up to end_time.
+
+    By default one getDataAtTime request is sent per sample time. With
+    resample=True the raw range is fetched once (in chunk_size windows if
+    given) and the value at each sample time is found locally with a
+    vectorized searchsorted, which is far cheaper for dense grids.
+    """
     timeout = _resolve_timeout(timeout)
 
-    sample_times: List[datetime] = []
-    curr = start_time
-    while curr < end_time:
-        sample_times.append(curr)
-        curr += time_delta
+    if resample:
+        return _resample_time_interval(
+            pv_list,
+            start_time,
+            end_time,
+            time_delta,
+            timeout,
+            max_workers,
+            chunk_size,
+        )
 
+    sample_times = _sample_times(start_time, end_time, time_delta)
     if not sample_times:
         return defaultdict(ArchiveDataHandler)
 
@@ -320,6 +1538,124 @@ def get_data_with_time_interval(
     return result
 
 
+def _time_windows(
+    start_time: datetime, end_time: datetime, chunk_size: timedelta
+) -> List[Tuple[datetime, datetime]]:
+    if chunk_size <= timedelta(0):
+        raise ValueError(f"chunk_size must be positive, got {chunk_size}")
+    windows = []
+    window_start = start_time
+    while window_start < end_time:
+        window_end = min(window_start + chunk_size, end_time)
+        windows.append((window_start, window_end))
+        window_start = window_end
+    return windows
+
+
+def iter_values_over_time_range(
+    pv_list: List[str],
+    start_time: datetime,
+    end_time: datetime,
+    chunk_size: timedelta,
+    timeout=_UNSET,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    use_operator: Optional[str] = None,
+    retrieval_format: str = "json",
+) -> Iterator[Tuple[datetime, datetime, ArchiveResult]]:
+    """
+    Fetch [start_time, end_time) in windows of chunk_size and yield
+    (window_start, window_end, {pv: handler}) for each window in time order,
+    as soon as that window has arrived. At most max_workers windows are in
+    flight at once, so memory stays bounded by the consumer rather than by
+    the length of the range. Each window is an ArchiveResult, so PVs whose
+    shard failed in that window are listed in its errors; a window where
+    every shard failed comes back empty with all PVs in its errors, and the
+    windows after it are still fetched.
+    """
+    timeout = _resolve_timeout(timeout)
+    windows = _time_windows(start_time, end_time, chunk_size)
+    if not pv_list or not windows:
+        return
+
+    workers = max(1, min(max_workers, len(windows)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        remaining = iter(windows)
+
+        def submit_next() -> None:
+            window = next(remaining, None)
+            if window is not None:
+                # windows already run in parallel, so shards within one
+                # window are fetched one after another
+                future = pool.submit(
+                    _fetch_pv_range_sharded,
+                    pv_list,
+                    window[0],
+                    window[1],
+                    timeout,
+                    operator=use_operator,
+                    retrieval_format=retrieval_format,
+                    max_workers=1,
+                )
+                pending.append((window, future))
+
+        for _ in range(workers):
+            submit_next()
+
+        try:
+            while pending:
+                (window_start, window_end), future = pending.popleft()
+                try:
+                    batch = future.result()
+                except ArchiverError as exc:
+                    logger.warning(
+                        "Failed to fetch %s to %s: %s", window_start, window_end, exc
+                    )
+                    batch = ArchiveResult()
+                    batch.errors.update({pv: exc for pv in pv_list})
+                submit_next()
+                yield window_start, window_end, batch
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+
+def plan_operator(
+    start_time: datetime,
+    end_time: datetime,
+    max_points: Optional[int] = None,
+    target_resolution: Optional[timedelta] = None,
+    binning: str = "mean",
+) -> Tuple[Optional[str], Optional[timedelta]]:
+    """
+    Pick the post-processing operator for a range query, so the appliance
+    bins the data instead of sending every sample.
+
+    The bin is the smallest entry of BIN_SIZES (or whole days beyond those)
+    that keeps [start_time, end_time] under max_points bins and is no finer
+    than target_resolution. binning is the operator family, e.g. "mean" or
+    "max". Returns (operator, bin_size), or (None, None) when the raw data
+    is already coarse enough, i.e. the bin would be under a second.
+    """
+    if binning not in BINNING_OPERATORS:
+        raise ValueError(f"binning must be one of {BINNING_OPERATORS}, got {binning!r}")
+    if max_points is not None and max_points <= 0:
+        raise ValueError(f"max_points must be positive, got {max_points}")
+    span = (end_time - start_time).total_seconds()
+    needed = 0.0
+    if max_points:
+        needed = span / max_points
+    if target_resolution:
+        needed = max(needed, target_resolution.total_seconds())
+    if needed < 1:
+        return None, None
+
+    bin_secs = next((size for size in BIN_SIZES if size >= needed), None)
+    if bin_secs is None:
+        bin_secs = -(-int(np.ceil(needed)) // 86400) * 86400
+    return f"{binning}_{bin_secs}", timedelta(seconds=bin_secs)
+
+
 def get_values_over_time_range(
     pv_list: List[str],
     start_time: datetime,
@@ -329,8 +1665,77 @@ def get_values_over_time_range(
     max_workers: int = DEFAULT_MAX_WORKERS,
     use_operator: Optional[str] = None,
     progress_callback: Optional[Callable[[int, int], None]] = None,
-) -> DefaultDict[str, ArchiveDataHandler]:
+    chunk_size: Optional[timedelta] = None,
+    resample: bool = False,
+    cache=None,
+    retrieval_format: str = "json",
+    max_points: Optional[int] = None,
+    target_resolution: Optional[timedelta] = None,
+    binning: str = "mean",
+) -> ArchiveResult:
+    """
+    Fetch every sample archived for pv_list between start_time and end_time.
+
+    If time_delta is given, sample the PVs on that grid instead (see
+    get_data_with_time_interval, which resample is passed on to; resample
+    without time_delta raises ValueError). If chunk_size is given, the range
+    is split into windows of that length which are fetched concurrently on
+    up to max_workers threads and merged back in time order. A window that fails for some or all PVs leaves a gap in
+    their data and lists them in the result's errors; only if every window
+    fails completely is the last error raised.
+
+    Passing an ArchiverCache (see lcls_tools.common.data.archiver_cache) as
+    cache serves raw range requests from disk and only fetches the parts of
+    the range that are not stored yet.
+
+    retrieval_format="raw" asks the appliance for its native PB/raw format,
+    which is smaller on the wire and decodes directly into NumPy columns;
+    PVs it cannot serve that way fall back to JSON.
+
+    Long PV lists are split into shards (see MAX_URL_LENGTH and
+    MAX_PVS_PER_REQUEST) that are fetched concurrently. PVs whose shard
+    failed are listed in the returned ArchiveResult's errors and come back
+    empty.
+
+    progress_callback is called with (pvs_done, pvs_total) as data lands,
+    counting each PV once per window: pvs_total is the number of distinct
+    PVs in pv_list times the number of chunk_size windows (one window
+    without chunk_size). Without chunk_size it is called as each shard
+    lands, with chunk_size as each window does.
+
+    Instead of picking use_operator by hand, pass max_points and/or
+    target_resolution and the binning operator is chosen from the span (see
+    plan_operator); the choice is returned in the result's meta as
+    "operator" and "bin_size".
+    """
     timeout = _resolve_timeout(timeout)
+    pv_list = list(dict.fromkeys(pv_list))
+
+    if resample and not time_delta:
+        raise ValueError("resample needs a time_delta to sample onto")
+    if max_points or target_resolution:
+        if use_operator or time_delta:
+            raise ValueError(
+                "max_points/target_resolution can't be combined with "
+                "use_operator or time_delta"
+            )
+        use_operator, bin_size = plan_operator(
+            start_time, end_time, max_points, target_resolution, binning
+        )
+        result = get_values_over_time_range(
+            pv_list,
+            start_time,
+            end_time,
+            timeout=timeout,
+            max_workers=max_workers,
+            use_operator=use_operator,
+            progress_callback=progress_callback,
+            chunk_size=chunk_size,
+            cache=cache,
+            retrieval_format=retrieval_format,
+        )
+        result.meta.update(operator=use_operator, bin_size=bin_size)
+        return result
 
     if time_delta:
         return get_data_with_time_interval(
@@ -340,26 +1745,211 @@ def get_values_over_time_range(
             time_delta,
             timeout=timeout,
             max_workers=max_workers,
+            resample=resample,
+            chunk_size=chunk_size,
         )
 
-    result: DefaultDict[str, ArchiveDataHandler] = defaultdict(ArchiveDataHandler)
+    result = ArchiveResult()
     if not pv_list:
         return result
 
-    batch = _fetch_pv_batch_range(
-        pv_list,
-        start_time,
-        end_time,
-        timeout,
-        operator=use_operator,
-    )
-    result.update(batch)
+    if cache is not None:
+        return cache.get_values_over_time_range(
+            pv_list,
+            start_time,
+            end_time,
+            timeout=timeout,
+            max_workers=max_workers,
+            use_operator=use_operator,
+            progress_callback=progress_callback,
+            chunk_size=chunk_size,
+            retrieval_format=retrieval_format,
+        )
+
+    if chunk_size:
+        windows = _time_windows(start_time, end_time, chunk_size)
+        chunks: DefaultDict[str, List[ColumnarArchiveDataHandler]] = defaultdict(list)
+        failed_windows = []
+        for done, (_, _, batch) in enumerate(
+            iter_values_over_time_range(
+                pv_list,
+                start_time,
+                end_time,
+                chunk_size,
+                timeout=timeout,
+                max_workers=max_workers,
+                use_operator=use_operator,
+                retrieval_format=retrieval_format,
+            ),
+            start=1,
+        ):
+            for pv, handler in batch.items():
+                chunks[pv].append(handler)
+            result.errors.update(batch.errors)
+            if len(batch.errors) == len(pv_list):
+                failed_windows.append(batch.errors[pv_list[-1]])
+            if progress_callback:
+                progress_callback(done * len(pv_list), len(windows) * len(pv_list))
+        if len(failed_windows) == len(windows):
+            raise failed_windows[-1]
+        for pv, handlers in chunks.items():
+            result[pv] = ColumnarArchiveDataHandler.concatenate(handlers)
+    else:
+        batch = _fetch_pv_range_sharded(
+            pv_list,
+            start_time,
+            end_time,
+            timeout,
+            operator=use_operator,
+            retrieval_format=retrieval_format,
+            max_workers=max_workers,
+            progress_callback=progress_callback,
+        )
+        result.update(batch)
+        result.errors.update(batch.errors)
 
     for pv in pv_list:
         if pv not in result:
-            result[pv] = ArchiveDataHandler()
-
-    if progress_callback:
-        progress_callback(len(pv_list), len(pv_list))
+            result[pv] = ColumnarArchiveDataHandler()
 
     return result
+
+
+ALIGN_MODES = ("previous", "nearest", "linear")
+
+
+def align_handlers(
+    handlers: List[ColumnarArchiveDataHandler],
+    epoch_ns: np.ndarray,
+    mode: str = "previous",
+    mask_invalid: bool = True,
+) -> np.ndarray:
+    """
+    Put the samples of several scalar PVs onto one time axis.
+
+    Returns a float array of shape (len(epoch_ns), len(handlers)). mode picks
+    the value for each time: "previous" takes the last sample at or before
+    it, "nearest" the closest sample either side and "linear" interpolates
+    between the samples around it. Times with no sample to use are NaN, and
+    so are values that come from a sample with INVALID severity if
+    mask_invalid is set.
+
+    All PVs are merged with a single searchsorted: sample and query times
+    are replaced by their rank on the union of all times, and each PV's
+    ranks are shifted into a block of its own so one sorted key array holds
+    every PV.
+    """
+    if mode not in ALIGN_MODES:
+        raise ValueError(f"mode must be one of {ALIGN_MODES}, got {mode!r}")
+    epoch_ns = np.asarray(epoch_ns, dtype=np.int64)
+    n_pvs = len(handlers)
+    out = np.full((len(epoch_ns), n_pvs), np.nan)
+    if not n_pvs or not len(epoch_ns):
+        return out
+
+    for handler in handlers:
+        if len(handler) and (
+            handler.val.ndim != 1 or handler.val.dtype.kind not in "biuf"
+        ):
+            raise ValueError(
+                f"Only numeric scalar PVs can be aligned, "
+                f"got {handler.val.dtype} values of shape {handler.val.shape}"
+            )
+    counts = np.array([len(h) for h in handlers], dtype=np.int64)
+    if not counts.sum():
+        return out
+    ends = np.cumsum(counts)
+    starts = ends - counts
+    times = np.concatenate([h.epoch_ns for h in handlers])
+    values = np.concatenate([h.val.astype(np.float64) for h in handlers])
+    if mask_invalid:
+        values[~np.concatenate([h.valid_mask for h in handlers])] = np.nan
+
+    _, ranks = np.unique(np.concatenate([times, epoch_ns]), return_inverse=True)
+    ranks = ranks.reshape(-1).astype(np.int64)
+    block = ranks.max() + 1
+    sample_keys = np.repeat(np.arange(n_pvs, dtype=np.int64), counts) * block
+    sample_keys += ranks[: len(times)]
+    query_keys = (
+        np.arange(n_pvs, dtype=np.int64)[np.newaxis, :] * block
+        + ranks[len(times) :, np.newaxis]
+    )
+
+    # last sample at or before, and first sample at or after, each time
+    before = np.searchsorted(sample_keys, query_keys, side="right") - 1
+    after = np.searchsorted(sample_keys, query_keys, side="left")
+    has_before = before >= starts
+    has_after = after < ends
+    before = np.clip(before, 0, len(times) - 1)
+    after = np.clip(after, 0, len(times) - 1)
+    query = epoch_ns[:, np.newaxis]
+
+    if mode == "previous":
+        np.copyto(out, values[before], where=has_before)
+    elif mode == "nearest":
+        use_after = has_after & (
+            ~has_before | (times[after] - query < query - times[before])
+        )
+        np.copyto(out, values[before], where=has_before)
+        np.copyto(out, values[after], where=use_after)
+    else:
+        both = has_before & has_after
+        span = (times[after] - times[before]).astype(np.float64)
+        weight = np.divide(
+            (query - times[before]).astype(np.float64),
+            span,
+            out=np.zeros_like(span),
+            where=span > 0,
+        )
+        interpolated = values[before] + weight * (values[after] - values[before])
+        np.copyto(out, interpolated, where=both)
+    return out
+
+
+def get_aligned_values_over_time_range(
+    pv_list: List[str],
+    start_time: datetime,
+    end_time: datetime,
+    time_delta: Optional[timedelta] = None,
+    mode: str = "previous",
+    mask_invalid: bool = True,
+    as_dataframe: bool = False,
+    **kwargs: Any,
+):
+    """
+    Fetch pv_list like get_values_over_time_range and return it as one
+    table on a common time axis, ready for correlating PVs.
+
+    The time axis is start_time, start_time + time_delta, ... if time_delta
+    is given, otherwise every time any of the PVs was archived within
+    [start_time, end_time]. See align_handlers for mode and mask_invalid.
+    Other keyword arguments (timeout, use_operator, chunk_size, cache, ...)
+    are passed on to get_values_over_time_range.
+
+    :return: (times, values), with times a UTC datetime64[ns] array and
+        values of shape (len(times), len(pv_list)); or, with as_dataframe,
+        a pandas DataFrame with one column per PV indexed by Pacific time
+    """
+    raw = get_values_over_time_range(pv_list, start_time, end_time, **kwargs)
+    handlers = [raw[pv] for pv in pv_list]
+    if time_delta:
+        epoch_ns = _resample_grid(start_time, end_time, time_delta)
+    else:
+        all_ns = np.concatenate(
+            [h.epoch_ns for h in handlers] + [np.empty(0, np.int64)]
+        )
+        epoch_ns = np.unique(
+            all_ns[
+                (all_ns >= _to_epoch_ns(start_time))
+                & (all_ns <= _to_epoch_ns(end_time))
+            ]
+        )
+    values = align_handlers(handlers, epoch_ns, mode=mode, mask_invalid=mask_invalid)
+    times = epoch_ns.astype("datetime64[ns]")
+    if not as_dataframe:
+        return times, values
+
+    import pandas as pd
+
+    index = pd.DatetimeIndex(times, tz="UTC", name="time").tz_convert(_PACIFIC)
+    return pd.DataFrame(values, index=index, columns=list(pv_list))
@@ -0,0 +1,440 @@
+"""
+asyncio client for the SLAC LCLS-II Archiver Appliance.
+
+Mirrors get_data_at_time, get_values_over_time_range and
+get_data_with_time_interval from lcls_tools.common.data.archiver, but every
+request runs on the event loop through one shared aiohttp connection pool,
+so thousands of lookups can be in flight without a thread per request.
+
+    async with AsyncArchiverClient(max_concurrency=64) as client:
+        values = await asyncio.gather(
+            *(client.get_data_at_time(pv_list, t) for t in times)
+        )
+
+It needs aiohttp, which comes with the async extra:
+
+    pip install "lcls-tools[async]"
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Callable, DefaultDict, Dict, List, Optional
+
+import aiohttp
+
+from lcls_tools.common.data.archiver import (
+    ArchiveDataHandler,
+    ArchiveResult,
+    ArchiverConnectionError,
+    ArchiverError,
+    ArchiverTimeoutError,
+    ArchiverValue,
+    ColumnarArchiveDataHandler,
+    RETRIEVAL_FORMATS,
+    _UNSET,
+    _NULL_OBSERVATION,
+    _data_at_time_request,
+    _endpoint,
+    _json_range_request,
+    _observe,
+    _parse_data_at_time,
+    _parse_json_range,
+    _parse_raw_range,
+    plan_operator,
+    _raw_range_request,
+    _resample_grid,
+    _resample_onto,
+    _resolve_timeout,
+    _sample_times,
+    _shard_pv_list,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENCY: int = 32
+# same policy as the urllib3 Retry mounted on the synchronous session
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RETRIES: int = 3
+BACKOFF_FACTOR: float = 1.0
+
+
+class AsyncArchiverClient:
+    """
+    Holds the connection pool and the concurrency limit shared by every
+    request made through it. Use it as an async context manager, or call
+    close() when done.
+
+    Cancelling a task awaiting any of the methods cancels its outstanding
+    requests. timeout applies to each HTTP request on its own, not to the
+    time spent waiting for a free slot.
+
+    :param max_concurrency: requests allowed in flight at once
+    :param timeout: per-request timeout in seconds (archiver.TIMEOUT if unset)
+    :param retries: retries for HTTP 429/5xx, with exponential backoff
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        timeout=_UNSET,
+        retries: int = RETRIES,
+    ):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self) -> "AsyncArchiverClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # created on first use so it binds to the loop the client runs on
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency)
+            )
+        return self._session
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # a semaphore belongs to the loop it is first used on, so the client
+        # gets a new one if it is used from another loop (e.g. asyncio.run)
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        timeout,
+        description: str,
+        obs=_NULL_OBSERVATION,
+        **kwargs: Any,
+    ) -> bytes:
+        timeout = aiohttp.ClientTimeout(
+            total=_resolve_timeout(self.timeout if timeout is _UNSET else timeout)
+        )
+        for attempt in range(self.retries + 1):
+            async with self._get_semaphore():
+                # latency counts from here, not the wait for a slot or backoff
+                obs.sending()
+                try:
+                    async with self._get_session().request(
+                        method, url, timeout=timeout, **kwargs
+                    ) as response:
+                        retry = (
+                            response.status in RETRY_STATUSES and attempt < self.retries
+                        )
+                        if not retry:
+                            body = await response.read()
+                            obs.received(response.status, len(body), attempt)
+                            response.raise_for_status()
+                            return body
+                except asyncio.TimeoutError as exc:
+                    raise ArchiverTimeoutError(f"Timeout {description}") from exc
+                except aiohttp.ClientResponseError as exc:
+                    raise ArchiverError(f"HTTP {exc.status} {description}") from exc
+                except aiohttp.ClientConnectionError as exc:
+                    raise ArchiverConnectionError(
+                        f"Connection error {description}"
+                    ) from exc
+            # back off without holding a slot other requests could use
+            await asyncio.sleep(BACKOFF_FACTOR * 2**attempt)
+
+    async def get_data_at_time(
+        self,
+        pv_list: List[str],
+        time_requested: datetime,
+        timeout=_UNSET,
+    ) -> Dict[str, ArchiverValue]:
+        url, data = _data_at_time_request(pv_list, time_requested)
+        with _observe(_endpoint(url), len(pv_list)) as obs:
+            try:
+                content = await self._request(
+                    "POST",
+                    url,
+                    timeout,
+                    f"in get_data_at_time for {len(pv_list)} PVs at {time_requested}",
+                    obs=obs,
+                    data=data,
+                )
+            except (ArchiverTimeoutError, ArchiverConnectionError):
+                raise
+            except ArchiverError as exc:
+                logger.warning(
+                    "%s in get_data_at_time for %s at %s", exc, pv_list, time_requested
+                )
+                return {}
+            result = _parse_data_at_time(content.decode(), pv_list, time_requested)
+            obs.parsed(len(result))
+        return result
+
+    async def _fetch_raw(
+        self,
+        pv: str,
+        start_time: datetime,
+        end_time: datetime,
+        timeout,
+        operator: Optional[str],
+    ) -> Dict[str, ColumnarArchiveDataHandler]:
+        url, params = _raw_range_request(pv, start_time, end_time, operator)
+        try:
+            with _observe(_endpoint(url), 1) as obs:
+                content = await self._request(
+                    "GET", url, timeout, f"fetching {pv} as raw", obs, params=params
+                )
+                handler = _parse_raw_range(content)
+                obs.parsed(len(handler))
+            return {pv: handler}
+        except (ArchiverTimeoutError, ArchiverConnectionError):
+            raise
+        except (ArchiverError, ValueError) as exc:
+            logger.info("Raw retrieval failed for %s, using JSON: %s", pv, exc)
+        return await self._fetch_json([pv], start_time, end_time, timeout, operator)
+
+    async def _fetch_json(
+        self,
+        pv_list: List[str],
+        start_time: datetime,
+        end_time: datetime,
+        timeout,
+        operator: Optional[str],
+    ) -> Dict[str, ColumnarArchiveDataHandler]:
+        url, params = _json_range_request(pv_list, start_time, end_time, operator)
+        # aiohttp wants repeated keys as a list of pairs
+        query = [("pv", pv) for pv in params.pop("pv")] + list(params.items())
+        with _observe(_endpoint(url), len(pv_list)) as obs:
+            content = await self._request(
+                "GET",
+                url,
+                timeout,
+                f"fetching {len(pv_list)} PVs [{start_time} - {end_time}]",
+                obs,
+                params=query,
+            )
+            result = _parse_json_range(content.decode(), pv_list, operator)
+            obs.parsed(sum(len(handler) for handler in result.values()))
+        return result
+
+    async def get_values_over_time_range(
+        self,
+        pv_list: List[str],
+        start_time: datetime,
+        end_time: datetime,
+        time_delta: timedelta = None,
+        timeout=_UNSET,
+        use_operator: Optional[str] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        resample: bool = False,
+        retrieval_format: str = "json",
+        max_points: Optional[int] = None,
+        target_resolution: Optional[timedelta] = None,
+        binning: str = "mean",
+    ) -> ArchiveResult:
+        """
+        Same contract as archiver.get_values_over_time_range: the PV list is
+        sharded and every shard is requested concurrently. PVs whose shard
+        failed come back empty and are listed in the result's errors.
+        """
+        # a PV listed twice is fetched once, so failures count distinct PVs
+        pv_list = list(dict.fromkeys(pv_list))
+        if resample and not time_delta:
+            raise ValueError("resample needs a time_delta to sample onto")
+        if max_points or target_resolution:
+            if use_operator or time_delta:
+                raise ValueError(
+                    "max_points/target_resolution can't be combined with "
+                    "use_operator or time_delta"
+                )
+            operator, bin_size = plan_operator(
+                start_time, end_time, max_points, target_resolution, binning
+            )
+            result = await self.get_values_over_time_range(
+                pv_list,
+                start_time,
+                end_time,
+                timeout=timeout,
+                use_operator=operator,
+                progress_callback=progress_callback,
+                retrieval_format=retrieval_format,
+            )
+            result.meta.update(operator=operator, bin_size=bin_size)
+            return result
+        if time_delta:
+            return await self.get_data_with_time_interval(
+                pv_list,
+                start_time,
+                end_time,
+                time_delta,
+                timeout=timeout,
+                resample=resample,
+            )
+        if retrieval_format not in RETRIEVAL_FORMATS:
+            raise ValueError(
+                f"retrieval_format must be one of {RETRIEVAL_FORMATS}, "
+                f"got {retrieval_format!r}"
+            )
+
+        result = ArchiveResult()
+        if not pv_list:
+            return result
+
+        if retrieval_format == "raw":
+            # raw is one PV per request anyway, so every PV is its own shard
+            shards = [[pv] for pv in pv_list]
+        else:
+            shards = _shard_pv_list(pv_list, use_operator)
+        done = 0
+
+        async def fetch_shard(shard: List[str]) -> None:
+            nonlocal done
+            try:
+                if retrieval_format == "raw":
+                    batch = await self._fetch_raw(
+                        shard[0], start_time, end_time, timeout, use_operator
+                    )
+                else:
+                    batch = await self._fetch_json(
+                        shard, start_time, end_time, timeout, use_operator
+                    )
+                result.update(batch)
+            except ArchiverError as exc:
+                logger.warning(
+                    "Failed to fetch shard of %d PVs starting at %s: %s",
+                    len(shard),
+                    shard[0],
+                    exc,
+                )
+                result.errors.update({pv: exc for pv in shard})
+            done += len(shard)
+            if progress_callback:
+                progress_callback(done, len(pv_list))
+
+        await asyncio.gather(*(fetch_shard(shard) for shard in shards))
+
+        if len(result.errors) == len(pv_list):
+            raise next(iter(result.errors.values()))
+        for pv in pv_list:
+            if pv not in result:
+                result[pv] = ColumnarArchiveDataHandler()
+        return result
+
+    async def get_data_with_time_interval(
+        self,
+        pv_list: List[str],
+        start_time: datetime,
+        end_time: datetime,
+        time_delta: timedelta,
+        timeout=_UNSET,
+        resample: bool = False,
+    ) -> DefaultDict[str, ArchiveDataHandler]:
+        """
+        Same contract as archiver.get_data_with_time_interval. Every sample
+        time is its own getDataAtTime request, all sharing this client's
+        pool and concurrency limit; with resample=True the range is fetched
+        once and sampled locally instead.
+        """
+        result: DefaultDict[str, ArchiveDataHandler] = defaultdict(ArchiveDataHandler)
+        if resample:
+            result = ArchiveResult(ArchiveDataHandler)
+            grid_ns = _resample_grid(start_time, end_time, time_delta)
+            if not len(grid_ns) or not pv_list:
+                return result
+            raw = await self.get_values_over_time_range(
+                pv_list, start_time, end_time, timeout=timeout
+            )
+            _resample_onto(raw, pv_list, grid_ns, result)
+            return result
+
+        sample_times = _sample_times(start_time, end_time, time_delta)
+        if not sample_times:
+            return result
+
+        snapshots = await asyncio.gather(
+            *(self.get_data_at_time(pv_list, t, timeout) for t in sample_times),
+            return_exceptions=True,
+        )
+        errors = [s for s in snapshots if isinstance(s, BaseException)]
+        for error in errors:
+            if not isinstance(error, ArchiverError):
+                raise error
+        if len(errors) == len(sample_times):
+            raise errors[-1]
+        for t, snapshot in zip(sample_times, snapshots):
+            if isinstance(snapshot, ArchiverError):
+                logger.warning("Failed to fetch data at %s: %s", t, snapshot)
+                continue
+            for pv, archiver_value in snapshot.items():
+                result[pv].value_list.append(archiver_value)
+        return result
+
+
+async def get_data_at_time(
+    pv_list: List[str],
+    time_requested: datetime,
+    timeout=_UNSET,
+    client: Optional[AsyncArchiverClient] = None,
+) -> Dict[str, ArchiverValue]:
+    """archiver.get_data_at_time on the event loop; pass client to share a pool"""
+    if client is not None:
+        return await client.get_data_at_time(pv_list, time_requested, timeout)
+    async with AsyncArchiverClient() as client:
+        return await client.get_data_at_time(pv_list, time_requested, timeout)
+
+
+async def get_values_over_time_range(
+    pv_list: List[str],
+    start_time: datetime,
+    end_time: datetime,
+    time_delta: timedelta = None,
+    timeout=_UNSET,
+    client: Optional[AsyncArchiverClient] = None,
+    **kwargs: Any,
+) -> ArchiveResult:
+    """
+    archiver.get_values_over_time_range on the event loop; pass client to
+    share a pool. Other keyword arguments go to
+    AsyncArchiverClient.get_values_over_time_range.
+    """
+    if client is not None:
+        return await client.get_values_over_time_range(
+            pv_list, start_time, end_time, time_delta, timeout, **kwargs
+        )
+    async with AsyncArchiverClient() as client:
+        return await client.get_values_over_time_range(
+            pv_list, start_time, end_time, time_delta, timeout, **kwargs
+        )
+
+
+async def get_data_with_time_interval(
+    pv_list: List[str],
+    start_time: datetime,
+    end_time: datetime,
+    time_delta: timedelta,
+    timeout=_UNSET,
+    resample: bool = False,
+    client: Optional[AsyncArchiverClient] = None,
+) -> DefaultDict[str, ArchiveDataHandler]:
+    """archiver.get_data_with_time_interval on the event loop"""
+    if client is not None:
+        return await client.get_data_with_time_interval(
+            pv_list, start_time, end_time, time_delta, timeout, resample
+        )
+    async with AsyncArchiverClient() as client:
+        return await client.get_data_with_time_interval(
+            pv_list, start_time, end_time, time_delta, timeout, resample
+        )
@@ -0,0 +1,405 @@
+"""
+Opt-in on-disk cache for archiver range queries.
+
+Samples are stored per (PV, operator) in one .npz file together with the
+list of time intervals that have already been fetched, so repeated pulls over
+overlapping windows only ask the Archiver Appliance for the missing gaps.
+Every entry is self-contained (there is no shared index), so several
+processes can use the same directory.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Callable, DefaultDict, List, Optional, Tuple
+
+import numpy as np
+
+from lcls_tools.common.data import archiver
+from lcls_tools.common.data.archiver import (
+    ArchiveResult,
+    ColumnarArchiveDataHandler,
+    DEFAULT_MAX_WORKERS,
+    _EPOCH,
+    _UNSET,
+    _as_column,
+    _concatenate_columns,
+    _from_epoch_ns,
+    _time_windows,
+    _to_epoch_ns,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "lcls_tools", "archiver"
+)
+DEFAULT_MAX_BYTES: int = 1024**3
+ENTRY_SUFFIX = ".npz"
+
+Interval = Tuple[int, int]
+
+
+def _merge_intervals(intervals: List[Interval]) -> List[Interval]:
+    merged: List[List[int]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def _missing_intervals(
+    intervals: List[Interval], start: int, end: int
+) -> List[Interval]:
+    """Parts of [start, end] not covered by the (merged) stored intervals"""
+    gaps = []
+    cursor = start
+    for stored_start, stored_end in intervals:
+        if stored_end < cursor:
+            continue
+        if stored_start > end:
+            break
+        if stored_start > cursor:
+            gaps.append((cursor, stored_start))
+        cursor = max(cursor, stored_end)
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+def _utc(epoch_ns: int) -> datetime:
+    """Aware UTC datetime for epoch ns, unambiguous across DST changes"""
+    return _EPOCH + timedelta(microseconds=int(epoch_ns) // 1000)
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class ArchiverCache:
+    """
+    Local store for archiver range data, keyed by PV and post-processing
+    operator.
+
+    Each entry remembers which time intervals it holds; a request only
+    fetches the gaps, merges them into the entry and serves the whole range
+    from disk. Entries are evicted least-recently-used first (by file
+    modification time) once the cache grows past max_bytes. Data newer than
+    now is never marked as stored, so a window that is still being archived
+    is fetched again next time.
+
+    Entries are written atomically and merged with what is on disk at that
+    moment, so threads and processes sharing a directory don't lose each
+    other's data. The lock is only held while entries are read and written,
+    never during a fetch.
+
+    :param directory: where the .npz entries are kept
+    :param max_bytes: size cap for all entries together
+    """
+
+    def __init__(
+        self,
+        directory: str = DEFAULT_CACHE_DIR,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def _key(pv: str, operator: Optional[str]) -> str:
+        return f"{operator}({pv})" if operator else pv
+
+    @staticmethod
+    def _filename(pv: str, operator: Optional[str]) -> str:
+        # PV first, so invalidate(pv) finds the entries of every operator
+        return f"{_digest(pv)}.{_digest(operator or '')}{ENTRY_SUFFIX}"
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """(last access, size, filename) of every entry on disk"""
+        entries = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(ENTRY_SUFFIX) or ".tmp" in filename:
+                continue
+            try:
+                stat = os.stat(self._path(filename))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, filename))
+        return entries
+
+    def _read_entry(
+        self, pv: str, operator: Optional[str], columns: bool = True
+    ) -> Tuple[ColumnarArchiveDataHandler, List[Interval]]:
+        filename = self._filename(pv, operator)
+        try:
+            with np.load(self._path(filename), allow_pickle=False) as data:
+                entry = json.loads(str(data["entry"]))
+                intervals = [tuple(i) for i in entry["intervals"]]
+                if not columns:
+                    return ColumnarArchiveDataHandler(), intervals
+                if "val" in data:
+                    val = data["val"]
+                else:
+                    val = _as_column(json.loads(str(data["val_json"])))
+                handler = ColumnarArchiveDataHandler(
+                    secs=data["secs"],
+                    nanos=data["nanos"],
+                    val=val,
+                    severity=data["severity"],
+                    status=data["status"],
+                    meta=entry.get("meta"),
+                )
+        except FileNotFoundError:
+            return ColumnarArchiveDataHandler(), []
+        except (OSError, KeyError, ValueError) as exc:
+            logger.warning(
+                "Dropping unreadable archiver cache entry %s: %s",
+                self._key(pv, operator),
+                exc,
+            )
+            self._remove(filename)
+            return ColumnarArchiveDataHandler(), []
+        # fields are stored by sample time, which survives merging and slicing
+        fields = {ns: value for ns, value in entry.get("fields", [])}
+        handler.fields = {
+            i: fields[ns]
+            for i, ns in enumerate(handler.epoch_ns.tolist())
+            if ns in fields
+        }
+        return handler, intervals
+
+    def _write_entry(
+        self,
+        pv: str,
+        operator: Optional[str],
+        handler: ColumnarArchiveDataHandler,
+        intervals: List[Interval],
+    ) -> None:
+        filename = self._filename(pv, operator)
+        epoch_ns = handler.epoch_ns
+        entry = {
+            "key": self._key(pv, operator),
+            "intervals": [list(i) for i in intervals],
+            "meta": handler.meta,
+            "fields": [
+                [int(epoch_ns[i]), value] for i, value in sorted(handler.fields.items())
+            ],
+        }
+        columns = {
+            "secs": handler.secs,
+            "nanos": handler.nanos,
+            "severity": handler.severity,
+            "status": handler.status,
+            "entry": np.array(json.dumps(entry)),
+        }
+        if handler.val.dtype == object:
+            # ragged or mixed values are stored as JSON, never pickled
+            columns["val_json"] = np.array(
+                json.dumps(handler.val.tolist(), default=_json_default)
+            )
+        else:
+            columns["val"] = handler.val
+        # unique per writer, so concurrent writers never share a temp file
+        tmp = self._path(
+            f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp{ENTRY_SUFFIX}"
+        )
+        np.savez(tmp, **columns)
+        os.replace(tmp, self._path(filename))
+        self._touch(filename)
+
+    def _touch(self, filename: str) -> None:
+        # set explicitly, file system timestamps can be too coarse to order
+        # accesses that are milliseconds apart
+        now = time.time_ns()
+        try:
+            os.utime(self._path(filename), ns=(now, now))
+        except FileNotFoundError:
+            pass
+
+    def _remove(self, filename: str) -> None:
+        try:
+            os.remove(self._path(filename))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self, keep: List[str]) -> None:
+        entries = sorted(self._entries())
+        size = sum(entry_size for _, entry_size, _ in entries)
+        for _, entry_size, filename in entries:
+            if size <= self.max_bytes:
+                break
+            if filename in keep:
+                continue
+            logger.debug("Evicting %s from archiver cache", filename)
+            self._remove(filename)
+            size -= entry_size
+
+    @property
+    def size(self) -> int:
+        """Bytes used by all cached entries"""
+        return sum(entry_size for _, entry_size, _ in self._entries())
+
+    def intervals(
+        self, pv: str, operator: Optional[str] = None
+    ) -> List[Tuple[datetime, datetime]]:
+        """The time intervals stored for this PV and operator"""
+        with self._lock:
+            _, intervals = self._read_entry(pv, operator, columns=False)
+        return [
+            (_from_epoch_ns(start), _from_epoch_ns(end)) for start, end in intervals
+        ]
+
+    def invalidate(self, pv: Optional[str] = None, operator=_UNSET) -> None:
+        """
+        Drop cached data. With no arguments the whole cache is cleared; with
+        a PV only that PV is dropped (for every operator, unless one is given).
+        """
+        with self._lock:
+            if pv is not None and operator is not _UNSET:
+                self._remove(self._filename(pv, operator))
+                return
+            prefix = "" if pv is None else _digest(pv) + "."
+            for _, _, filename in self._entries():
+                if filename.startswith(prefix):
+                    self._remove(filename)
+
+    def get_values_over_time_range(
+        self,
+        pv_list: List[str],
+        start_time: datetime,
+        end_time: datetime,
+        timeout=_UNSET,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        use_operator: Optional[str] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        chunk_size: Optional[timedelta] = None,
+        retrieval_format: str = "json",
+    ) -> ArchiveResult:
+        """
+        Same contract as archiver.get_values_over_time_range, but only the
+        parts of [start_time, end_time] that are not cached are requested.
+        PVs whose fetch failed are left out of the cache and reported in the
+        result's errors. progress_callback counts PVs per window like the
+        archiver does, and is called as each PV is served.
+        """
+        start_ns = _to_epoch_ns(start_time)
+        end_ns = _to_epoch_ns(end_time)
+        now_ns = time.time_ns()
+        windows = (
+            len(_time_windows(start_time, end_time, chunk_size)) if chunk_size else 1
+        )
+        result = ArchiveResult()
+
+        with self._lock:
+            stored = {pv: self._read_entry(pv, use_operator) for pv in pv_list}
+
+        # PVs that miss exactly the same gaps are fetched together
+        gaps_to_pvs: DefaultDict[Tuple[Interval, ...], List[str]] = defaultdict(list)
+        for pv, (_, intervals) in stored.items():
+            gaps = _missing_intervals(intervals, start_ns, end_ns)
+            if gaps:
+                gaps_to_pvs[tuple(gaps)].append(pv)
+
+        fetched: DefaultDict[str, List[ColumnarArchiveDataHandler]] = defaultdict(list)
+        for gaps, pvs in gaps_to_pvs.items():
+            for gap_start, gap_end in gaps:
+                batch = archiver.get_values_over_time_range(
+                    pvs,
+                    _utc(gap_start),
+                    _utc(gap_end),
+                    timeout=timeout,
+                    max_workers=max_workers,
+                    use_operator=use_operator,
+                    chunk_size=chunk_size,
+                    retrieval_format=retrieval_format,
+                )
+                result.errors.update(batch.errors)
+                for pv in pvs:
+                    fetched[pv].append(batch[pv])
+
+        with self._lock:
+            for done, pv in enumerate(pv_list, start=1):
+                handler, intervals = stored[pv]
+                if pv in result.errors:
+                    # serve what is stored but don't mark the gap as covered
+                    handler = _merge_samples([handler] + fetched[pv])
+                elif pv in fetched:
+                    covered = [
+                        (gap_start, min(gap_end, now_ns))
+                        for gap_start, gap_end in _missing_intervals(
+                            intervals, start_ns, end_ns
+                        )
+                        if gap_start < now_ns
+                    ]
+                    # keep whatever another thread or process stored meanwhile
+                    current, current_intervals = self._read_entry(pv, use_operator)
+                    handler = _merge_samples([current, handler] + fetched[pv])
+                    intervals = _merge_intervals(
+                        current_intervals + intervals + covered
+                    )
+                    self._write_entry(pv, use_operator, handler, intervals)
+                elif intervals:
+                    self._touch(self._filename(pv, use_operator))
+                result[pv] = _slice(handler, start_ns, end_ns)
+                if progress_callback:
+                    progress_callback(done * windows, len(pv_list) * windows)
+
+            self._evict(keep=[self._filename(pv, use_operator) for pv in pv_list])
+
+        return result
+
+
+def _merge_samples(
+    handlers: List[ColumnarArchiveDataHandler],
+) -> ColumnarArchiveDataHandler:
+    """Merge handlers from arbitrary windows into one time-sorted handler"""
+    handlers = [h for h in handlers if len(h)]
+    if not handlers:
+        return ColumnarArchiveDataHandler()
+    fields = {}
+    offset = 0
+    for handler in handlers:
+        fields.update({offset + i: value for i, value in handler.fields.items()})
+        offset += len(handler)
+    merged = ColumnarArchiveDataHandler(
+        secs=np.concatenate([h.secs for h in handlers]),
+        nanos=np.concatenate([h.nanos for h in handlers]),
+        val=_concatenate_columns([h.val for h in handlers]),
+        severity=np.concatenate([h.severity for h in handlers]),
+        status=np.concatenate([h.status for h in handlers]),
+        meta=handlers[-1].meta,
+        fields=fields,
+    )
+    _, first = np.unique(merged.epoch_ns, return_index=True)
+    return merged.take(first)
+
+
+def _slice(
+    handler: ColumnarArchiveDataHandler, start_ns: int, end_ns: int
+) -> ColumnarArchiveDataHandler:
+    """
+    Samples in [start_ns, end_ns] plus the last one before start_ns, which is
+    what the appliance itself returns for a range request.
+    """
+    epoch_ns = handler.epoch_ns
+    first = max(int(np.searchsorted(epoch_ns, start_ns, side="left")) - 1, 0)
+    last = int(np.searchsorted(epoch_ns, end_ns, side="right"))
+    return handler.take(np.arange(first, last))
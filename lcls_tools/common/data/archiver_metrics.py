@@ -0,0 +1,205 @@
+"""
+Request-level metrics for the archiver clients.
+
+Every HTTP request made by lcls_tools.common.data.archiver (and
+archiver_async) is described by a RequestRecord and handed to the hooks
+registered with archiver.add_metrics_hook. With no hook registered nothing
+is measured. ArchiverMetrics is a ready-made hook that aggregates records
+into histograms:
+
+    with ArchiverMetrics() as metrics:
+        get_values_over_time_range(pv_list, start, end)
+    metrics.log_summary()
+    print(metrics.to_json())
+"""
+
+import bisect
+import json
+import logging
+import math
+import threading
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RequestRecord:
+    """
+    One request to the appliance.
+
+    latency is the wall time from sending the request to having the whole
+    body, server_time the part of it until the response headers arrived
+    (requests' Response.elapsed), parse_time the time spent decoding the
+    body afterwards.
+    """
+
+    endpoint: str
+    pv_count: int
+    latency: float = 0.0
+    server_time: Optional[float] = None
+    parse_time: float = 0.0
+    bytes_received: int = 0
+    retries: int = 0
+    samples: int = 0
+    status: Optional[int] = None
+    error: Optional[str] = None
+
+
+# seconds
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BYTES_BUCKETS = tuple(10**exp for exp in range(2, 10))
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+
+class Histogram:
+    """Fixed-bucket histogram; counts[i] holds values <= bounds[i]"""
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds + [self.max], self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip([str(b) for b in self.bounds] + ["+Inf"], self.counts)),
+        }
+
+
+class ArchiverMetrics:
+    """
+    Hook that aggregates RequestRecords into per-field histograms, overall
+    and per endpoint. Use it as a context manager to register it for a
+    block, or pass it to archiver.add_metrics_hook yourself.
+
+    :param keep_records: also keep every RequestRecord, for to_json
+    """
+
+    FIELDS = {
+        "latency": TIME_BUCKETS,
+        "server_time": TIME_BUCKETS,
+        "parse_time": TIME_BUCKETS,
+        "bytes_received": BYTES_BUCKETS,
+        "retries": COUNT_BUCKETS,
+        "samples": COUNT_BUCKETS,
+    }
+
+    def __init__(self, keep_records: bool = False):
+        self.keep_records = keep_records
+        self.records: List[RequestRecord] = []
+        self.errors: Dict[str, int] = {}
+        self._histograms: Dict[str, Dict[str, Histogram]] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, record: RequestRecord) -> None:
+        with self._lock:
+            for key in ("all", record.endpoint):
+                histograms = self._histograms.setdefault(
+                    key,
+                    {name: Histogram(b) for name, b in self.FIELDS.items()},
+                )
+                for name, histogram in histograms.items():
+                    value = getattr(record, name)
+                    if value is not None:
+                        histogram.add(value)
+            if record.error:
+                self.errors[record.error] = self.errors.get(record.error, 0) + 1
+            if self.keep_records:
+                self.records.append(record)
+
+    def __enter__(self) -> "ArchiverMetrics":
+        from lcls_tools.common.data.archiver import add_metrics_hook
+
+        add_metrics_hook(self)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        from lcls_tools.common.data.archiver import remove_metrics_hook
+
+        remove_metrics_hook(self)
+
+    def histogram(self, field: str, endpoint: str = "all") -> Optional[Histogram]:
+        return self._histograms.get(endpoint, {}).get(field)
+
+    def summary(self) -> Dict[str, Any]:
+        """Histograms as plain dicts: {endpoint: {field: {...}}}"""
+        with self._lock:
+            return {
+                "endpoints": {
+                    endpoint: {name: h.to_dict() for name, h in histograms.items()}
+                    for endpoint, histograms in self._histograms.items()
+                },
+                "errors": dict(self.errors),
+            }
+
+    def to_json(self, path: Optional[str] = None) -> str:
+        """Summary (and records, if kept) as JSON; also written to path if given"""
+        data = self.summary()
+        if self.keep_records:
+            data["records"] = [asdict(record) for record in self.records]
+        text = json.dumps(data, indent=2)
+        if path is not None:
+            with open(path, "w") as json_file:
+                json_file.write(text)
+        return text
+
+    def log_summary(self, level: int = logging.INFO) -> None:
+        for endpoint, fields in self.summary()["endpoints"].items():
+            latency, parse = fields["latency"], fields["parse_time"]
+            logger.log(
+                level,
+                "%s: %d requests, latency mean %.3fs p90 %.3fs, "
+                "parse mean %.3fs, %d bytes, %d retries, %d samples",
+                endpoint,
+                latency["count"],
+                latency["mean"] or 0.0,
+                latency["p90"] or 0.0,
+                parse["mean"] or 0.0,
+                fields["bytes_received"]["sum"],
+                fields["retries"]["sum"],
+                fields["samples"]["sum"],
+            )
+        if self.errors:
+            logger.log(level, "errors: %s", self.errors)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.records = []
+            self.errors = {}
+            self._histograms = {}
+
+
+def log_request(record: RequestRecord) -> None:
+    """Hook that logs every request at DEBUG level"""
+    logger.debug("archiver request: %s", asdict(record))
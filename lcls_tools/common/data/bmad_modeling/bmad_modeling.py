@@ -1,10 +1,10 @@
 import numpy as np
 import yaml
 import os
-import epics
 from datetime import datetime, timedelta
 from lcls_live.datamaps import get_datamaps
 from lcls_live.archiver import lcls_archiver_restore
+from lcls_tools.common.controls.pyepics.utils import PVGroup
 
 YAML_LOCATION = os.path.join(os.path.dirname(__file__), "yaml/")
 
@@ -174,7 +174,7 @@ def get_element(tao, datum):
 
 def get_live(pvlist):
     """Returns dictionary with PV names as keys and values of PVs"""
-    return dict(zip(pvlist, epics.caget_many(pvlist)))
+    return PVGroup(pvlist).get()
 
 
 def use_klys_when_beam_off(tao_cmds, pvdata, beam_code="1"):
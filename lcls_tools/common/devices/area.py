@@ -1,3 +1,5 @@
+import copy
+from functools import partial
 from typing import (
     Any,
     Dict,
@@ -31,15 +33,18 @@ from lcls_tools.common.devices.pmt import PMT, PMTCollection
 
 from pydantic import SerializeAsAny, Field, field_validator
 
-import lcls_tools
+from lcls_tools.common.pydantic import DeferredModel
 
 
-class Area(lcls_tools.common.BaseModel):
+class Area(DeferredModel):
     """This class provides access to collections of hardware components
     in a given machine area of LCLS/LCLS-II (for example: BC1, or BC2).
     The information for each collection is provided in YAML configuration
     files, where the filename is the machine area.
 
+    With lazy=True the collections are only created when first accessed.
+    The configuration passed in is not modified and may be shared.
+
     :cvar magnet_collection: The MagnetCollection for this area
     :cvar screen_collection: The ScreenCollection for this area
     """
@@ -104,13 +109,22 @@ class Area(lcls_tools.common.BaseModel):
         self,
         name,
         *args,
+        lazy: bool = False,
         **kwargs,
     ):
+        deferred = {}
+        if lazy:
+            for field_name, field in type(self).model_fields.items():
+                if field.alias and field.alias in kwargs:
+                    deferred[field_name] = kwargs.pop(field.alias)
         super(Area, self).__init__(
             name=name,
             *args,
             **kwargs,
         )
+        for field_name, data in deferred.items():
+            # collection validators modify their input, give them a copy
+            self.defer(field_name, partial(copy.deepcopy, data))
 
     @field_validator(
         "magnet_collection",
@@ -1,22 +1,29 @@
 from typing import (
     Dict,
+    Iterable,
     List,
+    Optional,
     Union,
 )
 
 from lcls_tools.common.devices.area import (
     Area,
 )
+from lcls_tools.common.devices.index import (
+    DeviceRecord,
+    get_device_lookup,
+)
 
 
 from pydantic import (
+    PrivateAttr,
     SerializeAsAny,
 )
 
-import lcls_tools
+from lcls_tools.common.pydantic import DeferredModel
 
 
-class Beampath(lcls_tools.common.BaseModel):
+class Beampath(DeferredModel):
     """This class provides access to collections of machine areas
     in a beampath of LCLS/LCLS-II (for example: CU_SXR, or SC_HXR).
     The information for each collection is provided in YAML configuration
@@ -24,15 +31,21 @@ class Beampath(lcls_tools.common.BaseModel):
 
     :cvar name: The name of the beampath
     :cvar areas: A collection of Areas as a Dict (keys are area names, values are Area objects)
+
+    If area_names is given, area_names and contains_areas answer from it
+    without touching areas, which can then be deferred (see create_beampath).
     """
 
     name: str = None
     areas: Dict[str, SerializeAsAny[Area]] = None
+    _area_names: Optional[List[str]] = PrivateAttr(default=None)
+    _failed_areas: Dict[str, Exception] = PrivateAttr(default_factory=dict)
 
     def __init__(
         self,
         name,
         *args,
+        area_names: Optional[List[str]] = None,
         **kwargs,
     ):
         super(Beampath, self).__init__(
@@ -40,10 +53,21 @@ class Beampath(lcls_tools.common.BaseModel):
             *args,
             **kwargs,
         )
+        if area_names is not None:
+            self._area_names = list(area_names)
+
+    @property
+    def failed_areas(self) -> Dict[str, Exception]:
+        """Areas of the beampath that could not be created, with the reason"""
+        # deferred areas are only attempted on first access
+        self.areas
+        return dict(self._failed_areas)
 
     @property
     def area_names(self) -> List[str]:
         """Get a list of area names from the beampath"""
+        if self._area_names is not None:
+            return list(self._area_names)
         if self.areas:
             return list(
                 self.areas.keys(),
@@ -60,7 +84,10 @@ class Beampath(lcls_tools.common.BaseModel):
         """Check if the areas exists within the configured beampath.
         :returns Dict[str,bool]: key = area, value = True/False
         """
-        if self.areas:
+        known_areas = self._area_names
+        if known_areas is None and self.areas:
+            known_areas = self.areas
+        if known_areas:
             # we want to take both single and multiple areas to check
             if isinstance(search_areas, str):
                 # convert str to list without splitting 'xyz' into ['x','y','z']
@@ -68,9 +95,24 @@ class Beampath(lcls_tools.common.BaseModel):
             else:
                 # just use list as provided
                 areas = search_areas
-            return {area: (area in self.areas) for area in areas}
+            return {area: (area in known_areas) for area in areas}
         else:
             print(
                 f"Beampath not configured, could not search for {search_areas}",
             )
             return False
+
+    def devices_between(
+        self,
+        z0: Optional[float] = None,
+        z1: Optional[float] = None,
+        types: Optional[Union[str, Iterable[str]]] = None,
+    ) -> List[DeviceRecord]:
+        """
+        Devices on this beampath with z0 <= sum_l_meters <= z1, in order.
+        Answered from the device index, no areas or devices are created;
+        use the records' area and name with the create_* functions.
+
+        :param types: e.g. "bpms" or ["QUAD", "wires"], see DeviceLookup.between
+        """
+        return get_device_lookup().between(z0, z1, beampath=self.name, types=types)
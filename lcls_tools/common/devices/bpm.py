@@ -14,8 +14,10 @@ from lcls_tools.common.devices.device import (
     ControlInformation,
     Metadata,
     PVSet,
+    read_pvs,
 )
 from epics import PV
+import numpy as np
 
 EPICS_ERROR_MESSAGE = "Unable to connect to EPICS."
 
@@ -94,6 +96,25 @@ class BPMCollection(BaseModel):
             v.update({name: bpm})
         return v
 
+    @property
+    def device_names(self) -> List[str]:
+        """Get all BPM names in the collection"""
+        return list(self.bpms.keys())
+
+    def get_all(self, pv: str, timeout: float = 1.0) -> np.ndarray:
+        """
+        Read one PV of every BPM at once, in the order of device_names.
+        See lcls_tools.common.devices.device.read_pvs.
+        """
+        return read_pvs(self.bpms, [pv], timeout=timeout)[pv]
+
+    def snapshot(self, pvs: List[str], timeout: float = 1.0) -> Dict[str, np.ndarray]:
+        """
+        Read several PVs of every BPM in one go: {pv: values in the order
+        of device_names}. See lcls_tools.common.devices.device.read_pvs.
+        """
+        return read_pvs(self.bpms, pvs, timeout=timeout)
+
     def _make_bpm_names_list_from_args(
         self, args: Union[str, List[str], None]
     ) -> List[str]:
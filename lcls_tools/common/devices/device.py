@@ -1,8 +1,153 @@
-from pydantic import SerializeAsAny, ConfigDict, field_validator, field_serializer
-from typing import List, Union, Callable, Dict, Optional
-from epics import PV
+from pydantic import (
+    SerializeAsAny,
+    ConfigDict,
+    PrivateAttr,
+    field_validator,
+    field_serializer,
+)
+from typing import Any, ClassVar, List, Tuple, Union, Callable, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from epics import PV, ca
+import numpy as np
+import threading
 
 import lcls_tools
+from lcls_tools.common.controls.pyepics.utils import (
+    CachedPV,
+    MonitorCacheMixin,
+    PVGroup,
+)
+from lcls_tools.common.devices.index import EnumStringCache, get_enum_string_cache
+
+_lazy_pv_lock = threading.Lock()
+# creates the PVs behind LazyPVs instead of epics.PV, see set_pv_factory
+_pv_factory: Optional[Callable[..., PV]] = None
+
+
+def set_pv_factory(
+    factory: Optional[Callable[..., PV]],
+) -> Optional[Callable[..., PV]]:
+    """
+    Create the PVs of devices with factory(pvname, **kwargs) from now on,
+    e.g. SimulatedIOC.pv from lcls_tools.common.controls.pyepics.simulation.
+    None goes back to epics.PV. PVs already in use are not replaced.
+
+    :returns: the factory used until now
+    """
+    global _pv_factory
+    with _lazy_pv_lock:
+        previous, _pv_factory = _pv_factory, factory
+    return previous
+
+
+class LazyPV(PV):
+    """
+    Stands in for an epics.PV until it is used.
+
+    Only the PV name is kept at first, so no channel is created. The first
+    attribute access (get, put, connected, add_callback, ...) creates the
+    PV and every access is forwarded to it from then on. pvname can be read
+    without connecting. It is still an instance of PV, so type checks on
+    PVSet fields and callbacks keep working.
+    """
+
+    _OWN_ATTRIBUTES = frozenset(
+        {
+            "pvname",
+            "_lazy_pvname",
+            "_pv_kwargs",
+            "_pv",
+            "__class__",
+            "__dict__",
+            "disconnect",
+        }
+    )
+
+    def __init__(self, pvname: str, **kwargs):
+        object.__setattr__(self, "_lazy_pvname", pvname.strip())
+        object.__setattr__(self, "_pv_kwargs", kwargs)
+        object.__setattr__(self, "_pv", None)
+
+    @property
+    def pvname(self) -> str:
+        return self._lazy_pvname
+
+    def __getattribute__(self, name):
+        if name in LazyPV._OWN_ATTRIBUTES:
+            return object.__getattribute__(self, name)
+        return getattr(LazyPV.materialize(self), name)
+
+    def __setattr__(self, name, value):
+        setattr(LazyPV.materialize(self), name, value)
+
+    @staticmethod
+    def materialize(pv: PV) -> PV:
+        """The PV behind pv, created now if pv is a LazyPV that has none yet"""
+        if not isinstance(pv, LazyPV):
+            return pv
+        if pv._pv is None:
+            with _lazy_pv_lock:
+                if pv._pv is None:
+                    # a max_age from enable_cache asks for a monitor cache
+                    pv_class = CachedPV if "max_age" in pv._pv_kwargs else PV
+                    if _pv_factory is not None:
+                        pv_class = _pv_factory
+                    object.__setattr__(pv, "_pv", pv_class(pv.pvname, **pv._pv_kwargs))
+        return pv._pv
+
+    @staticmethod
+    def enable_cache(pv: PV, max_age: Optional[float]) -> None:
+        """
+        Serve reads of pv from its monitor while the value is at most max_age
+        seconds old, or read fresh every time again if max_age is None. A
+        LazyPV that is not created yet stays that way until it is used.
+        """
+        if not isinstance(pv, LazyPV):
+            pv.max_age = max_age
+            return
+        with _lazy_pv_lock:
+            if pv._pv is None:
+                if max_age is None:
+                    pv._pv_kwargs.pop("max_age", None)
+                else:
+                    pv._pv_kwargs["max_age"] = max_age
+            elif isinstance(pv._pv, MonitorCacheMixin):
+                pv._pv.max_age = max_age
+            elif max_age is not None:
+                # a plain PV is in use already, swap it keeping its callbacks
+                cached = CachedPV(pv.pvname, **{"auto_monitor": True, **pv._pv_kwargs})
+                for index, (callback, kwargs) in pv._pv.callbacks.items():
+                    cached.add_callback(
+                        callback, index=index, with_ctrlvars=False, **kwargs
+                    )
+                cached.max_age = max_age
+                pv._pv_kwargs["max_age"] = max_age
+                object.__setattr__(pv, "_pv", cached)
+
+    @staticmethod
+    def cache_stats(pv: PV) -> Dict[str, int]:
+        """Cache hits and misses of pv, zero if it has never used a cache"""
+        pv = pv._pv if isinstance(pv, LazyPV) else pv
+        if isinstance(pv, MonitorCacheMixin):
+            return pv.cache_stats()
+        return {"hits": 0, "misses": 0}
+
+    def disconnect(self, deep: bool = False) -> None:
+        """Disconnect the PV behind it, without creating one just for that"""
+        if self._pv is not None:
+            self._pv.disconnect(deep=deep)
+
+    def __eq__(self, other):
+        return isinstance(other, PV) and self.pvname == other.pvname
+
+    def __hash__(self):
+        # equal LazyPVs share a name, so they must share a hash
+        return hash(self.pvname)
+
+    def __repr__(self):
+        if self._pv is None:
+            return f"<PV '{self.pvname}': not created>"
+        return repr(self._pv)
 
 
 class PVSet(lcls_tools.common.BaseModel):
@@ -16,12 +161,92 @@ class PVSet(lcls_tools.common.BaseModel):
     def validate_pv_fields(cls, v: str) -> PV:
         if v is None:
             return None
-        return PV(v)
+        # channels are only created once a PV is used, see connect_all
+        return LazyPV(v)
 
     @field_serializer("*", when_used="unless-none")
     def serialize_pv_fields(self, v: PV, _info) -> str:
         return v.pvname
 
+    @property
+    def pvs(self) -> List[PV]:
+        """Every PV in the set"""
+        return [
+            getattr(self, field)
+            for field in type(self).model_fields
+            if getattr(self, field) is not None
+        ]
+
+    def connect_all(self, timeout: Optional[float] = None, wait: bool = True) -> bool:
+        """
+        Create the channels for every PV in the set now instead of on first
+        use. With wait, block until they are connected (up to timeout each)
+        and return whether all of them are.
+        """
+        pvs = [LazyPV.materialize(pv) for pv in self.pvs]
+        if not wait:
+            return all(pv.connected for pv in pvs)
+        return all([pv.wait_for_connection(timeout=timeout) for pv in pvs])
+
+    def enable_cache(self, max_age: Optional[float]) -> None:
+        """
+        Serve reads of every PV in the set from its monitor while the value
+        is at most max_age seconds old, see LazyPV.enable_cache. Pass None to
+        read fresh every time again.
+        """
+        for pv in self.pvs:
+            LazyPV.enable_cache(pv, max_age)
+
+    def cache_stats(self) -> Dict[str, int]:
+        """Cache hits and misses summed over every PV in the set"""
+        stats = [LazyPV.cache_stats(pv) for pv in self.pvs]
+        return {
+            "hits": sum(stat["hits"] for stat in stats),
+            "misses": sum(stat["misses"] for stat in stats),
+        }
+
+
+def _read_enum_strs(pv: PV, timeout: float) -> Optional[Tuple[str, ...]]:
+    options = pv.get_ctrlvars(timeout=timeout)
+    if not options or "enum_strs" not in options:
+        return None
+    return tuple(options["enum_strs"])
+
+
+def fetch_enum_strs(
+    pvs: List[PV],
+    timeout: float = 1.0,
+    max_workers: Optional[int] = None,
+    cache: Optional[EnumStringCache] = None,
+) -> List[Optional[Tuple[str, ...]]]:
+    """
+    Enum strings of every PV, None for those that could not be read.
+
+    The reads run in a thread pool, so PVs of unreachable IOCs time out
+    together rather than one after another. With a cache, PVs found in it
+    are not read and what was read is added to it.
+
+    :param max_workers: threads to read with, one per PV (up to 32) if None
+    """
+    enum_strs = [cache.get(pv.pvname) if cache else None for pv in pvs]
+    missing = [i for i, strs in enumerate(enum_strs) if strs is None]
+    if len(missing) > 1 and max_workers != 1:
+        # CA calls from the pool need to share the main thread's context
+        with ThreadPoolExecutor(
+            max_workers=max_workers or min(32, len(missing)),
+            initializer=ca.use_initial_context,
+        ) as pool:
+            read = list(pool.map(lambda i: _read_enum_strs(pvs[i], timeout), missing))
+    else:
+        read = [_read_enum_strs(pvs[i], timeout) for i in missing]
+    for i, strs in zip(missing, read):
+        enum_strs[i] = strs
+    if cache:
+        cache.update(
+            {pvs[i].pvname: strs for i, strs in zip(missing, read) if strs is not None}
+        )
+    return enum_strs
+
 
 class ControlInformation(lcls_tools.common.BaseModel):
     model_config = ConfigDict(
@@ -29,6 +254,9 @@ class ControlInformation(lcls_tools.common.BaseModel):
     )
     control_name: str
     PVs: PVSet
+    # PVSet fields with enum strings used by the device, see enum_options
+    _enum_fields: ClassVar[Tuple[str, ...]] = ()
+    _enum_options: Dict[str, Dict[str, int]] = PrivateAttr(default_factory=dict)
 
     def __init__(
         self,
@@ -43,6 +271,24 @@ class ControlInformation(lcls_tools.common.BaseModel):
             **kwargs,
         )
 
+    def enum_options(
+        self, field: str, timeout: float = 1.0
+    ) -> Optional[Dict[str, int]]:
+        """
+        {enum string: value} of a PV, read on first use and kept after that.
+        None if it could not be read, it is tried again next time then.
+        """
+        if field not in self._enum_options:
+            enum_strs = fetch_enum_strs([getattr(self.PVs, field)], timeout=timeout)[0]
+            if enum_strs is None:
+                return None
+            self.set_enum_strs(field, enum_strs)
+        return self._enum_options[field]
+
+    def set_enum_strs(self, field: str, enum_strs: Tuple[str, ...]) -> None:
+        """Use these enum strings for the PV, e.g. when they were prefetched"""
+        self._enum_options[field] = {option: i for i, option in enumerate(enum_strs)}
+
 
 class Metadata(lcls_tools.common.BaseModel):
     area: str
@@ -136,6 +382,21 @@ class Device(lcls_tools.common.BaseModel):
         """The list of beampaths that include this device"""
         return self.metadata.beam_path
 
+    def connect_all(self, timeout: Optional[float] = None) -> bool:
+        """Connect every PV of this device now, see PVSet.connect_all"""
+        return self.controls_information.PVs.connect_all(timeout=timeout)
+
+    def enable_cache(self, max_age: Optional[float]) -> None:
+        """
+        Serve property reads from PV monitors while their values are at most
+        max_age seconds old, see PVSet.enable_cache
+        """
+        self.controls_information.PVs.enable_cache(max_age)
+
+    def cache_stats(self) -> Dict[str, int]:
+        """Cache hits and misses of this device's PVs, see PVSet.cache_stats"""
+        return self.controls_information.PVs.cache_stats()
+
     def get_callbacks(self, pv: str) -> Union[None, dict]:
         """Find which callbacks are tied for the given PV"""
         pv_obj = self._get_pv_object_from_str(pv)
@@ -243,6 +504,50 @@ class Device(lcls_tools.common.BaseModel):
         raise NotImplementedError
 
 
+def _as_array(values: List[Any]) -> np.ndarray:
+    """Floats with nan for missing values if all are scalars, objects otherwise"""
+    if all(value is None or np.isscalar(value) for value in values) and not any(
+        isinstance(value, str) for value in values
+    ):
+        return np.array(
+            [np.nan if value is None else value for value in values], dtype=float
+        )
+    array = np.empty(len(values), dtype=object)
+    for i, value in enumerate(values):
+        array[i] = value
+    return array
+
+
+def read_pvs(
+    devices: Dict[str, Device],
+    pvs: List[str],
+    timeout: float = 1.0,
+) -> Dict[str, np.ndarray]:
+    """
+    Read the given PVSet fields of every device with one PVGroup of the
+    devices' own PVs, so all requests are in flight together instead of one
+    round trip per device, and cached or simulated PVs are read as usual.
+
+    :param pvs: PVSet field names, e.g. ["x", "y", "tmit"]
+    :param timeout: seconds to wait for each value once connected
+    :returns: {field: values in the order of devices}; numeric values come
+        back as a float array with nan where a PV could not be read
+    """
+    pv_objects = [
+        getattr(device.controls_information.PVs, field)
+        for field in pvs
+        for device in devices.values()
+    ]
+    group = PVGroup([pv for pv in pv_objects if pv is not None], timeout, retries=0)
+    read = group.get()
+    values = [None if pv is None else read[pv.pvname] for pv in pv_objects]
+    count = len(devices)
+    return {
+        field: _as_array(values[i * count : (i + 1) * count])
+        for i, field in enumerate(pvs)
+    }
+
+
 class DeviceCollection(lcls_tools.common.BaseModel):
     devices: Dict[str, SerializeAsAny[Device]] = None
 
@@ -275,3 +580,91 @@ class DeviceCollection(lcls_tools.common.BaseModel):
     def device_names(self) -> List[str]:
         """Get all device names in the collection"""
         return list(self.devices.keys())
+
+    def get_all(self, pv: str, timeout: float = 1.0) -> np.ndarray:
+        """
+        Read one PV (e.g. "bact") of every device at once, in the order of
+        device_names. See read_pvs.
+        """
+        return read_pvs(self.devices, [pv], timeout=timeout)[pv]
+
+    def snapshot(self, pvs: List[str], timeout: float = 1.0) -> Dict[str, np.ndarray]:
+        """
+        Read several PVs of every device in one go: {pv: values in the order
+        of device_names}. See read_pvs.
+        """
+        return read_pvs(self.devices, pvs, timeout=timeout)
+
+    def pv_group(self, pvs: List[str], **kwargs) -> PVGroup:
+        """
+        A PVGroup of the given PVSet fields (e.g. ["bdes"]) of every device,
+        for reading or writing them all in one pass. Its PV names are ordered
+        by field, then in the order of device_names; devices without the
+        field are left out. The group uses the devices' own PVs, so it shares
+        their connections, caches and PV factory. kwargs are passed to PVGroup.
+        """
+        pv_objects = [
+            getattr(device.controls_information.PVs, field)
+            for field in pvs
+            for device in self.devices.values()
+        ]
+        return PVGroup([pv for pv in pv_objects if pv is not None], **kwargs)
+
+    def connect_all(self, timeout: Optional[float] = None) -> bool:
+        """
+        Connect every PV of every device now. All channels are created
+        before waiting on any of them, so they connect concurrently.
+        """
+        pv_sets = [device.controls_information.PVs for device in self.devices.values()]
+        for pv_set in pv_sets:
+            pv_set.connect_all(wait=False)
+        return all([pv_set.connect_all(timeout=timeout) for pv_set in pv_sets])
+
+    def prefetch_enum_options(
+        self,
+        timeout: float = 1.0,
+        max_workers: Optional[int] = None,
+        use_cache: bool = True,
+        cache: Optional[EnumStringCache] = None,
+    ) -> List[str]:
+        """
+        Read the enum strings every device needs (e.g. magnet CTRL options)
+        at once instead of on each device's first use, see fetch_enum_strs.
+
+        :param use_cache: take them from, and add them to, the EnumStringCache
+            shared between processes
+        :param cache: the cache to use, get_enum_string_cache() if None
+        :returns: names of the PVs that could not be read
+        """
+        targets = [
+            (device.controls_information, field)
+            for device in self.devices.values()
+            for field in type(device.controls_information)._enum_fields
+            if field not in device.controls_information._enum_options
+        ]
+        pvs = [getattr(info.PVs, field) for info, field in targets]
+        if use_cache and cache is None:
+            cache = get_enum_string_cache()
+        enum_strs = fetch_enum_strs(
+            pvs,
+            timeout=timeout,
+            max_workers=max_workers,
+            cache=cache if use_cache else None,
+        )
+        for (info, field), strs in zip(targets, enum_strs):
+            if strs is not None:
+                info.set_enum_strs(field, strs)
+        return [pv.pvname for pv, strs in zip(pvs, enum_strs) if strs is None]
+
+    def enable_cache(self, max_age: Optional[float]) -> None:
+        """Use a monitor cache for every device, see Device.enable_cache"""
+        for device in self.devices.values():
+            device.enable_cache(max_age)
+
+    def cache_stats(self) -> Dict[str, int]:
+        """Cache hits and misses summed over every device"""
+        stats = [device.cache_stats() for device in self.devices.values()]
+        return {
+            "hits": sum(stat["hits"] for stat in stats),
+            "misses": sum(stat["misses"] for stat in stats),
+        }
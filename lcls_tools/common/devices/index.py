@@ -0,0 +1,504 @@
+"""
+Compiled index of the device YAML files.
+
+Parsing an area file with yaml.safe_load takes up to half a second (L3.yaml),
+and the readers used to do it on every create_* call. The DeviceIndex parses
+each file once, keeps the result in memory and persists it to a pickle store,
+so later processes skip YAML parsing altogether. Entries are checked against
+the file's mtime and size on every lookup and, if those changed, against a
+SHA-1 of its contents, so editing a YAML file is picked up right away.
+
+DeviceLookup builds on it to find devices across all areas by name,
+control name or position (sum_l_meters) without creating any of them.
+
+EnumStringCache keeps the enum strings of PVs (e.g. magnet CTRL options)
+in a store next to it, see DeviceCollection.prefetch_enum_options.
+
+Both stores live in the directory named by the LCLS_TOOLS_CACHE_DIR
+environment variable, ~/.cache/lcls_tools if it is not set. Set it to an
+empty string to keep everything in memory only.
+
+To compile every file in advance (e.g. after a deployment):
+
+    python -m lcls_tools.common.devices.index
+"""
+
+import bisect
+import contextlib
+import hashlib
+import os
+import pickle
+import threading
+import time
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import yaml
+
+DEFAULT_YAML_LOCATION = os.path.join(os.path.dirname(__file__), "yaml/")
+CACHE_LOCATION_VARIABLE = "LCLS_TOOLS_CACHE_DIR"
+DEFAULT_CACHE_LOCATION = os.path.join(os.path.expanduser("~"), ".cache", "lcls_tools")
+# bump when the layout of the stored entries changes
+INDEX_VERSION = 1
+ENUM_CACHE_VERSION = 1
+# top level keys of an area file
+DEVICE_TYPES = ("bpms", "lblms", "magnets", "pmts", "screens", "tcavs", "wires")
+
+
+def cache_location(filename: str) -> Optional[str]:
+    """
+    Path of a store in $LCLS_TOOLS_CACHE_DIR (DEFAULT_CACHE_LOCATION if
+    unset), None if the variable is set but empty.
+    """
+    directory = os.environ.get(CACHE_LOCATION_VARIABLE, DEFAULT_CACHE_LOCATION)
+    return os.path.join(directory, filename) if directory else None
+
+
+def _sha1(path: str) -> str:
+    with open(path, "rb") as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+
+class DeviceIndex:
+    """
+    Parsed device YAML files, keyed by absolute path.
+
+    load() returns the parsed file and is O(1) once a file has been seen:
+    a stat() to validate the entry and a dict lookup. The returned data is
+    shared, callers that modify it must copy it first. The store is written
+    after every load that changed an entry, or once at the end of batch().
+
+    :param index_file: pickle store to read and update, None to only keep
+        the index in memory
+    :param yaml_location: directory compile() parses
+    """
+
+    def __init__(
+        self,
+        index_file: Optional[str] = None,
+        yaml_location: str = DEFAULT_YAML_LOCATION,
+    ):
+        self.index_file = index_file
+        self.yaml_location = yaml_location
+        self._lock = threading.RLock()
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        self._batch_depth = 0
+        self._dirty = False
+
+    def _read_store(self) -> Dict[str, Dict[str, Any]]:
+        if not self.index_file or not os.path.isfile(self.index_file):
+            return {}
+        try:
+            with open(self.index_file, "rb") as file:
+                store = pickle.load(file)
+            if store.get("version") == INDEX_VERSION:
+                return store["files"]
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, KeyError):
+            print("Device index ", self.index_file, " is unreadable, rebuilding it.")
+        return {}
+
+    def _write_store(self) -> None:
+        if not self.index_file:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.index_file), exist_ok=True)
+            tmp = f"{self.index_file}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as file:
+                pickle.dump(
+                    {"version": INDEX_VERSION, "files": self._entries},
+                    file,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
+            os.replace(tmp, self.index_file)
+        except OSError as error:
+            # not being able to persist only costs speed in the next process
+            print("Could not write device index ", self.index_file, ": ", error)
+
+    @property
+    def entries(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._read_store()
+            return self._entries
+
+    def _refresh(self, path: str) -> bool:
+        """Make sure the entry for path matches the file, True if it changed"""
+        stat = os.stat(path)
+        entry = self.entries.get(path)
+        if entry and (entry["mtime_ns"], entry["size"]) == (
+            stat.st_mtime_ns,
+            stat.st_size,
+        ):
+            return False
+        digest = _sha1(path)
+        if entry and entry["sha1"] == digest:
+            # touched but not changed, no need to parse it again
+            entry.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+            return True
+        with open(path, "r") as file:
+            data = yaml.load(file, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+        self.entries[path] = {
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha1": digest,
+            "data": data,
+        }
+        return True
+
+    def load(self, path: str) -> Any:
+        """
+        Parsed contents of the YAML file at path.
+
+        :raises FileNotFoundError: if path does not exist
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            if self._refresh(path):
+                self._dirty = True
+                if not self._batch_depth:
+                    self._save()
+            return self.entries[path]["data"]
+
+    def _save(self) -> None:
+        self._write_store()
+        self._dirty = False
+
+    @contextlib.contextmanager
+    def batch(self) -> Iterator["DeviceIndex"]:
+        """
+        Write the store once, when the outermost batch ends, instead of after
+        every changed file loaded in it. Other threads wait for the batch.
+        """
+        with self._lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if not self._batch_depth and self._dirty:
+                    self._save()
+
+    def compile(self) -> None:
+        """Parse every YAML file in yaml_location and write the store"""
+        with self.batch():
+            for filename in sorted(os.listdir(self.yaml_location)):
+                if filename.endswith(".yaml"):
+                    self.load(os.path.join(self.yaml_location, filename))
+
+    def clear(self) -> None:
+        """Forget the in-memory index; the store is read again on next use"""
+        with self._lock:
+            self._entries = None
+
+
+_default_index: Optional[DeviceIndex] = None
+_default_index_lock = threading.Lock()
+
+
+def get_device_index() -> DeviceIndex:
+    """
+    The process-wide DeviceIndex used by lcls_tools.common.devices.reader,
+    stored at cache_location("device_index.pickle") unless set_device_index
+    gave another one.
+    """
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = DeviceIndex(cache_location("device_index.pickle"))
+        return _default_index
+
+
+def set_device_index(index: Optional[DeviceIndex]) -> Optional[DeviceIndex]:
+    """
+    Use index as the process-wide DeviceIndex from now on, e.g.
+    DeviceIndex(None) to not persist anything. None makes a new default
+    one on next use.
+
+    :returns: the index used until now
+    """
+    global _default_index
+    with _default_index_lock:
+        previous, _default_index = _default_index, index
+    return previous
+
+
+class DeviceRecord(NamedTuple):
+    """
+    Where a device is defined and what it looks like.
+
+    :cvar device_type: key of its collection in the area file (e.g. "bpms")
+    :cvar spec: the device's YAML data, shared with the index; copy it
+        before modifying it
+    """
+
+    name: str
+    area: str
+    device_type: str
+    control_name: Optional[str]
+    sum_l_meters: Optional[float]
+    spec: Dict[str, Any]
+
+    @property
+    def type(self) -> Optional[str]:
+        """Type from the metadata, e.g. QUAD or BPM"""
+        return (self.spec.get("metadata") or {}).get("type")
+
+    @property
+    def beam_path(self) -> List[str]:
+        return (self.spec.get("metadata") or {}).get("beam_path") or []
+
+
+class DeviceLookup:
+    """
+    Every device of every area file, by name, control name and position.
+
+    Built once from the DeviceIndex (no device objects are created), after
+    which get() and name_for_control_name() are dict lookups and between()
+    bisects a sorted array of sum_l_meters. Call refresh() to pick up
+    changes to the YAML files.
+
+    :param index: DeviceIndex to read the area files from
+    """
+
+    def __init__(self, index: Optional[DeviceIndex] = None):
+        self.index = index if index is not None else get_device_index()
+        self._lock = threading.Lock()
+        self._by_name: Optional[Dict[str, DeviceRecord]] = None
+        self._by_control_name: Dict[str, str] = {}
+        self._by_position: Dict[Optional[str], Tuple[List[float], List]] = {}
+
+    def _records(self) -> Dict[str, DeviceRecord]:
+        with self._lock:
+            if self._by_name is None:
+                self._build()
+            return self._by_name
+
+    def _build(self) -> None:
+        by_name, by_control_name = {}, {}
+        location = self.index.yaml_location
+        with self.index.batch():
+            loaded = {
+                filename: self.index.load(os.path.join(location, filename))
+                for filename in sorted(os.listdir(location))
+                if filename.endswith(".yaml")
+            }
+        for filename, data in loaded.items():
+            if not isinstance(data, dict):
+                continue
+            area = filename[: -len(".yaml")]
+            for device_type in DEVICE_TYPES:
+                for name, spec in (data.get(device_type) or {}).items():
+                    control_name = (spec.get("controls_information") or {}).get(
+                        "control_name"
+                    )
+                    by_name[name] = DeviceRecord(
+                        name=name,
+                        area=area,
+                        device_type=device_type,
+                        control_name=control_name,
+                        sum_l_meters=(spec.get("metadata") or {}).get("sum_l_meters"),
+                        spec=spec,
+                    )
+                    # some elements share a control name (e.g. split bends)
+                    by_control_name.setdefault(control_name, name)
+        by_control_name.pop(None, None)
+        self._by_name = by_name
+        self._by_control_name = by_control_name
+        self._by_position = {}
+
+    def refresh(self) -> None:
+        """Rebuild from the area files on next use"""
+        with self._lock:
+            self._by_name = None
+
+    def get(self, name: str) -> Optional[DeviceRecord]:
+        return self._records().get(name)
+
+    def name_for_control_name(self, control_name: str) -> Optional[str]:
+        """Name of the (first) device with this control name"""
+        self._records()
+        return self._by_control_name.get(control_name)
+
+    def _positions(self, beampath: Optional[str]) -> Tuple[List[float], List]:
+        records = self._records()
+        with self._lock:
+            if beampath not in self._by_position:
+                placed = sorted(
+                    (
+                        record
+                        for record in records.values()
+                        if record.sum_l_meters is not None
+                        and (beampath is None or beampath in record.beam_path)
+                    ),
+                    key=lambda record: record.sum_l_meters,
+                )
+                self._by_position[beampath] = (
+                    [record.sum_l_meters for record in placed],
+                    placed,
+                )
+            return self._by_position[beampath]
+
+    def between(
+        self,
+        z0: Optional[float] = None,
+        z1: Optional[float] = None,
+        beampath: Optional[str] = None,
+        types: Optional[Union[str, Iterable[str]]] = None,
+    ) -> List[DeviceRecord]:
+        """
+        Devices with z0 <= sum_l_meters <= z1, ordered by sum_l_meters.
+
+        :param z0: lower bound, None for no bound
+        :param z1: upper bound, None for no bound
+        :param beampath: only devices on this beampath (e.g. SC_HXR)
+        :param types: only these device types, given as area file keys
+            ("bpms") or metadata types ("QUAD")
+        """
+        positions, placed = self._positions(beampath)
+        lower = 0 if z0 is None else bisect.bisect_left(positions, z0)
+        upper = len(placed) if z1 is None else bisect.bisect_right(positions, z1)
+        found = placed[lower:upper]
+        if types is not None:
+            types = {types} if isinstance(types, str) else set(types)
+            found = [
+                record
+                for record in found
+                if record.device_type in types or record.type in types
+            ]
+        return found
+
+
+class EnumStringCache:
+    """
+    Enum strings of PVs, by PV name, shared between processes.
+
+    Entries older than max_age seconds are ignored: enum strings rarely
+    change, but an IOC reboot may reorder them and a stale entry would map
+    an option to the wrong value.
+
+    :param cache_file: pickle store to read and update, None to only keep
+        the entries in memory
+    :param max_age: seconds an entry is used for
+    """
+
+    def __init__(
+        self,
+        cache_file: Optional[str] = None,
+        max_age: float = 24 * 60 * 60,
+    ):
+        self.cache_file = cache_file
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, Tuple[float, Tuple[str, ...]]]] = None
+
+    def _read_store(self) -> Dict[str, Tuple[float, Tuple[str, ...]]]:
+        if not self.cache_file or not os.path.isfile(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, "rb") as file:
+                store = pickle.load(file)
+            if store.get("version") == ENUM_CACHE_VERSION:
+                return store["pvs"]
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, KeyError):
+            print("Enum cache ", self.cache_file, " is unreadable, rebuilding it.")
+        return {}
+
+    def _write_store(self) -> None:
+        if not self.cache_file:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            tmp = f"{self.cache_file}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as file:
+                pickle.dump(
+                    {"version": ENUM_CACHE_VERSION, "pvs": self._entries},
+                    file,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
+            os.replace(tmp, self.cache_file)
+        except OSError as error:
+            print("Could not write enum cache ", self.cache_file, ": ", error)
+
+    def get(self, pvname: str) -> Optional[Tuple[str, ...]]:
+        """Enum strings of pvname, None if unknown or too old"""
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._read_store()
+            entry = self._entries.get(pvname)
+        if entry is None or time.time() - entry[0] > self.max_age:
+            return None
+        return entry[1]
+
+    def update(self, enum_strs: Dict[str, Tuple[str, ...]]) -> None:
+        """Store {pvname: enum strings}, keeping what other processes stored"""
+        if not enum_strs:
+            return
+        now = time.time()
+        with self._lock:
+            self._entries = self._read_store()
+            self._entries.update(
+                {pvname: (now, tuple(strs)) for pvname, strs in enum_strs.items()}
+            )
+            self._write_store()
+
+    def clear(self) -> None:
+        """Forget the in-memory entries; the store is read again on next use"""
+        with self._lock:
+            self._entries = None
+
+
+_default_enum_cache: Optional[EnumStringCache] = None
+
+
+def get_enum_string_cache() -> EnumStringCache:
+    """
+    The process-wide EnumStringCache used by prefetch_enum_options, stored
+    at cache_location("enum_strs.pickle") unless set_enum_string_cache gave
+    another one.
+    """
+    global _default_enum_cache
+    with _default_index_lock:
+        if _default_enum_cache is None:
+            _default_enum_cache = EnumStringCache(cache_location("enum_strs.pickle"))
+        return _default_enum_cache
+
+
+def set_enum_string_cache(
+    cache: Optional[EnumStringCache],
+) -> Optional[EnumStringCache]:
+    """
+    Use cache as the process-wide EnumStringCache from now on. None makes a
+    new default one on next use.
+
+    :returns: the cache used until now
+    """
+    global _default_enum_cache
+    with _default_index_lock:
+        previous, _default_enum_cache = _default_enum_cache, cache
+    return previous
+
+
+_default_lookup: Optional[DeviceLookup] = None
+
+
+def get_device_lookup() -> DeviceLookup:
+    """The process-wide DeviceLookup over the default DeviceIndex"""
+    global _default_lookup
+    index = get_device_index()
+    with _default_index_lock:
+        if _default_lookup is None or _default_lookup.index is not index:
+            _default_lookup = DeviceLookup(index)
+        return _default_lookup
+
+
+if __name__ == "__main__":
+    get_device_index().compile()
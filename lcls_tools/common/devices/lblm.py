@@ -17,8 +17,10 @@ from lcls_tools.common.devices.device import (
     ControlInformation,
     Metadata,
     PVSet,
+    read_pvs,
 )
 from epics import PV
+import numpy as np
 
 EPICS_ERROR_MESSAGE = "Unable to connect to EPICS."
 
@@ -143,6 +145,25 @@ class LBLMCollection(BaseModel):
             raise TypeError("Please provide a datetime object for comparison.")
         return (datetime.now() - time_to_check).seconds
 
+    @property
+    def device_names(self) -> List[str]:
+        """Get all LBLM names in the collection"""
+        return list(self.lblms.keys())
+
+    def get_all(self, pv: str, timeout: float = 1.0) -> np.ndarray:
+        """
+        Read one PV of every LBLM at once, in the order of device_names.
+        See lcls_tools.common.devices.device.read_pvs.
+        """
+        return read_pvs(self.lblms, [pv], timeout=timeout)[pv]
+
+    def snapshot(self, pvs: List[str], timeout: float = 1.0) -> Dict[str, np.ndarray]:
+        """
+        Read several PVs of every LBLM in one go: {pv: values in the order
+        of device_names}. See lcls_tools.common.devices.device.read_pvs.
+        """
+        return read_pvs(self.lblms, pvs, timeout=timeout)
+
     def _make_lblm_names_list_from_args(
         self, args: Union[str, List[str], None]
     ) -> List[str]:
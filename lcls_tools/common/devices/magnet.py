@@ -1,5 +1,7 @@
+from contextlib import ExitStack
 from datetime import datetime
 from functools import wraps
+import threading
 import time
 from pydantic import (
     Field,
@@ -8,9 +10,12 @@ from pydantic import (
     SerializeAsAny,
 )
 from typing import (
+    ClassVar,
     Dict,
     List,
+    NamedTuple,
     Optional,
+    Tuple,
     Union,
 )
 from lcls_tools.common.devices.device import (
@@ -38,21 +43,25 @@ class MagnetPVSet(PVSet):
 
 class MagnetControlInformation(ControlInformation):
     PVs: SerializeAsAny[MagnetPVSet]
-    _ctrl_options: SerializeAsAny[Optional[Dict[str, int]]] = dict()
+    _enum_fields: ClassVar[Tuple[str, ...]] = ("ctrl",)
 
     def __init__(self, *args, **kwargs):
         super(MagnetControlInformation, self).__init__(*args, **kwargs)
-        # Get possible options for magnet ctrl PV, empty dict by default.
-        options = self.PVs.ctrl.get_ctrlvars(timeout=1)
-        if options:
-            [
-                self._ctrl_options.update({option: i})
-                for i, option in enumerate(options["enum_strs"])
-            ]
 
     @property
-    def ctrl_options(self):
-        return self._ctrl_options
+    def ctrl_options(self) -> Dict[str, int]:
+        """
+        Possible options for magnet ctrl PV, read on first use (see
+        MagnetCollection.prefetch_enum_options) and kept after that.
+        Raises:
+            TimeoutError: If the PV does not return control variables within the timeout period.
+        """
+        options = self.enum_options("ctrl", timeout=1)
+        if options is None:
+            raise TimeoutError(
+                "Timeout while retrieving control variables from ctrl PV."
+            )
+        return options
 
 
 class MagnetMetadata(Metadata):
@@ -69,6 +78,66 @@ class MagnetTimeoutError(Exception):
     pass
 
 
+class BactSettleWaiter:
+    """
+    Waits for a magnet's BACT to settle on a BDES value without polling.
+
+    A callback on the BACT PV's monitor sets an event as soon as BACT is
+    within b_tolerance of bdes (the same check as Magnet.is_bact_settled),
+    so wait() sleeps until then. Use it as a context manager around the
+    BDES write so that no monitor update is missed:
+
+        with BactSettleWaiter(magnet, bdes=1.0) as waiter:
+            magnet.bdes = 1.0
+            magnet.trim()
+            settled = waiter.wait(timeout=5)
+    """
+
+    def __init__(self, magnet: "Magnet", bdes: float, b_tolerance: float = 0.005):
+        self.magnet = magnet
+        self.bdes = bdes
+        self.b_tolerance = b_tolerance
+        self.settled_at = None
+        self._pv = magnet.controls_information.PVs.bact
+        self._event = threading.Event()
+        self._callback_index = None
+
+    def _is_settled(self, bact: Optional[float]) -> bool:
+        return bact is not None and abs(self.bdes) - abs(bact) < self.b_tolerance
+
+    def _on_bact(self, value=None, **kwargs) -> None:
+        if not self._event.is_set() and self._is_settled(value):
+            self.settled_at = time.monotonic()
+            self._event.set()
+
+    def __enter__(self) -> "BactSettleWaiter":
+        self._callback_index = self._pv.add_callback(self._on_bact, with_ctrlvars=False)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._pv.remove_callback(self._callback_index)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until BACT has settled or timeout seconds passed, True if settled"""
+        if not self._event.is_set():
+            # monitors only fire on change, BACT may already be there
+            self._on_bact(value=self._pv.get())
+        return self._event.wait(timeout)
+
+
+class SettleResult(NamedTuple):
+    """
+    How one magnet did in MagnetCollection.set_bdes with concurrent=True.
+
+    :cvar seconds: time from the TRIMs being issued until BACT settled, or
+        until the magnet's timeout if it did not
+    """
+
+    bdes: float
+    settled: bool
+    seconds: float
+
+
 class Magnet(Device):
     controls_information: SerializeAsAny[MagnetControlInformation]
     metadata: SerializeAsAny[MagnetMetadata]
@@ -98,8 +167,13 @@ class Magnet(Device):
                 # convert single value to list.
                 if isinstance(options_to_check, str):
                     options = [options_to_check]
+                try:
+                    ctrl_options = self.controls_information.ctrl_options
+                except TimeoutError as error:
+                    print(f"unable to read ctrl options of magnet {self.name}: {error}")
+                    return
                 for option in options:
-                    if option not in self.controls_information.ctrl_options:
+                    if option not in ctrl_options:
                         print(
                             f"unable to perform process {option} with this magnet {self.name}"
                         )
@@ -279,20 +353,26 @@ class Magnet(Device):
             self.set_bdes_with_validation(setting)
             function() if function else None
 
-    def set_bdes_with_validation(self, bval: float, settle_timeout_in_seconds: int = 5):
-        self.bdes = bval
-        self.trim()
-        time_when_trim_started = datetime.now()
-        while not self.is_bact_settled():
-            # Timeout if magnet takes too long to settle
-            if (
-                datetime.now() - time_when_trim_started
-            ).seconds > settle_timeout_in_seconds:
+    def set_bdes_with_validation(
+        self,
+        bval: float,
+        settle_timeout_in_seconds: float = 5,
+        b_tolerance: float = 0.005,
+    ) -> None:
+        """
+        Set BDES, TRIM and wait until BACT has settled, raising
+        MagnetTimeoutError if that takes more than settle_timeout_in_seconds.
+        The wait is woken by BACT monitor updates (see BactSettleWaiter), so
+        it returns as soon as BACT is within b_tolerance.
+        """
+        with BactSettleWaiter(self, bval, b_tolerance) as waiter:
+            self.bdes = bval
+            self.trim()
+            if not waiter.wait(timeout=settle_timeout_in_seconds):
                 raise MagnetTimeoutError(
                     f"Took more than {settle_timeout_in_seconds} seconds for "
                     f"{self.name}:BACT to reach {self.name}:BDES."
                 )
-            time.sleep(0.1)
 
 
 class MagnetCollection(DeviceCollection):
@@ -325,8 +405,10 @@ class MagnetCollection(DeviceCollection):
     def set_bdes(
         self,
         magnet_dict: Dict[str, float],
-        settle_timeout_in_seconds: int = 5,
-    ) -> None:
+        settle_timeout_in_seconds: Union[float, Dict[str, float]] = 5,
+        concurrent: bool = False,
+        b_tolerance: float = 0.005,
+    ) -> Optional[Dict[str, SettleResult]]:
         """
         Set BDES and TRIMs for a set of magnets in the collection by providing settings in the following
         form:
@@ -334,11 +416,21 @@ class MagnetCollection(DeviceCollection):
         {'MAGB' : 1.0, 'MAGC' : 2.0, ..., 'MAGZ' : 3.0}
 
         Automatically waits until each magnet is settled within a wait-time (default = 5 seconds)
+
+        With concurrent, every BDES is written and every magnet trimmed before
+        waiting on all of them together (see _set_bdes_concurrently), and a
+        {magnet: SettleResult} report is returned. settle_timeout_in_seconds
+        may then also be a {magnet: seconds} dict.
         """
 
         if not magnet_dict:
             return
 
+        if concurrent:
+            return self._set_bdes_concurrently(
+                magnet_dict, settle_timeout_in_seconds, b_tolerance
+            )
+
         for magnet, bval in magnet_dict.items():
             try:
                 self.devices[magnet].bdes = bval
@@ -365,6 +457,71 @@ class MagnetCollection(DeviceCollection):
                     f"{magnet} was not set to {bval}.",
                 )
 
+    def _set_bdes_concurrently(
+        self,
+        magnet_dict: Dict[str, float],
+        settle_timeout_in_seconds: Union[float, Dict[str, float]],
+        b_tolerance: float,
+    ) -> Dict[str, SettleResult]:
+        """
+        Write every BDES, then TRIM every magnet, then wait for all of them
+        at once with BactSettleWaiter. The total time is that of the slowest
+        magnet instead of the sum, and nothing is polled while waiting.
+        Magnets whose CTRL options cannot be read are left alone and
+        reported as not settled.
+        """
+        for magnet, bval in magnet_dict.items():
+            if magnet not in self.devices:
+                print(
+                    "You tried to set a magnet that does not exist.",
+                    f"{magnet} was not set to {bval}.",
+                )
+        report = {}
+        settings = {}
+        for magnet, bval in magnet_dict.items():
+            if magnet not in self.devices:
+                continue
+            try:
+                # a magnet that cannot be trimmed keeps its old BDES
+                self.devices[magnet].controls_information.ctrl_options
+            except TimeoutError as error:
+                print(f"{magnet} was not set to {bval}: {error}")
+                report[magnet] = SettleResult(bval, False, 0.0)
+                continue
+            settings[magnet] = bval
+        with ExitStack() as stack:
+            waiters = {
+                magnet: stack.enter_context(
+                    BactSettleWaiter(self.devices[magnet], bval, b_tolerance)
+                )
+                for magnet, bval in settings.items()
+            }
+            for magnet, bval in settings.items():
+                self.devices[magnet].bdes = bval
+            for magnet in settings:
+                self.devices[magnet].trim()
+            time_when_trim_started = time.monotonic()
+            for magnet, waiter in waiters.items():
+                timeout = (
+                    settle_timeout_in_seconds.get(magnet, 5)
+                    if isinstance(settle_timeout_in_seconds, dict)
+                    else settle_timeout_in_seconds
+                )
+                remaining = time_when_trim_started + timeout - time.monotonic()
+                settled = waiter.wait(timeout=max(remaining, 0))
+                seconds = (
+                    max(waiter.settled_at - time_when_trim_started, 0)
+                    if settled
+                    else timeout
+                )
+                if not settled:
+                    print(
+                        f"Took more than {timeout} seconds for "
+                        f"{magnet}:BACT to reach {magnet}:BDES."
+                    )
+                report[magnet] = SettleResult(settings[magnet], settled, seconds)
+        return {magnet: report[magnet] for magnet in magnet_dict if magnet in report}
+
     def scan(
         self,
         scan_settings: List[Dict[str, float]],
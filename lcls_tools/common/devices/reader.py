@@ -1,6 +1,6 @@
+import copy
 import os
-import yaml
-from typing import Union, Optional, Any, Dict
+from typing import Union, Optional, Any, Dict, List, Tuple
 from pydantic import ValidationError
 from lcls_tools.common.devices.screen import Screen, ScreenCollection
 from lcls_tools.common.devices.magnet import Magnet, MagnetCollection
@@ -11,6 +11,7 @@ from lcls_tools.common.devices.bpm import BPM, BPMCollection
 from lcls_tools.common.devices.tcav import TCAV
 from lcls_tools.common.devices.area import Area
 from lcls_tools.common.devices.beampath import Beampath
+from lcls_tools.common.devices.index import get_device_index
 
 DEFAULT_YAML_LOCATION = os.path.join(os.path.dirname(__file__), "yaml/")
 
@@ -43,13 +44,13 @@ def _device_data(
             location = _find_yaml_file(
                 area=area,
             )
-            with open(location, "r") as device_file:
-                device_data = yaml.safe_load(device_file)
-                if device_type:
-                    if name:
-                        return device_data[device_type][name]
-                    return {device_type: device_data[device_type]}
-                return device_data
+            # the index shares its parsed data, so hand out copies of it
+            device_data = get_device_index().load(location)
+            if device_type:
+                if name:
+                    return copy.deepcopy(device_data[device_type][name])
+                return {device_type: copy.deepcopy(device_data[device_type])}
+            return copy.deepcopy(device_data)
         except FileNotFoundError:
             print(f"Could not find yaml file for area: {area}")
             return None
@@ -190,7 +191,7 @@ def create_pmt(area: str = None, name: str = None) -> Union[None, PMT]:
         return PMTCollection(**device_data)
 
 
-def create_area(area: str = None) -> Union[None, Area]:
+def create_area(area: str = None, lazy: bool = False) -> Union[None, Area]:
     """
     Constructs an Area object from YAML device configuration data.
 
@@ -202,19 +203,36 @@ def create_area(area: str = None) -> Union[None, Area]:
     Parameters:
         area (str): The name of the area to load. Must match a valid YAML file
                     containing device definitions.
+        lazy (bool): Only create each device collection when it is first
+                    accessed. Validation errors are then raised on access.
 
     Returns:
         Area: An Area object with all valid devices instantiated.
         None: If the YAML data is missing or contains validation errors.
     """
-    yaml_data = _device_data(area=area)
-    if not yaml_data:
-        return None
     try:
-        return Area(name=area, **yaml_data)
-    except ValidationError as field_error:
-        print("Error trying to create area", area, " : ", field_error)
+        return _build_area(area=area, lazy=lazy)
+    except (FileNotFoundError, ValidationError) as error:
+        _report_area_error(area, error)
+        return None
+
+
+def _build_area(area: str, lazy: bool = False) -> Optional[Area]:
+    """create_area without the error handling"""
+    yaml_data = get_device_index().load(_find_yaml_file(area=area))
+    if not yaml_data:
         return None
+    if not lazy:
+        # the index shares its parsed data, a lazy Area copies what it needs
+        yaml_data = copy.deepcopy(yaml_data)
+    return Area(name=area, lazy=lazy, **yaml_data)
+
+
+def _report_area_error(area: str, error: Exception) -> None:
+    if isinstance(error, FileNotFoundError):
+        print(f"Could not find yaml file for area: {area}")
+    else:
+        print("Error trying to create area", area, " : ", error)
 
 
 def _flatten(nested_list):
@@ -229,7 +247,34 @@ def _flatten(nested_list):
     return nested_list[:1] + _flatten(nested_list[1:])
 
 
-def create_beampath(beampath: str = None) -> Union[None, Beampath]:
+def _create_areas(
+    area_names: List[str], lazy: bool = False
+) -> Tuple[Dict[str, Area], Dict[str, Exception]]:
+    """
+    Create the areas, in order, and collect why the others could not be.
+    Building an area does no channel access (PVs and enum strings are read
+    on first use), it is all pydantic validation, so threads would not help
+    and the areas do not pickle for a process pool. See
+    benchmarks/bench_create_beampath.py, or use lazy=True.
+    """
+    areas, failures = {}, {}
+    with get_device_index().batch():
+        for area in area_names:
+            try:
+                created_area = _build_area(area=area, lazy=lazy)
+            except (FileNotFoundError, ValidationError) as error:
+                _report_area_error(area, error)
+                failures[area] = error
+                continue
+            if created_area:
+                areas[area] = created_area
+    return areas, failures
+
+
+def create_beampath(
+    beampath: str = None,
+    lazy: bool = False,
+) -> Union[None, Beampath]:
     """
     Constructs a Beampath object from a YAML configuration file.
 
@@ -242,16 +287,17 @@ def create_beampath(beampath: str = None) -> Union[None, Beampath]:
     Parameters:
         beampath (str): The name of the beampath to load. Must exist as a key
                         in the beampaths.yaml file.
+        lazy (bool): Only create the areas when Beampath.areas is first
+                    accessed, and each area's collections when those are.
+                    area_names and contains_areas never create anything.
 
     Returns:
         Beampath: A Beampath object containing all valid Area instances.
+                  Areas that could not be created are in its failed_areas.
         None: If the beampath name is not found or if any area cannot be created.
     """
     beampath_definition_file = os.path.join(DEFAULT_YAML_LOCATION, "beampaths.yaml")
-    beampath_definitions = {}
-    areas = {}
-    with open(beampath_definition_file, "r") as file:
-        beampath_definitions = yaml.safe_load(file)
+    beampath_definitions = get_device_index().load(beampath_definition_file)
     try:
         areas_to_create = _flatten(beampath_definitions[beampath])
     except KeyError:
@@ -259,12 +305,21 @@ def create_beampath(beampath: str = None) -> Union[None, Beampath]:
             "Beampath: ", beampath, " does not exist. Please try a different beampath."
         )
         return None
+    if lazy:
+        created_beampath = Beampath(name=beampath, area_names=areas_to_create)
+
+        def create_lazy_areas():
+            areas, failures = _create_areas(areas_to_create, lazy=True)
+            created_beampath._failed_areas = failures
+            return areas
+
+        created_beampath.defer("areas", create_lazy_areas)
+        return created_beampath
     try:
-        for area in areas_to_create:
-            created_area = create_area(area=area)
-            if created_area:
-                areas[area] = created_area
-        return Beampath(name=beampath, **{"areas": areas})
+        areas, failures = _create_areas(areas_to_create)
+        created_beampath = Beampath(name=beampath, **{"areas": areas})
+        created_beampath._failed_areas = failures
+        return created_beampath
     except KeyError as ke:
         print(
             "Area: ",
@@ -2,10 +2,15 @@ import datetime
 import os
 from typing import (
     Any,
+    ClassVar,
     Dict,
+    Iterator,
+    NamedTuple,
     Optional,
+    Tuple,
 )
-from threading import Thread
+from threading import Condition, Lock, Thread
+import weakref
 
 from lcls_tools.common.devices.device import (
     Device,
@@ -20,6 +25,8 @@ import h5py
 from pydantic import Field, SerializeAsAny, PositiveFloat
 import numpy as np
 
+_geometry_lock = Lock()
+
 
 class ScreenPVSet(PVSet):
     """
@@ -60,6 +67,295 @@ class ScreenControlInformation(ControlInformation):
         super().__init__(**kwargs)
 
 
+class CameraGeometry(NamedTuple):
+    """What it takes to turn a screen's image waveform into an image"""
+
+    n_columns: int
+    n_rows: int
+    resolution: float
+    orient_x: Optional[str]
+    orient_y: Optional[str]
+
+
+# {id(image PV): (buffers using it, its auto_monitor before the first one)}
+_monitor_users: Dict[int, Tuple[int, Any]] = {}
+_monitor_users_lock = Lock()
+
+
+class ImageRingBuffer:
+    """
+    Collects the next n unique frames of a screen from monitor callbacks.
+
+    Every new frame is copied into one preallocated (n, columns, rows)
+    array, so nothing is allocated per frame and wait() sleeps until the
+    frames are in. A frame counts as new when its timestamp, or its pulse ID
+    with dedupe="pulse_id", differs from the previous frame, so a camera
+    that re-sends the same frame is not counted twice. The frame on the
+    screen when the buffer starts is not counted either. Use it as a
+    context manager so the callback is removed again:
+
+        with ImageRingBuffer(screen, n=10) as buffer:
+            if buffer.wait(timeout=5):
+                images = buffer.images
+
+    With fewer slots than frames the array is used as a ring: stream()
+    hands out each frame in turn and frees its slot for the next one, so a
+    long capture only needs memory for the slots. Frames arriving while
+    every slot is still unread are skipped and counted in skipped.
+    """
+
+    PULSE_ID_MASK = 0x1FFFF  # pulse ID is in the lower 17 bits of nanoseconds
+
+    def __init__(
+        self,
+        screen: "Screen",
+        n: int,
+        dedupe: str = "timestamp",
+        dtype: Optional[np.dtype] = None,
+        slots: Optional[int] = None,
+    ):
+        if n < 1:
+            raise ValueError(f"Need at least one frame, got {n}")
+        slots = n if slots is None else min(slots, n)
+        if slots < 1:
+            raise ValueError(f"Need at least one slot, got {slots}")
+        if dedupe not in ("timestamp", "pulse_id"):
+            raise ValueError(f"dedupe must be timestamp or pulse_id, not {dedupe}")
+        self.n = n
+        self.slots = slots
+        self.dedupe = dedupe
+        geometry = screen.camera_geometry
+        self.shape = (int(geometry.n_columns), int(geometry.n_rows))
+        self.count = 0
+        self.skipped = 0
+        self.timestamps = np.zeros(slots)
+        self.pulse_ids = np.zeros(slots, dtype=np.int64)
+        self._size = self.shape[0] * self.shape[1]
+        self._flip_axes = tuple(
+            axis
+            for axis, orientation in ((1, geometry.orient_x), (2, geometry.orient_y))
+            if orientation == "Negative"
+        )
+        self._buffer = None if dtype is None else np.empty((slots, *self.shape), dtype)
+        self._pv = screen.controls_information.PVs.image
+        self._callback_index = None
+        self._last_key = None
+        self._read = 0
+        self._start_timestamp = None
+        self._condition = Condition()
+
+    def _key(self, timestamp: float, nanoseconds: Optional[int]):
+        if self.dedupe == "pulse_id" and nanoseconds is not None:
+            return nanoseconds & self.PULSE_ID_MASK
+        return timestamp
+
+    def _on_image(self, value=None, timestamp=None, nanoseconds=None, **kwargs):
+        if value is None or timestamp == self._start_timestamp:
+            return
+        with self._condition:
+            key = self._key(timestamp, nanoseconds)
+            if self.count >= self.n or key == self._last_key:
+                return
+            self._last_key = key
+            if self.count - self._read >= self.slots:
+                self.skipped += 1
+                return
+            if self._buffer is None:
+                # no dtype given, so take it from the camera, once
+                self._buffer = np.empty((self.slots, *self.shape), value.dtype)
+            slot = self.count % self.slots
+            np.copyto(
+                self._buffer[slot],
+                value[: self._size].reshape(self.shape),
+                casting="unsafe",
+            )
+            self.timestamps[slot] = timestamp
+            self.pulse_ids[slot] = (
+                -1 if nanoseconds is None else nanoseconds & self.PULSE_ID_MASK
+            )
+            self.count += 1
+            self._condition.notify_all()
+
+    def __enter__(self) -> "ImageRingBuffer":
+        self._start_timestamp = self._pv.timestamp
+        # large waveforms are not monitored by default. Buffers may overlap
+        # on one screen, the last one out restores what was there before
+        with _monitor_users_lock:
+            users, before = _monitor_users.get(id(self._pv), (0, None))
+            if not users:
+                before = self._pv.auto_monitor
+                if not before:
+                    self._pv.auto_monitor = True
+            _monitor_users[id(self._pv)] = (users + 1, before)
+        self._callback_index = self._pv.add_callback(
+            self._on_image, with_ctrlvars=False
+        )
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._pv.remove_callback(self._callback_index)
+        with _monitor_users_lock:
+            users, before = _monitor_users.pop(id(self._pv))
+            if users > 1:
+                _monitor_users[id(self._pv)] = (users - 1, before)
+            elif self._pv.auto_monitor != before:
+                self._pv.auto_monitor = before
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until all n frames are in, True if they are. Gives up when no
+        new frame arrived for timeout seconds.
+        """
+        with self._condition:
+            while self.count < self.n:
+                if not self._condition.wait_for(
+                    lambda count=self.count: self.count > count, timeout=timeout
+                ):
+                    return False
+            return True
+
+    def stream(
+        self, timeout: Optional[float] = None
+    ) -> Iterator[Tuple[np.ndarray, float, int]]:
+        """
+        Yield (image, timestamp, pulse_id) for every frame as it arrives,
+        until all n frames are through or none arrived for timeout seconds.
+        The image is a view of its slot, which is reused once the loop moves
+        on, so write or copy it before that. Pulse IDs are -1 if unknown.
+        """
+        frame_axes = tuple(axis - 1 for axis in self._flip_axes)
+        while self._read < self.n:
+            with self._condition:
+                if not self._condition.wait_for(
+                    lambda: self.count > self._read, timeout=timeout
+                ):
+                    return
+            slot = self._read % self.slots
+            yield (
+                np.flip(self._buffer[slot], frame_axes),
+                self.timestamps[slot],
+                self.pulse_ids[slot],
+            )
+            with self._condition:
+                self._read += 1
+
+    @property
+    def images(self) -> np.ndarray:
+        """
+        The frames collected so far, flipped like Screen.image (a view).
+        Only for buffers with a slot for every frame, see stream() otherwise.
+        """
+        if self._buffer is None:
+            return np.empty((0, *self.shape))
+        return np.flip(self._buffer[: self.count], self._flip_axes)
+
+
+class ImageHDF5Writer:
+    """
+    Appends images to one chunked, resizable (n, columns, rows) dataset
+    "images" of an HDF5 file as they arrive, so nothing is kept in memory.
+    Per-frame timestamps and pulse IDs go to the "timestamps" and
+    "pulse_ids" datasets, and attrs are written once, on "images":
+
+        with ImageHDF5Writer(filename, shape=(640, 480), attrs=attrs) as writer:
+            writer.append(image, timestamp, pulse_id)
+
+    Every image is its own chunk, compressed with compression ("lzf" for
+    speed, "gzip" with compression_opts 0-9 for size) if given. Datasets
+    grow grow_by frames at a time and are trimmed to count when closed.
+    Set skipped to the number of frames that were lost on the way (see
+    ImageRingBuffer.skipped), it is written to "images" as well on close.
+    """
+
+    COMPRESSIONS = (None, "lzf", "gzip")
+
+    def __init__(
+        self,
+        filename: str,
+        shape: Tuple[int, int],
+        dtype: np.dtype = np.ushort,
+        attrs: Optional[Dict[str, Any]] = None,
+        compression: Optional[str] = None,
+        compression_opts: Optional[int] = None,
+        grow_by: int = 64,
+    ):
+        if compression not in self.COMPRESSIONS:
+            raise ValueError(
+                f"compression must be one of {self.COMPRESSIONS}, not {compression}"
+            )
+        self.filename = filename
+        self.shape = tuple(shape)
+        self.dtype = dtype
+        self.attrs = attrs or {}
+        self.compression = compression
+        self.compression_opts = compression_opts
+        self.grow_by = grow_by
+        self.count = 0
+        self.skipped = 0
+        self._file = None
+        self._datasets = []
+
+    def __enter__(self) -> "ImageHDF5Writer":
+        self._file = h5py.File(self.filename, "a")
+        self._images = self._file.create_dataset(
+            "images",
+            shape=(0, *self.shape),
+            maxshape=(None, *self.shape),
+            chunks=(1, *self.shape),
+            dtype=self.dtype,
+            compression=self.compression,
+            compression_opts=self.compression_opts,
+        )
+        self._images.attrs.update(self.attrs)
+        self._timestamps = self._file.create_dataset(
+            "timestamps",
+            shape=(0,),
+            maxshape=(None,),
+            chunks=(self.grow_by,),
+            dtype=np.float64,
+        )
+        self._pulse_ids = self._file.create_dataset(
+            "pulse_ids",
+            shape=(0,),
+            maxshape=(None,),
+            chunks=(self.grow_by,),
+            dtype=np.int64,
+        )
+        self._datasets = [self._images, self._timestamps, self._pulse_ids]
+        return self
+
+    def __exit__(self, *exc) -> None:
+        for dataset in self._datasets:
+            dataset.resize(self.count, axis=0)
+        self._images.attrs["skipped"] = self.skipped
+        self._file.close()
+
+    def append(
+        self, image: np.ndarray, timestamp: float = np.nan, pulse_id: int = -1
+    ) -> None:
+        """Write image (converted to dtype if needed) as the next frame"""
+        if self.count == len(self._images):
+            for dataset in self._datasets:
+                dataset.resize(self.count + self.grow_by, axis=0)
+        self._images[self.count] = image
+        self._timestamps[self.count] = timestamp
+        self._pulse_ids[self.count] = pulse_id
+        self.count += 1
+
+
+def _on_geometry_change(screen_ref: "weakref.ref[Screen]", **kwargs) -> None:
+    # holds the screen weakly, so its monitors do not keep it alive
+    screen = screen_ref()
+    if screen is not None:
+        screen._on_geometry_change(**kwargs)
+
+
+def _remove_geometry_callbacks(callbacks: Dict[str, Tuple[PV, int]]) -> None:
+    for pv, index in callbacks.values():
+        pv.remove_callback(index)
+    callbacks.clear()
+
+
 class Screen(Device):
     controls_information: SerializeAsAny[ScreenControlInformation]
     metadata: SerializeAsAny[Metadata]
@@ -68,17 +364,112 @@ class Screen(Device):
     _saving_images: Optional[bool] = False
     _root_hdf5_location: Optional[str] = "."
     _last_save_filepath: Optional[str] = ""
+    # frames held in memory while save_images streams them to file
+    IMAGE_STREAM_SLOTS: ClassVar[int] = 16
+    _geometry: Optional[CameraGeometry] = None
+    _geometry_new_orientation: Optional[bool] = None
+    _geometry_callbacks: Optional[Dict[str, Tuple[PV, int]]] = None
+    _geometry_finalizer: Optional[weakref.finalize] = None
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
     def flip_image(self, image):
-        if self.orient_x == "Negative":
+        """Flip image (a view, not a copy) to the orientation of the camera"""
+        geometry = self.camera_geometry
+        if geometry.orient_x == "Negative":
             image = np.flip(image, 0)
-        if self.orient_y == "Negative":
+        if geometry.orient_y == "Negative":
             image = np.flip(image, 1)
         return image
 
+    @property
+    def camera_geometry(self) -> CameraGeometry:
+        """
+        Size, resolution and orientation of the camera. They are read from
+        EPICS once and then kept up to date by monitors on their PVs, so
+        reading an image takes a single get of the waveform. The monitors
+        are removed by stop_camera_geometry_monitors, or when the screen is
+        garbage collected.
+        """
+        geometry = self._geometry
+        if geometry is None or self._geometry_new_orientation != self.new_orientation:
+            geometry = self.refresh_camera_geometry()
+        return geometry
+
+    def refresh_camera_geometry(self) -> CameraGeometry:
+        """Read the camera geometry from EPICS again, see camera_geometry"""
+        pvs = self.controls_information.PVs
+        monitored = {
+            "n_columns": pvs.n_col,
+            "n_rows": pvs.n_row,
+            "resolution": pvs.resolution,
+        }
+        values = {field: pv.get() for field, pv in monitored.items()}
+        for field in ["orient_x", "orient_y"]:
+            cached = self._cached_orientation(field)
+            if cached is not None:
+                values[field] = cached
+            elif (pv := getattr(pvs, field, None)) is not None:
+                monitored[field] = pv
+                values[field] = pv.get(as_string=True)
+            else:
+                values[field] = None
+        geometry = CameraGeometry(**values)
+        if geometry.n_columns is None or geometry.n_rows is None:
+            # not connected, try again next time instead of keeping this
+            return geometry
+        with _geometry_lock:
+            self._geometry = geometry
+            self._geometry_new_orientation = self.new_orientation
+            if self._geometry_callbacks is None:
+                self._geometry_callbacks = {}
+                self._geometry_finalizer = weakref.finalize(
+                    self, _remove_geometry_callbacks, self._geometry_callbacks
+                )
+                # pyepics may be gone by then, and the process with it
+                self._geometry_finalizer.atexit = False
+            for field, pv in monitored.items():
+                if field not in self._geometry_callbacks:
+                    index = pv.add_callback(
+                        _on_geometry_change,
+                        with_ctrlvars=False,
+                        screen_ref=weakref.ref(self),
+                        geometry_field=field,
+                    )
+                    self._geometry_callbacks[field] = (pv, index)
+        return geometry
+
+    def stop_camera_geometry_monitors(self) -> None:
+        """
+        Remove the monitor callbacks of camera_geometry from the PVs, it is
+        read from EPICS again on next use
+        """
+        with _geometry_lock:
+            if self._geometry_finalizer is not None:
+                self._geometry_finalizer()
+            self._geometry_callbacks = None
+            self._geometry_finalizer = None
+            self._geometry = None
+
+    def _on_geometry_change(
+        self, geometry_field: str, value=None, char_value=None, **kwargs
+    ) -> None:
+        if value is None:
+            return
+        if geometry_field.startswith("orient"):
+            value = char_value
+        with _geometry_lock:
+            if self._geometry is not None:
+                self._geometry = self._geometry._replace(**{geometry_field: value})
+
+    def _cached_orientation(self, field: str) -> Optional[str]:
+        """Orientation from pv_cache, unless new_orientation asks for the PVs"""
+        pv_cache = getattr(self.controls_information, "pv_cache", None)
+        if pv_cache is not None and not self.new_orientation:
+            return pv_cache.get(field)
+        return None
+
     @property
     def image(self) -> np.ndarray:
         """
@@ -86,12 +477,26 @@ class Screen(Device):
         reshaped to the dimensions of
         the camera associated with this screen
         """
+        geometry = self.camera_geometry
         img = self.controls_information.PVs.image.get(
             as_numpy=True, timeout=self.timeout
-        ).reshape(self.n_columns, self.n_rows)
+        ).reshape(geometry.n_columns, geometry.n_rows)
         img = self.flip_image(img)
         return img
 
+    def get_images(self, n: int, timeout: Optional[float] = 10) -> np.ndarray:
+        """
+        The next n unique images from EPICS as one (n, columns, rows) array.
+        Waits on monitor updates, see ImageRingBuffer, and raises
+        TimeoutError if no new image arrived for timeout seconds.
+        """
+        with ImageRingBuffer(self, n) as buffer:
+            if not buffer.wait(timeout):
+                raise TimeoutError(
+                    f"Only got {buffer.count} of {n} images from {self.name}"
+                )
+        return buffer.images
+
     @property
     def image_timeout(self):
         return self.timeout
@@ -119,25 +524,11 @@ class Screen(Device):
 
     @property
     def orient_x(self):
-        i = self.controls_information
-        pv_cache = getattr(i, "pv_cache", None)
-        if pv_cache is not None and not self.new_orientation:
-            if "orient_x" in pv_cache:
-                return pv_cache["orient_x"]
-        if (pv := getattr(i.PVs, "orient_x", None)) is not None:
-            return pv.get(as_string=True)
-        return None
+        return self.camera_geometry.orient_x
 
     @property
     def orient_y(self):
-        i = self.controls_information
-        pv_cache = getattr(i, "pv_cache", None)
-        if pv_cache is not None and not self.new_orientation:
-            if "orient_y" in pv_cache:
-                return pv_cache["orient_y"]
-        if (pv := getattr(i.PVs, "orient_y", None)) is not None:
-            return pv.get(as_string=True)
-        return None
+        return self.camera_geometry.orient_y
 
     @property
     def hdf_save_location(self) -> str:
@@ -170,12 +561,12 @@ class Screen(Device):
     @property
     def n_columns(self):
         """The number of columns in the screen image"""
-        return self.controls_information.PVs.n_col.get()
+        return self.camera_geometry.n_columns
 
     @property
     def n_rows(self):
         """The number of rows in the screen image"""
-        return self.controls_information.PVs.n_row.get()
+        return self.camera_geometry.n_rows
 
     @property
     def n_bits(self):
@@ -185,7 +576,7 @@ class Screen(Device):
     @property
     def resolution(self):
         """The conversion factor of pixels to mm"""
-        return self.controls_information.PVs.resolution.get()
+        return self.camera_geometry.resolution
 
     @property
     def last_save_filepath(self):
@@ -244,14 +635,16 @@ class Screen(Device):
         extra_metadata: Optional[Dict[str, Any]] = None,
         threaded=True,
         timeout_in_seconds: int = 10,
+        compression: Optional[str] = None,
     ):
         """
         Collect and saves images to HDF5.
         Option for threading which spawns a child process
         in a way that dependant GUIs/Code do not hang.
         The extra_metadata dictionary will be attached
-        to the metadata for each image in HDF5 .
-
+        to the metadata of the images in HDF5.
+        Images are compressed with compression ("lzf" or "gzip") if given,
+        see ImageHDF5Writer.
         """
         if threaded:
             work = Thread(
@@ -260,6 +653,7 @@ class Screen(Device):
                     num_to_capture,
                     extra_metadata,
                     timeout_in_seconds,
+                    compression,
                 ],
             )
             # normally we join after start, but that blocked the pyqt main thread
@@ -270,6 +664,7 @@ class Screen(Device):
                 num_collect=num_to_capture,
                 extra_metadata=extra_metadata,
                 timeout=timeout_in_seconds,
+                compression=compression,
             )
 
     def _take_images(
@@ -277,83 +672,92 @@ class Screen(Device):
         num_collect: int = 1,
         extra_metadata: Optional[Dict[str, Any]] = None,
         timeout: Optional[int] = 10,
+        compression: Optional[str] = None,
     ):
         """
         Performs the work for collecting images and saving to HDF5 file.
-        This procedure will collect all images and then save them all to file.
+        Images are streamed from an ImageRingBuffer into an ImageHDF5Writer
+        as they arrive, so memory use does not grow with num_collect.
 
         If, for any image, we cannot collect within the time provided as timeout,
-        we will stop collecting and save out what was collected before the failure.
+        we will stop collecting and keep what was saved before the failure.
         """
         self._saving_images = True
         filename = self._generate_new_filename()
-        captures = []
-        last_updated_at = self.image_timestamp
-        acquisition_start = datetime.datetime.now()
-        while len(captures) != num_collect:
-            if datetime.datetime.now() - acquisition_start > datetime.timedelta(
-                seconds=timeout
-            ):
-                print(
-                    "Could not save capture ",
-                    len(captures) + 1,
-                    " out of ",
-                    num_collect,
-                    " due to timeout. Exiting image collection for ",
-                    self.name,
-                    ". Saving out to HDF5 will happen now.",
-                )
-                break
-            if self.image_timestamp != last_updated_at:
-                capture = self.image
-                last_updated_at = self.image_timestamp
-                captures.append(capture)
-                acquisition_start = datetime.datetime.now()
-        self._write_image_to_hdf5(
-            images=captures,
-            filename=filename,
-            extra_metadata=extra_metadata,
+        buffer = ImageRingBuffer(
+            self, num_collect, slots=self.IMAGE_STREAM_SLOTS, dtype=np.ushort
         )
+        with (
+            buffer,
+            ImageHDF5Writer(
+                filename,
+                shape=buffer.shape,
+                attrs=self._hdf5_attributes(extra_metadata),
+                compression=compression,
+            ) as writer,
+        ):
+            for image, timestamp, pulse_id in buffer.stream(timeout):
+                writer.append(image, timestamp, pulse_id)
+            writer.skipped = buffer.skipped
+        if buffer.skipped:
+            print(
+                "Skipped ",
+                buffer.skipped,
+                " frames that arrived faster than they could be saved for ",
+                self.name,
+                ".",
+            )
+        if writer.count < num_collect:
+            print(
+                "Could not save capture ",
+                writer.count + 1,
+                " out of ",
+                num_collect,
+                " due to timeout. Exiting image collection for ",
+                self.name,
+                ".",
+            )
         self._last_save_filepath = filename
         self._saving_images = False
         print("save images finished.")
         return
 
+    def _hdf5_attributes(
+        self, extra_metadata: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """The screen metadata and extra_metadata as HDF5 attributes"""
+        attrs = {key: value or h5py.Empty("f4") for key, value in self.metadata}
+        if extra_metadata:
+            # we update with original key if it isn't in our normal screen metadata
+            # otherwise, prepend user_ to the key to retain all information.
+            for key, value in extra_metadata.items():
+                if key not in self.metadata:
+                    attrs[key] = value or h5py.Empty("f4")
+                else:
+                    attrs["user_" + key] = value
+        return attrs
+
     def _write_image_to_hdf5(
         self,
         images: np.ndarray,
         filename: str,
         extra_metadata: Optional[Dict[str, Any]] = None,
+        compression: Optional[str] = None,
     ):
         """
-        Saves a set of images to the hdf_save_location with the filename provided.
-        Any metadata provided as extra_metadata will be attached to each dataset in the HDF5 file.
+        Saves a set of images to the hdf_save_location with the filename provided,
+        in the same layout as save_images, see ImageHDF5Writer.
+        Any metadata provided as extra_metadata is attached to the images dataset.
         """
-        with h5py.File(filename, "a") as f:
-            capture_num = 0
+        images = np.asarray(images)
+        with ImageHDF5Writer(
+            filename,
+            shape=images.shape[1:],
+            attrs=self._hdf5_attributes(extra_metadata),
+            compression=compression,
+        ) as writer:
             for image in images:
-                # todo, check type-representation of images, are we sure they are unsigned-shorts??
-                dset = f.create_dataset(
-                    name=str(capture_num), data=image, dtype=np.ushort
-                )
-                [
-                    dset.attrs.update({key: value or h5py.Empty("f4")})
-                    for key, value in self.metadata
-                ]
-                if extra_metadata:
-                    # dset.attrs acts as a dictionary here
-                    # we update with original key if it isn't in our normal screen metadata
-                    # otherwise, prepend user_ to the key to retain all information.
-                    [
-                        (
-                            dset.attrs.update({key: value or h5py.Empty("f4")})
-                            if key not in self.metadata
-                            else dset.attrs.update({"user_" + key: value})
-                        )
-                        for key, value in extra_metadata.items()
-                    ]
-
-                capture_num += 1
+                writer.append(image)
         return
 
 
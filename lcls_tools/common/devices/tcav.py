@@ -3,9 +3,11 @@ from pydantic import (
     SerializeAsAny,
 )
 from typing import (
+    ClassVar,
     Dict,
     Optional,
     List,
+    Tuple,
 )
 from lcls_tools.common.devices.device import (
     Device,
@@ -31,92 +33,66 @@ class TCAVPVSet(PVSet):
 
 class TCAVControlInformation(ControlInformation):
     PVs: SerializeAsAny[TCAVPVSet]
-    _mode_config_options: SerializeAsAny[Optional[Dict[str, int]]] = dict()
-    _amplitude_feedback_options: SerializeAsAny[Optional[Dict[str, int]]] = dict()
-    _phase_feedback_options: SerializeAsAny[Optional[Dict[str, int]]] = dict()
+    _enum_fields: ClassVar[Tuple[str, ...]] = (
+        "mode_config",
+        "amplitude_fbenb",
+        "phase_fbenb",
+    )
 
-    def model_post_init(self, __context) -> None:
+    def _fetch_options(self, field: str) -> Dict[str, int]:
         """
-        Post-initialization hook for Pydantic models.
-        Retrieves and stores all PV enum options immediately after model creation.
-        Args:
-            __context: Reserved for Pydantic internals. Must be present for compliance.
+        Enum options of a PV, fetched on first use and kept after that.
         Raises:
-            TimeoutError: If any PV fails to return its control variables.
+            TimeoutError: If the PV does not return control variables within the timeout period.
         """
-        _ = __context  # avoid linter warning for unused variable
-        self.set_mode_config_option()
-        self.set_amplitude_feedback_options()
-        self.setup_phase_feedback_option()
+        options = self.enum_options(field, timeout=2.5)
+        if options is None:
+            raise TimeoutError(
+                f"Timeout while retrieving control variables from {field} PV."
+            )
+        return options
 
     def set_mode_config_option(self):
         """
         Fetches and stores the enumerated options for the mode configuration PV.
-        This method calls `get_ctrlvars()` on the `mode_configs` PV to retrieve
-        its enum string options and populates the `_mode_config_options` dictionary.
+        They are otherwise fetched on first use of `mode_config_options`.
         Raises:
             TimeoutError: If the PV does not return control variables within the timeout period.
         """
-        mode_config_options = self.PVs.mode_config.get_ctrlvars(timeout=2.5)
-        if not mode_config_options:
-            raise TimeoutError(
-                "Timeout while retrieving control variables from mode_configs PV."
-            )
-
-        self._mode_config_options.update(
-            {option: i for i, option in enumerate(mode_config_options["enum_strs"])}
-        )
+        self._enum_options.pop("mode_config", None)
+        self._fetch_options("mode_config")
 
     def set_amplitude_feedback_options(self):
         """
         Fetches and stores the enumerated options for the amplitude feedback enable PV.
-        Retrieves enum strings from the `amp_fbenb` PV using `get_ctrlvars()` and
-        updates `_amplitude_feedback_options`.
+        They are otherwise fetched on first use of `amplitude_feedback_options`.
         Raises:
             TimeoutError: If control variables are not returned within the timeout duration.
         """
-        amplitude_feedback_options = self.PVs.amplitude_fbenb.get_ctrlvars(timeout=2.5)
-        if not amplitude_feedback_options:
-            raise TimeoutError(
-                "Timeout while retrieving control variables from amp_fbenb PV."
-            )
-
-        self._amplitude_feedback_options.update(
-            {
-                option: i
-                for i, option in enumerate(amplitude_feedback_options["enum_strs"])
-            }
-        )
+        self._enum_options.pop("amplitude_fbenb", None)
+        self._fetch_options("amplitude_fbenb")
 
     def setup_phase_feedback_option(self):
         """
         Fetches and stores the enumerated options for the phase feedback enable PV.
-        Uses `get_ctrlvars()` on the `phase_fbenb` PV to retrieve available options
-        and populates `_phase_feedback_options`.
+        They are otherwise fetched on first use of `phase_feedback_options`.
         Raises:
             TimeoutError: If control variables are not available within the timeout window.
         """
-        phase_feedback_option = self.PVs.phase_fbenb.get_ctrlvars(timeout=2.5)
-        if not phase_feedback_option:
-            raise TimeoutError(
-                "Timeout while retrieving control variables from phase_fbenb PV."
-            )
-
-        self._phase_feedback_options.update(
-            {option: i for i, option in enumerate(phase_feedback_option["enum_strs"])}
-        )
+        self._enum_options.pop("phase_fbenb", None)
+        self._fetch_options("phase_fbenb")
 
     @property
     def mode_config_options(self):
-        return self._mode_config_options
+        return self._fetch_options("mode_config")
 
     @property
     def amplitude_feedback_options(self):
-        return self._amplitude_feedback_options
+        return self._fetch_options("amplitude_fbenb")
 
     @property
     def phase_feedback_options(self):
-        return self._phase_feedback_options
+        return self._fetch_options("phase_fbenb")
 
 
 class TCAVMetadata(Metadata):
@@ -70,15 +70,12 @@ class ScreenBeamProfileMeasurement(BeamProfileMeasurement):
 
     def measure(self) -> ScreenBeamProfileMeasurementResult:
         """
-        Measurement takes self.n_shots number of images and stores them
-        in a list, processes them, and if self.fit_profile = True,
+        Measurement takes self.n_shots number of unique images and stores
+        them in an array, processes them, and if self.fit_profile = True,
         fits the profile of the beam for each image. The results are
         then returned in a ScreenBeamProfileMeasurementResult.
         """
-        images = []
-        while len(images) < self.n_shots:
-            images.append(self.beam_profile_device.image)
-            # TODO: need to add a wait statement in here for images to update
+        images = self.beam_profile_device.get_images(self.n_shots)
 
         processed_images, offsets = self.image_processor.process(
             images, return_offsets=True
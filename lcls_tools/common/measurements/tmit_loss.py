@@ -1,7 +1,7 @@
+from lcls_tools.common.devices.index import get_device_lookup
 from lcls_tools.common.devices.reader import create_bpm
 from lcls_tools.common.measurements.measurement import Measurement
 from lcls_tools.common.measurements.utils import collect_with_size_check
-import meme.names
 import pandas as pd
 from edef import BSABuffer
 from lcls_tools.common.devices.wire import Wire
@@ -63,9 +63,8 @@ class TMITLoss(Measurement):
         Retrieve BPM elements and their corresponding EPICS names for a
         given beam path.
 
-        This method queries BPM elements and devices using the `meme.names`
-        module.  It extracts the area from each BPM device name and replaces
-        any area containing "BPN" with "BYP" for proper YAML file lookup.
+        This method looks up the BPMs with a TMIT PV on the beam path in
+        the device index, ordered by z, without any network round trips.
 
         Args:
             beampath (str): The beam path tag used to filter BPM elements
@@ -77,22 +76,23 @@ class TMITLoss(Measurement):
                                 corresponding areas.
                 - list: A list of BPM device names.
         """
-        # List of BPM MAD names based on beampath
-        bpms_elements = meme.names.list_elements(
-            "BPMS:%TMIT", tag=self.beampath, sort_by="z"
-        )
-
-        # List of BPM EPICS names based on beampath
-        bpms_devices = meme.names.list_devices(
-            "BPMS:%TMIT", tag=self.beampath, sort_by="z"
-        )
+        bpms = [
+            record
+            for record in get_device_lookup().between(
+                beampath=self.beampath, types="bpms"
+            )
+            if "tmit" in record.spec["controls_information"].get("PVs", {})
+        ]
 
         # Make Dataframe with two columns: First is the Element (MAD) name
-        # Second column is the area
-        areas_bpn = [device.split(":")[1] for device in bpms_devices]
-        # If EPICS name uses "BPN" for area, instead use "BYP"
-        areas = ["BYP" if "BPN" in item else item for item in areas_bpn]
-        bpms_elements = pd.DataFrame({"Element": bpms_elements, "Area": areas})
+        # Second column is the area (the YAML file it is defined in)
+        bpms_elements = pd.DataFrame(
+            {
+                "Element": [record.name for record in bpms],
+                "Area": [record.area for record in bpms],
+            }
+        )
+        bpms_devices = [record.control_name for record in bpms]
         return bpms_elements, bpms_devices
 
     def create_bpms(self, bpms_elements):
@@ -1,5 +1,71 @@
-from pydantic import BaseModel, ConfigDict
+import threading
+from typing import Any, Callable, Dict
+
+from pydantic import BaseModel, ConfigDict, PrivateAttr, model_serializer
 
 
 class BaseModel(BaseModel):
     model_config = ConfigDict(arbitrary_types_allowed=True, extra="forbid")
+
+
+_deferred_lock = threading.RLock()
+
+
+class DeferredModel(BaseModel):
+    """
+    BaseModel whose fields can be filled in on first access.
+
+    defer(field, factory) leaves the field unset; the first time it is read,
+    factory() is called and its result validated into the field exactly as
+    if it had been passed to __init__. The value is then kept. Serializing
+    the model fills in every deferred field first.
+
+    A deferred field is taken out of the instance __dict__, so reading it
+    falls through to __getattr__; reads of loaded fields are plain
+    attribute lookups and cost nothing extra.
+    """
+
+    _deferred: Dict[str, Callable[[], Any]] = PrivateAttr(default_factory=dict)
+
+    def __getattr__(self, name: str) -> Any:
+        if name in type(self).model_fields:
+            self._load(name)
+            try:
+                return self.__dict__[name]
+            except KeyError:
+                pass
+        return super().__getattr__(name)
+
+    def _load(self, field: str) -> None:
+        with _deferred_lock:
+            factory = self._deferred.get(field)
+            if factory is None:
+                # another thread got here first
+                return
+            self.__pydantic_validator__.validate_assignment(self, field, factory())
+            # only drop it once the value is in place, so concurrent readers
+            # wait on the lock instead of seeing the unset field
+            del self._deferred[field]
+
+    def defer(self, field: str, factory: Callable[[], Any]) -> None:
+        """Fill in field with factory() when it is first read"""
+        if field not in type(self).model_fields:
+            raise AttributeError(f"{type(self).__name__} has no field {field}")
+        with _deferred_lock:
+            self._deferred[field] = factory
+            self.__dict__.pop(field, None)
+
+    def is_loaded(self, field: str) -> bool:
+        """False while field is still waiting for its first access"""
+        return field not in self._deferred
+
+    def load_all(self) -> "DeferredModel":
+        """Fill in every deferred field now"""
+        for field in list(self._deferred):
+            self._load(field)
+        return self
+
+    @model_serializer(mode="wrap")
+    def _serialize_loaded(self, handler):
+        self.load_all()
+        return handler(self)
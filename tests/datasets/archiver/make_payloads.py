@@ -0,0 +1,193 @@
+"""
+Write matching getData.raw and getData.json payloads for the archiver tests
+and benchmarks. The raw files follow the appliance's PB format: chunks
+separated by an empty line, each a PayloadInfo header followed by one escaped
+protobuf sample per line.
+
+Most payloads come from the small encoder below. waveform_short and
+waveform_short_unpacked are encoded by protoc from epics_event.proto
+instead, so the decoder is also checked against a real protobuf
+implementation, including repeated fields that are not packed.
+"""
+
+import calendar
+import json
+import struct
+import subprocess
+
+import numpy as np
+
+SCALAR_SHORT = 1
+SCALAR_ENUM = 3
+SCALAR_STRING = 0
+SCALAR_DOUBLE = 6
+WAVEFORM_DOUBLE = 13
+
+
+def varint(n):
+    out = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def zigzag(n):
+    return (n << 1) ^ (n >> 63)
+
+
+def field(number, wire_type, payload):
+    key = varint((number << 3) | wire_type)
+    if wire_type == 2:
+        return key + varint(len(payload)) + payload
+    return key + payload
+
+
+def escape(line):
+    return (
+        line.replace(b"\x1b", b"\x1b\x01")
+        .replace(b"\n", b"\x1b\x02")
+        .replace(b"\r", b"\x1b\x03")
+    )
+
+
+def encode_val(payload_type, val):
+    if payload_type == SCALAR_DOUBLE:
+        return field(3, 1, struct.pack("<d", val))
+    if payload_type in (SCALAR_SHORT, SCALAR_ENUM):
+        return field(3, 0, varint(zigzag(val)))
+    if payload_type == SCALAR_STRING:
+        return field(3, 2, val.encode())
+    if payload_type == WAVEFORM_DOUBLE:
+        return field(3, 2, struct.pack(f"<{len(val)}d", *val))
+    raise NotImplementedError(payload_type)
+
+
+def encode(pv, payload_type, samples, headers=None):
+    """samples: dicts with secs, nanos, val, severity, status (epoch secs)"""
+    chunks = []
+    for year in sorted({time_year(s["secs"]) for s in samples}):
+        year_start = calendar.timegm((year, 1, 1, 0, 0, 0))
+        header = field(1, 0, varint(payload_type))
+        header += field(2, 2, pv.encode())
+        header += field(3, 0, varint(year))
+        for name, value in (headers or {}).items():
+            header += field(15, 2, field(1, 2, name.encode()) + field(2, 2, value))
+        lines = [escape(header)]
+        for sample in samples:
+            if time_year(sample["secs"]) != year:
+                continue
+            line = field(1, 0, varint(sample["secs"] - year_start))
+            line += field(2, 0, varint(sample["nanos"]))
+            line += encode_val(payload_type, sample["val"])
+            if sample["severity"]:
+                line += field(4, 0, varint(sample["severity"]))
+            if sample["status"]:
+                line += field(5, 0, varint(sample["status"]))
+            lines.append(escape(line))
+        chunks.append(b"\n".join(lines) + b"\n")
+    return b"\n".join(chunks)
+
+
+def protoc_encode(message, text):
+    """Encode a text-format EPICS.<message> with protoc"""
+    return subprocess.run(
+        ["protoc", f"--encode=EPICS.{message}", "epics_event.proto"],
+        input=text.encode(),
+        capture_output=True,
+        check=True,
+    ).stdout
+
+
+def encode_with_protoc(pv, payload_type, message, samples):
+    """Like encode, for samples within one year"""
+    year = time_year(samples[0]["secs"])
+    year_start = calendar.timegm((year, 1, 1, 0, 0, 0))
+    header = f'type: {payload_type} pvname: "{pv}" year: {year}'
+    lines = [escape(protoc_encode("PayloadInfo", header))]
+    for sample in samples:
+        text = f"secondsintoyear: {sample['secs'] - year_start} "
+        text += f"nano: {sample['nanos']} "
+        text += " ".join(f"val: {v}" for v in sample["val"])
+        if sample["severity"]:
+            text += f" severity: {sample['severity']} status: {sample['status']}"
+        lines.append(escape(protoc_encode(message, text)))
+    return b"\n".join(lines) + b"\n"
+
+
+def time_year(secs):
+    return int(np.datetime64(secs, "s").astype("datetime64[Y]").astype(int)) + 1970
+
+
+def make_samples(rng, n, start_secs, make_val):
+    secs = start_secs + np.cumsum(rng.integers(1, 5, size=n))
+    samples = []
+    for i, s in enumerate(secs.tolist()):
+        invalid = rng.random() < 0.05
+        samples.append(
+            {
+                "secs": s,
+                "nanos": int(rng.integers(0, 1_000_000_000)),
+                "val": make_val(i),
+                "severity": 3 if invalid else 0,
+                "status": 14 if invalid else 0,
+            }
+        )
+    return samples
+
+
+def write(name, pv, payload_type, samples, headers, raw=None):
+    with open(f"{name}.raw", "wb") as raw_file:
+        raw_file.write(raw or encode(pv, payload_type, samples, headers))
+    meta = {"name": pv}
+    meta.update({k: v.decode() for k, v in headers.items()})
+    with open(f"{name}.json", "w") as json_file:
+        json.dump([{"meta": meta, "data": samples}], json_file)
+
+
+rng = np.random.default_rng(0)
+# crosses new year so the raw payload has two chunks
+new_year = calendar.timegm((2024, 1, 1, 0, 0, 0))
+write(
+    "scalar_double",
+    "ACCL:L0B:0110:AACTMEAN",
+    SCALAR_DOUBLE,
+    make_samples(rng, 1000, new_year - 2000, lambda i: float(rng.normal(6.5, 0.01))),
+    {"EGU": b"MV", "PREC": b"3"},
+)
+write(
+    "scalar_enum",
+    "BEND:DMPH:400:CTRL",
+    SCALAR_ENUM,
+    make_samples(rng, 200, new_year, lambda i: int(rng.integers(0, 12))),
+    {},
+)
+write(
+    "scalar_string",
+    "BEND:DMPH:400:STATMSG",
+    SCALAR_STRING,
+    # includes the bytes the appliance has to escape
+    make_samples(rng, 50, new_year, lambda i: f"state\n{i}\r\x1b"),
+    {},
+)
+write(
+    "waveform_double",
+    "BLEN:LI24:886:WAVEFORM",
+    WAVEFORM_DOUBLE,
+    make_samples(rng, 50, new_year, lambda i: rng.normal(size=128).tolist()),
+    {"EGU": b"A"},
+)
+short_samples = make_samples(
+    rng, 50, new_year, lambda i: rng.integers(-500, 500, size=16).tolist()
+)
+for name, message in [
+    ("waveform_short", "VectorShort"),
+    ("waveform_short_unpacked", "VectorShortUnpacked"),
+]:
+    pv = "BPMS:LI24:801:RAW"
+    raw = encode_with_protoc(pv, "WAVEFORM_SHORT", message, short_samples)
+    write(name, pv, None, short_samples, {}, raw=raw)
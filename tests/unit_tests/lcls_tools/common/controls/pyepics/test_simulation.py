@@ -0,0 +1,100 @@
+import time
+import unittest
+
+import numpy as np
+from epics import PV
+
+from lcls_tools.common.controls.pyepics.simulation import SimulatedIOC, SimulatedPV
+from lcls_tools.common.devices import device
+from lcls_tools.common.devices.reader import create_magnet, create_screen
+from tests.unit_tests.lcls_tools.common.devices import use_temporary_cache
+
+
+class TestSimulatedIOC(unittest.TestCase):
+    def setUp(self) -> None:
+        use_temporary_cache(self)
+        self.ioc = SimulatedIOC(
+            update_rate=100,
+            waveform_shape=(64, 48),
+            magnet_time_constant=0.01,
+            seed=0,
+        )
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.ioc.stop()
+        return super().tearDown()
+
+    def test_installed_replaces_pv_factory(self):
+        with self.ioc.installed():
+            magnet = create_magnet(area="GUNB", name="SOL1B")
+            self.assertIsInstance(
+                device.LazyPV.materialize(magnet.controls_information.PVs.bact),
+                SimulatedPV,
+            )
+        self.assertIsNone(device._pv_factory)
+
+    def test_magnet_settles_on_trim(self):
+        with self.ioc.installed():
+            magnet = create_magnet(area="GUNB", name="SOL1B")
+            self.assertEqual(magnet.ctrl, "Ready")
+            magnet.bdes = 0.5
+            self.assertEqual(magnet.bact, 0.0)
+            magnet.set_bdes_with_validation(0.5, settle_timeout_in_seconds=2)
+            self.assertAlmostEqual(magnet.bact, 0.5, places=2)
+            self.assertEqual(magnet.ctrl, "Ready")
+
+    def test_concurrent_set_bdes(self):
+        with self.ioc.installed():
+            magnets = create_magnet(area="GUNB")
+            report = magnets.set_bdes(
+                {"SOL1B": 0.1, "SOL2B": 0.2}, concurrent=True, b_tolerance=0.001
+            )
+        self.assertTrue(all(result.settled for result in report.values()))
+
+    def test_screen_images_are_gaussian_and_update(self):
+        with self.ioc.installed():
+            screen = next(iter(create_screen(area="DIAG0").screens.values()))
+            image = screen.image
+            self.assertEqual(image.shape, (64, 48))
+            self.assertEqual(image.dtype, np.uint16)
+            peak = np.unravel_index(np.argmax(image), image.shape)
+            self.assertLess(abs(peak[0] - 32), 5)
+            self.assertLess(abs(peak[1] - 24), 5)
+            self.assertEqual(
+                screen.controls_information.PVs.orient_x.get(as_string=True),
+                "Positive",
+            )
+            first = screen.image_timestamp
+            time.sleep(0.05)
+            screen.image
+            self.assertGreater(screen.image_timestamp, first)
+
+    def test_monitors_run_callbacks(self):
+        pv = self.ioc.pv("SIM:Image:ArrayData")
+        self.assertIsInstance(pv, PV)
+        frames = []
+        pv.add_callback(lambda value, **kwargs: frames.append(value))
+        time.sleep(0.1)
+        self.ioc.stop()
+        self.assertGreater(len(frames), 2)
+        self.assertEqual(frames[0].shape, (64 * 48,))
+
+    def test_failure_injection(self):
+        pv = self.ioc.pv("SIM:VALUE")
+        self.assertTrue(pv.put(3.0))
+        self.assertEqual(pv.get(), 3.0)
+        self.ioc.disconnect("SIM:VALUE")
+        self.assertFalse(pv.wait_for_connection(timeout=0))
+        self.assertIsNone(pv.get())
+        self.ioc.reconnect("SIM:VALUE")
+        self.ioc.failure_rate = 1.0
+        self.assertIsNone(pv.get())
+        self.assertIsNone(pv.put(4.0))
+
+    def test_latency(self):
+        self.ioc.latency = 0.02
+        pv = self.ioc.pv("SIM:VALUE")
+        start = time.perf_counter()
+        pv.get()
+        self.assertGreaterEqual(time.perf_counter() - start, 0.02)
@@ -0,0 +1,205 @@
+import unittest
+from unittest.mock import ANY, MagicMock, call, patch
+
+from lcls_tools.common.controls.pyepics.utils import (
+    EPICS_PV,
+    MonitorCacheMixin,
+    PVGroup,
+)
+
+
+class FakePV:
+    """Just enough of epics.PV for MonitorCacheMixin"""
+
+    def __init__(self, pvname, auto_monitor=None):
+        self.pvname = pvname
+        self.auto_monitor = auto_monitor
+        self.connected = True
+        self.callbacks = {}
+        self.reads = []
+
+    def add_callback(self, callback, index=None, with_ctrlvars=True, **kwargs):
+        index = 1 + max(self.callbacks, default=0)
+        self.callbacks[index] = (callback, kwargs)
+        return index
+
+    def remove_callback(self, index):
+        self.callbacks.pop(index)
+
+    def get(self, count, as_string, as_numpy, timeout, with_ctrlvars, use_monitor):
+        self.reads.append(use_monitor)
+        return 1.0
+
+
+class CachedFakePV(MonitorCacheMixin, FakePV):
+    pass
+
+
+@patch.object(EPICS_PV, "get", return_value=2.0)
+class TestMonitorCache(unittest.TestCase):
+    def test_reads_pass_through_without_max_age(self, mock_get):
+        pv = CachedFakePV("TEST:PV")
+        self.assertEqual(pv.get(), 1.0)
+        self.assertEqual(pv.get(), 1.0)
+        self.assertEqual(pv.reads, [True, True])
+        self.assertEqual(pv.callbacks, {})
+        self.assertEqual(pv.cache_stats(), {"hits": 0, "misses": 0})
+
+    def test_fresh_monitor_value_is_served(self, mock_get):
+        pv = CachedFakePV("TEST:PV", max_age=10)
+        self.assertTrue(pv.auto_monitor)
+        # nothing has arrived yet, so the first read goes to the network
+        self.assertEqual(pv.get(), 1.0)
+        self.assertEqual(pv.reads, [False])
+        self.assertEqual(pv.get(), 2.0)
+        self.assertEqual(pv.reads, [False])
+        self.assertEqual(pv.cache_stats(), {"hits": 1, "misses": 1})
+
+    @patch("lcls_tools.common.controls.pyepics.utils.monotonic")
+    def test_stale_value_is_read_again(self, mock_monotonic, mock_get):
+        mock_monotonic.return_value = 100.0
+        pv = CachedFakePV("TEST:PV", max_age=0.5)
+        callback, _ = pv.callbacks[1]
+        callback(pvname="TEST:PV", value=2.0)
+        self.assertEqual(pv.get(), 2.0)
+        mock_monotonic.return_value = 101.0
+        self.assertEqual(pv.get(), 1.0)
+        self.assertEqual(pv.get(max_age=5), 2.0)
+        self.assertEqual(pv.cache_stats(), {"hits": 2, "misses": 1})
+
+    def test_disconnected_pv_is_read_again(self, mock_get):
+        pv = CachedFakePV("TEST:PV", max_age=10)
+        pv.get()
+        pv.connected = False
+        pv.get()
+        self.assertEqual(pv.cache_stats(), {"hits": 0, "misses": 2})
+
+    def test_turning_cache_off_removes_callback(self, mock_get):
+        pv = CachedFakePV("TEST:PV", max_age=10)
+        self.assertEqual(len(pv.callbacks), 1)
+        pv.max_age = None
+        self.assertEqual(pv.callbacks, {})
+        pv.get()
+        self.assertEqual(pv.reads, [True])
+
+
+def make_group_pv(pvname, connected=True, completes=True):
+    def put(value, use_complete=False, callback=None):
+        if callback is not None and completes:
+            callback(pvname=pvname, data=None)
+        return 1
+
+    return MagicMock(
+        pvname=pvname,
+        chid=pvname,
+        wait_for_connection=MagicMock(return_value=connected),
+        is_cache_fresh=MagicMock(return_value=False),
+        put=MagicMock(side_effect=put),
+    )
+
+
+@patch("lcls_tools.common.controls.pyepics.utils.sleep")
+@patch("lcls_tools.common.controls.pyepics.utils.ca")
+@patch("lcls_tools.common.controls.pyepics.utils.get_pv")
+class TestPVGroup(unittest.TestCase):
+    def setUp(self) -> None:
+        self.pvs = {name: make_group_pv(name) for name in ["A", "B", "C"]}
+        return super().setUp()
+
+    def test_get_requests_all_before_waiting(self, mock_get_pv, mock_ca, mock_sleep):
+        mock_get_pv.side_effect = lambda name, connect: self.pvs[name]
+        mock_ca.get_complete.side_effect = lambda chid, **kwargs: chid.lower()
+        group = PVGroup(["A", "B", "C"])
+        self.assertEqual(group.get(), {"A": "a", "B": "b", "C": "c"})
+        self.assertEqual([name for name, *_ in mock_ca.method_calls[:3]], ["get"] * 3)
+        mock_ca.get.assert_has_calls([call("A", count=None, wait=False)])
+        mock_sleep.assert_not_called()
+        # the PVs are kept for the next read
+        group.get()
+        self.assertEqual(mock_get_pv.call_count, 3)
+
+    def test_get_retries_failed_pvs_with_backoff(
+        self, mock_get_pv, mock_ca, mock_sleep
+    ):
+        mock_get_pv.side_effect = lambda name, connect: self.pvs[name]
+        results = {"A": [1.0], "B": [None, None, 2.0], "C": [None, None, None]}
+        mock_ca.get_complete.side_effect = lambda chid, **kwargs: results[chid].pop(0)
+        values = PVGroup(["A", "B", "C"], retries=2, backoff=0.1).get()
+        self.assertEqual(values, {"A": 1.0, "B": 2.0, "C": None})
+        mock_sleep.assert_has_calls([call(0.1), call(0.2)])
+        requested = [args[0] for args, _ in mock_ca.get.call_args_list]
+        self.assertEqual(requested, ["A", "B", "C", "B", "C", "B", "C"])
+
+    def test_put_reports_each_pv(self, mock_get_pv, mock_ca, mock_sleep):
+        self.pvs["C"] = make_group_pv("C", connected=False)
+        mock_get_pv.side_effect = lambda name, connect: self.pvs[name]
+        group = PVGroup(["A", "B", "C"], retries=1)
+        status = group.put([1.0, 2.0, 3.0])
+        self.assertEqual(status, {"A": 1, "B": 1, "C": -1})
+        self.pvs["A"].put.assert_called_once_with(1.0, use_complete=True, callback=ANY)
+        self.pvs["C"].put.assert_not_called()
+        self.assertEqual(self.pvs["C"].wait_for_connection.call_count, 2)
+
+    def test_put_waits_for_completion_callbacks(self, mock_get_pv, mock_ca, mock_sleep):
+        self.pvs["B"] = make_group_pv("B", completes=False)
+        mock_get_pv.side_effect = lambda name, connect: self.pvs[name]
+        group = PVGroup(["A", "B"], timeout=0.05, retries=2)
+        self.assertEqual(group.put([1.0, 2.0]), {"A": 1, "B": 0})
+        # B was sent, so it is not sent again
+        self.pvs["B"].put.assert_called_once()
+        mock_sleep.assert_not_called()
+
+    def test_put_without_callback_uses_put_status(
+        self, mock_get_pv, mock_ca, mock_sleep
+    ):
+        class CaputPV:
+            """Puts with caput unless told otherwise, like utils.PV"""
+
+            def __init__(self, pvname):
+                self.pvname = pvname
+                self.values = []
+
+            def wait_for_connection(self, timeout=None):
+                return True
+
+            def put(self, value, use_complete=False, callback=None, use_caput=True):
+                self.values.append(value)
+                return 1
+
+        pv = CaputPV("A")
+        group = PVGroup([pv], timeout=0.05)
+        self.assertEqual(group.put([1.0]), {"A": 1})
+        self.assertEqual(pv.values, [1.0])
+        mock_sleep.assert_not_called()
+
+    def test_failures_are_logged(self, mock_get_pv, mock_ca, mock_sleep):
+        self.pvs["C"] = make_group_pv("C", connected=False)
+        mock_get_pv.side_effect = lambda name, connect: self.pvs[name]
+        with self.assertLogs(
+            "lcls_tools.common.controls.pyepics.utils", level="WARNING"
+        ) as logs:
+            PVGroup(["A", "C"], retries=1).put([1.0, 3.0])
+        self.assertIn("giving up: C", logs.output[0])
+
+    def test_uses_given_pvs_and_factory(self, mock_get_pv, mock_ca, mock_sleep):
+        cached = make_group_pv("A")
+        cached.is_cache_fresh.return_value = True
+        cached.get.return_value = 5.0
+        simulated = make_group_pv("B")
+        simulated.chid = None
+        simulated.get.return_value = 6.0
+        factory = MagicMock(side_effect=lambda name: self.pvs[name])
+        mock_ca.get_complete.side_effect = lambda chid, **kwargs: chid.lower()
+        group = PVGroup([cached, simulated, "C"], pv_factory=factory)
+        self.assertEqual(group.pvnames, ["A", "B", "C"])
+        self.assertEqual(group.get(), {"A": 5.0, "B": 6.0, "C": "c"})
+        factory.assert_called_once_with("C")
+        mock_get_pv.assert_not_called()
+        mock_ca.get.assert_called_once_with("C", count=None, wait=False)
+
+    def test_put_checks_values(self, mock_get_pv, mock_ca, mock_sleep):
+        group = PVGroup(["A", "B"])
+        with self.assertRaises(ValueError):
+            group.put([1.0])
+        with self.assertRaises(ValueError):
+            group.put({"D": 1.0})
@@ -1,7 +1,11 @@
 import unittest
 import unittest.mock as mock
 from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
 
+import json
+
+import numpy as np
 import requests
 from typing import DefaultDict
 from collections import defaultdict
@@ -10,9 +14,18 @@ from lcls_tools.common.data.archiver import (
     ArchiveDataHandler,
     ArchiverValue,
     ArchiverError,
+    ArchiverTimeoutError,
+    ColumnarArchiveDataHandler,
+    _decode_raw_response,
+    _parse_raw_range,
+    _shard_pv_list,
+    align_handlers,
+    get_aligned_values_over_time_range,
     get_data_at_time,
     get_data_with_time_interval,
     get_values_over_time_range,
+    iter_values_over_time_range,
+    plan_operator,
 )
 
 AACT_META = {"DBRType": "DBR_SCALAR_DOUBLE"}
@@ -924,5 +937,676 @@ class TestArchiver(unittest.TestCase):
             self.skipTest("archiver unreachable")
 
 
+class TestColumnarArchiveDataHandler(unittest.TestCase):
+    def setUp(self) -> None:
+        self.pv_lst = ["ACCL:L0B:0110:DFBEST", "ACCL:L0B:0110:AACTMEAN"]
+        self.records = [
+            {"secs": 1712008579, "val": 0.384, "nanos": 339654425},
+            {"secs": 1712008580, "val": -0.136, "nanos": 335625034},
+            {
+                "secs": 1712008581,
+                "val": -1.504,
+                "nanos": 340185632,
+                "severity": 3,
+                "status": 14,
+            },
+        ]
+        for record in self.records:
+            record.setdefault("severity", 0)
+            record.setdefault("status", 0)
+        self.range_json = json.dumps(
+            [
+                {"meta": {"name": pv, "PREC": "3"}, "data": self.records}
+                for pv in self.pv_lst
+            ]
+        )
+        return super().setUp()
+
+    def test_from_records_columns(self):
+        handler = ColumnarArchiveDataHandler.from_records(self.records)
+        self.assertEqual(len(handler), 3)
+        self.assertEqual(handler.secs.dtype, np.int64)
+        np.testing.assert_array_equal(handler.val, [0.384, -0.136, -1.504])
+        np.testing.assert_array_equal(handler.valid_mask, [True, True, False])
+        self.assertEqual(
+            handler.datetimes[0],
+            np.datetime64(1712008579339654425, "ns"),
+        )
+
+    def test_compatibility_view(self):
+        handler = ColumnarArchiveDataHandler.from_records(self.records)
+        legacy = ArchiveDataHandler(
+            value_list=[ArchiverValue(**record) for record in self.records]
+        )
+        self.assertEqual(handler, legacy)
+        self.assertEqual(list(handler), legacy.value_list)
+        self.assertEqual(handler.timestamps, legacy.timestamps)
+        self.assertEqual(handler.values, legacy.values)
+        self.assertEqual(handler.validities, legacy.validities)
+
+    def test_waveform_and_ragged_values(self):
+        waveforms = [dict(r, val=[1.0, 2.0, 3.0]) for r in self.records]
+        handler = ColumnarArchiveDataHandler.from_records(waveforms)
+        self.assertEqual(handler.val.shape, (3, 3))
+        self.assertEqual(handler.value_list[0].val, [1.0, 2.0, 3.0])
+
+        ragged = [dict(r, val=[1.0] * (i + 1)) for i, r in enumerate(self.records)]
+        handler = ColumnarArchiveDataHandler.from_records(ragged)
+        self.assertEqual(handler.val.dtype, object)
+        self.assertEqual(handler.values[2], [1.0, 1.0, 1.0])
+
+    def test_mixed_values_keep_their_types(self):
+        mixed = [dict(r, val=v) for r, v in zip(self.records, [1.5, "Disabled", 2])]
+        handler = ColumnarArchiveDataHandler.from_records(mixed)
+        self.assertEqual(handler.val.dtype, object)
+        self.assertEqual(handler.values, [1.5, "Disabled", 2])
+
+    def test_missing_severity_is_invalid(self):
+        records = [dict(r) for r in self.records]
+        del records[0]["severity"]
+        handler = ColumnarArchiveDataHandler.from_records(records)
+        np.testing.assert_array_equal(handler.valid_mask, [False, True, False])
+        self.assertIsNone(handler.value_list[0].severity)
+        self.assertEqual(handler.validities, [v.is_valid for v in handler])
+
+    def test_columns_without_values(self):
+        handler = ColumnarArchiveDataHandler(secs=[1, 2])
+        self.assertTrue(np.isnan(handler.val).all())
+
+    def test_value_list_changes_reach_the_columns(self):
+        handler = ColumnarArchiveDataHandler.from_records(
+            self.records, meta={"name": "ROOM:BSY0:1:OUTSIDETEMP"}
+        )
+        first = handler.value_list[0]
+        appended = ArchiverValue(
+            secs=int(handler.secs[-1]) + 1, val=7.0, nanos=0, severity=0, status=0
+        )
+        handler.value_list.append(appended)
+        self.assertEqual(len(handler), 4)
+        self.assertEqual(handler.values[-1], 7.0)
+        self.assertEqual(list(handler)[-1], appended)
+        handler.value_list = [first]
+        self.assertEqual(len(handler), 1)
+        self.assertEqual(handler.secs.tolist(), [first.secs])
+        self.assertEqual(handler.meta, {"name": "ROOM:BSY0:1:OUTSIDETEMP"})
+        # columns set directly show up in value_list again
+        handler.val = np.array([9.0])
+        self.assertEqual(handler.value_list[0].val, 9.0)
+
+    @mock.patch("lcls_tools.common.data.archiver._get_session")
+    def test_get_values_over_time_range_columnar(
+        self, mocked_get_session: mock.MagicMock
+    ):
+        mock_session = mock.MagicMock()
+        mock_session.get.return_value = TestArchiver.MockResponse(self.range_json)
+        mocked_get_session.return_value = mock_session
+        end = datetime(2024, 4, 1, 14, 56, 30)
+
+        result = get_values_over_time_range(
+            self.pv_lst + ["MISSING:PV"], end - timedelta(seconds=10), end
+        )
+
+        for pv in self.pv_lst:
+            self.assertIsInstance(result[pv], ColumnarArchiveDataHandler)
+            self.assertEqual(result[pv].meta["PREC"], "3")
+            self.assertEqual(result[pv].values, [0.384, -0.136, -1.504])
+        self.assertEqual(len(result["MISSING:PV"]), 0)
+
+
+class TestChunkedTimeRange(unittest.TestCase):
+    def setUp(self) -> None:
+        self.pv_lst = ["ACCL:L0B:0110:DFBEST", "ACCL:L0B:0110:AACTMEAN"]
+        self.start = datetime(2024, 4, 1, 14, 0, 0)
+        self.end = self.start + timedelta(hours=1)
+        start_secs = int(
+            self.start.replace(tzinfo=ZoneInfo("America/Los_Angeles")).timestamp()
+        )
+        # one sample every 7 seconds, so window edges never line up with samples
+        self.records = [
+            {
+                "secs": start_secs + 7 * i,
+                "nanos": 0,
+                "val": float(i),
+                "severity": 0,
+                "status": 0,
+            }
+            for i in range(-1, 515)
+        ]
+        self.session = mock.MagicMock()
+        self.session.get.side_effect = self._archiver_get
+        return super().setUp()
+
+    def _archiver_get(self, url, timeout, params):
+        """
+        Imitate the appliance: return every sample in [from, to] plus the last
+        sample before 'from'.
+        """
+        t0 = datetime.fromisoformat(params["from"]).timestamp()
+        t1 = datetime.fromisoformat(params["to"]).timestamp()
+        before = [r for r in self.records if r["secs"] < t0][-1:]
+        inside = [r for r in self.records if t0 <= r["secs"] <= t1]
+        return TestArchiver.MockResponse(
+            json.dumps(
+                [{"meta": {"name": pv}, "data": before + inside} for pv in params["pv"]]
+            )
+        )
+
+    @mock.patch("lcls_tools.common.data.archiver._get_session")
+    def test_chunked_matches_single_request(self, mocked_get_session):
+        mocked_get_session.return_value = self.session
+        single = get_values_over_time_range(self.pv_lst, self.start, self.end)
+        progress = mock.MagicMock()
+
+        chunked = get_values_over_time_range(
+            self.pv_lst,
+            self.start,
+            self.end,
+            chunk_size=timedelta(minutes=7),
+            progress_callback=progress,
+        )
+
+        for pv in self.pv_lst:
+            self.assertEqual(chunked[pv], single[pv])
+            self.assertTrue(np.all(np.diff(chunked[pv].epoch_ns) > 0))
+        # 60 minutes in 7 minute windows
+        self.assertEqual(self.session.get.call_count, 1 + 9)
+        self.assertEqual(progress.call_count, 9)
+        # every PV once per window
+        progress.assert_called_with(18, 18)
+
+    @mock.patch("lcls_tools.common.data.archiver._get_session")
+    def test_failed_window_leaves_a_gap(self, mocked_get_session):
+        mocked_get_session.return_value = self.session
+        failing_start = self.start + timedelta(minutes=15)
+
+        def archiver_get(url, timeout, params):
+            if params["from"].startswith(failing_start.isoformat()):
+                raise requests.exceptions.Timeout()
+            return self._archiver_get(url, timeout, params)
+
+        self.session.get.side_effect = archiver_get
+        with self.assertLogs("lcls_tools.common.data.archiver", "WARNING"):
+            result = get_values_over_time_range(
+                self.pv_lst, self.start, self.end, chunk_size=timedelta(minutes=15)
+            )
+
+        self.assertEqual(sorted(result.errors), sorted(self.pv_lst))
+        gaps = np.diff(result[self.pv_lst[0]].epoch_ns) // 1_000_000_000
+        self.assertGreater(gaps.max(), 15 * 60)
+        self.assertEqual(self.session.get.call_count, 4)
+
+    @mock.patch("lcls_tools.common.data.archiver._get_session")
+    def test_every_window_failing_raises(self, mocked_get_session):
+        mocked_get_session.return_value = self.session
+        self.session.get.side_effect = requests.exceptions.Timeout()
+        with self.assertRaises(ArchiverTimeoutError):
+            get_values_over_time_range(
+                self.pv_lst, self.start, self.end, chunk_size=timedelta(minutes=15)
+            )
+
+    @mock.patch("lcls_tools.common.data.archiver._get_session")
+    def test_every_window_failing_raises_with_duplicate_pvs(self, mocked_get_session):
+        mocked_get_session.return_value = self.session
+        self.session.get.side_effect = requests.exceptions.Timeout()
+        with self.assertRaises(ArchiverTimeoutError):
+            get_values_over_time_range(
+                self.pv_lst + self.pv_lst[:1],
+                self.start,
+                self.end,
+                chunk_size=timedelta(minutes=15),
+            )
+
+    @mock.patch("lcls_tools.common.data.archiver._get_session")
+    def test_iter_values_over_time_range_in_order(self, mocked_get_session):
+        mocked_get_session.return_value = self.session
+
+        windows = list(
+            iter_values_over_time_range(
+                self.pv_lst, self.start, self.end, timedelta(minutes=15)
+            )
+        )
+
+        self.assertEqual(
+            [w[0] for w in windows],
+            [self.start + timedelta(minutes=15 * i) for i in range(4)],
+        )
+        self.assertEqual(windows[-1][1], self.end)
+        for window_start, _, batch in windows:
+            self.assertEqual(set(batch), set(self.pv_lst))
+
+    def _archiver_at_time(self, pv_list, time_requested, timeout=None):
+        """Imitate getDataAtTime: the last sample at or before the time"""
+        t = time_requested.replace(tzinfo=ZoneInfo("America/Los_Angeles"))
+        before = [r for r in self.records if r["secs"] <= t.timestamp()]
+        if not before:
+            return {}
+        return {pv: ArchiverValue(**before[-1]) for pv in pv_list}
+
+    @mock.patch("lcls_tools.common.data.archiver.get_data_at_time")
+    @mock.patch("lcls_tools.common.data.archiver._get_session")
+    def test_resample_matches_get_data_at_time(
+        self, mocked_get_session, mocked_get_data_at_time
+    ):
+        mocked_get_session.return_value = self.session
+        mocked_get_data_at_time.side_effect = self._archiver_at_time
+        time_delta = timedelta(seconds=30)
+
+        legacy = get_data_with_time_interval(
+            self.pv_lst, self.start, self.end, time_delta
+        )
+        resampled = get_values_over_time_range(
+            self.pv_lst, self.start, self.end, time_delta, resample=True
+        )
+
+        self.assertEqual(mocked_get_data_at_time.call_count, 120)
+        self.assertEqual(self.session.get.call_count, 1)
+        for pv in self.pv_lst:
+            self.assertEqual(len(resampled[pv]), 120)
+            self.assertEqual(resampled[pv].values, legacy[pv].values)
+            self.assertEqual(resampled[pv], legacy[pv])
+
+    @mock.patch("lcls_tools.common.data.archiver._get_session")
+    def test_resample_needs_time_delta(self, mocked_get_session):
+        mocked_get_session.return_value = self.session
+        with self.assertRaises(ValueError):
+            get_values_over_time_range(self.pv_lst, self.start, self.end, resample=True)
+        self.session.get.assert_not_called()
+
+    def test_chunk_size_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            list(
+                iter_values_over_time_range(
+                    self.pv_lst, self.start, self.end, timedelta(0)
+                )
+            )
+
+
+class TestShardedRange(unittest.TestCase):
+    def setUp(self) -> None:
+        self.pv_lst = [f"BPMS:LI{i // 10:02d}:{i:03d}:TMIT" for i in range(25)]
+        self.start = datetime(2024, 4, 1, 14, 0, 0)
+        self.end = self.start + timedelta(minutes=5)
+        self.failing_pv = None
+        self.session = mock.MagicMock()
+        self.session.get.side_effect = self._archiver_get
+        return super().setUp()
+
+    def _archiver_get(self, url, timeout, params):
+        if self.failing_pv in params["pv"]:
+            raise requests.exceptions.Timeout()
+        return TestArchiver.MockResponse(
+            json.dumps(
+                [
+                    {
+                        "meta": {"name": pv},
+                        "data": [{"secs": 1711990800, "nanos": 0, "val": 1.0}],
+                    }
+                    for pv in params["pv"]
+                ]
+            )
+        )
+
+    def test_shard_by_pv_count(self):
+        with mock.patch("lcls_tools.common.data.archiver.MAX_PVS_PER_REQUEST", 10):
+            shards = _shard_pv_list(self.pv_lst)
+        self.assertEqual([len(shard) for shard in shards], [10, 10, 5])
+        self.assertEqual(sum(shards, []), self.pv_lst)
+
+    def test_shard_by_url_length(self):
+        shards = _shard_pv_list(self.pv_lst, operator="mean_60", max_url_length=400)
+        self.assertGreater(len(shards), 1)
+        self.assertEqual(sum(shards, []), self.pv_lst)
+        for shard in shards:
+            query = "".join(f"&pv=mean_60%28{pv}%29" for pv in shard)
+            self.assertLess(len(query), 400)
+
+    @mock.patch("lcls_tools.common.data.archiver.MAX_PVS_PER_REQUEST", 10)
+    @mock.patch("lcls_tools.common.data.archiver._get_session")
+    def test_failed_shard_returns_partial_result(self, mocked_get_session):
+        mocked_get_session.return_value = self.session
+        self.failing_pv = self.pv_lst[12]
+        progress = []
+
+        result = get_values_over_time_range(
+            self.pv_lst,
+            self.start,
+            self.end,
+            progress_callback=lambda done, total: progress.append((done, total)),
+        )
+
+        self.assertEqual(self.session.get.call_count, 3)
+        self.assertEqual(sorted(result.errors), self.pv_lst[10:20])
+        self.assertIsInstance(result.errors[self.failing_pv], ArchiverTimeoutError)
+        for pv in self.pv_lst[:10] + self.pv_lst[20:]:
+            self.assertEqual(len(result[pv]), 1)
+        for pv in self.pv_lst[10:20]:
+            self.assertEqual(len(result[pv]), 0)
+        # one progress call per shard, ending at the full PV count
+        self.assertEqual(len(progress), 3)
+        self.assertEqual(progress[-1], (25, 25))
+
+    @mock.patch("lcls_tools.common.data.archiver.MAX_PVS_PER_REQUEST", 10)
+    @mock.patch("lcls_tools.common.data.archiver._get_session")
+    def test_resample_reports_failed_shard(self, mocked_get_session):
+        mocked_get_session.return_value = self.session
+        self.failing_pv = self.pv_lst[12]
+
+        with self.assertLogs("lcls_tools.common.data.archiver", "WARNING"):
+            result = get_values_over_time_range(
+                self.pv_lst,
+                self.start,
+                self.end,
+                timedelta(minutes=1),
+                resample=True,
+            )
+
+        self.assertEqual(sorted(result.errors), self.pv_lst[10:20])
+        self.assertEqual(len(result[self.pv_lst[0]]), 5)
+        self.assertNotIn(self.failing_pv, result)
+
+    @mock.patch("lcls_tools.common.data.archiver._get_session")
+    def test_all_shards_failing_raises(self, mocked_get_session):
+        mocked_get_session.return_value = self.session
+        self.session.get.side_effect = requests.exceptions.Timeout()
+        with self.assertRaises(ArchiverTimeoutError):
+            get_values_over_time_range(self.pv_lst, self.start, self.end)
+
+    @mock.patch("lcls_tools.common.data.archiver._get_session")
+    def test_all_shards_failing_raises_with_duplicate_pvs(self, mocked_get_session):
+        mocked_get_session.return_value = self.session
+        self.session.get.side_effect = requests.exceptions.Timeout()
+        with self.assertRaises(ArchiverTimeoutError):
+            get_values_over_time_range(self.pv_lst + self.pv_lst, self.start, self.end)
+
+
+class TestAlignedValues(unittest.TestCase):
+    def setUp(self) -> None:
+        rng = np.random.default_rng(1)
+        self.handlers = []
+        for n in (50, 7, 120):
+            secs = np.sort(rng.choice(np.arange(1000, 2000), size=n, replace=False))
+            severity = np.where(rng.random(n) < 0.1, 3, 0)
+            self.handlers.append(
+                ColumnarArchiveDataHandler(
+                    secs=secs, val=rng.normal(size=n), severity=severity
+                )
+            )
+        self.query = np.arange(950, 2050, 3, dtype=np.int64) * 1_000_000_000
+
+    def reference(self, handler, mode):
+        """The per-PV loop align_handlers replaces"""
+        t = handler.epoch_ns
+        v = np.where(handler.valid_mask, handler.val, np.nan)
+        out = []
+        for q in self.query:
+            before = np.nonzero(t <= q)[0]
+            after = np.nonzero(t >= q)[0]
+            if mode == "previous":
+                out.append(v[before[-1]] if len(before) else np.nan)
+            elif mode == "nearest":
+                candidates = [i for i in (before[-1:], after[:1]) if len(i)]
+                nearest = min((abs(t[i[0]] - q), t[i[0]] > q, i[0]) for i in candidates)
+                out.append(v[nearest[2]])
+            elif len(before) and len(after):
+                out.append(
+                    np.interp(q, t[[before[-1], after[0]]], v[[before[-1], after[0]]])
+                )
+            else:
+                out.append(np.nan)
+        return np.array(out)
+
+    def test_modes_match_per_pv_reference(self):
+        for mode in ("previous", "nearest", "linear"):
+            with self.subTest(mode=mode):
+                aligned = align_handlers(self.handlers, self.query, mode=mode)
+                self.assertEqual(aligned.shape, (len(self.query), 3))
+                for column, handler in enumerate(self.handlers):
+                    np.testing.assert_allclose(
+                        aligned[:, column], self.reference(handler, mode)
+                    )
+
+    def test_invalid_severity_masking(self):
+        handler = ColumnarArchiveDataHandler(
+            secs=[1, 2, 3], val=np.array([1.0, 2.0, 3.0]), severity=[0, 3, 0]
+        )
+        query = np.array([1, 2, 2.5, 3]) * 1_000_000_000
+        masked = align_handlers([handler], query, mode="linear")
+        unmasked = align_handlers([handler], query, mode="linear", mask_invalid=False)
+        np.testing.assert_array_equal(masked[:, 0], [1.0, np.nan, np.nan, 3.0])
+        np.testing.assert_array_equal(unmasked[:, 0], [1.0, 2.0, 2.5, 3.0])
+
+    def test_rejects_waveforms_and_unknown_mode(self):
+        waveform = ColumnarArchiveDataHandler(secs=[1, 2], val=np.ones((2, 4)))
+        with self.assertRaises(ValueError):
+            align_handlers([waveform], self.query)
+        with self.assertRaises(ValueError):
+            align_handlers(self.handlers, self.query, mode="cubic")
+
+    @mock.patch("lcls_tools.common.data.archiver.get_values_over_time_range")
+    def test_dataframe_on_union_of_sample_times(self, mocked_range):
+        start = datetime(2024, 4, 1, 14, 0, 0)
+        start_secs = int(
+            start.replace(tzinfo=ZoneInfo("America/Los_Angeles")).timestamp()
+        )
+        mocked_range.return_value = {
+            "A": ColumnarArchiveDataHandler(
+                secs=start_secs + np.array([-5, 0, 10]), val=np.array([0.0, 1.0, 2.0])
+            ),
+            "B": ColumnarArchiveDataHandler(
+                secs=start_secs + np.array([5, 15]), val=np.array([10.0, 20.0])
+            ),
+        }
+
+        frame = get_aligned_values_over_time_range(
+            ["A", "B"], start, start + timedelta(seconds=20), as_dataframe=True
+        )
+
+        self.assertEqual(list(frame.columns), ["A", "B"])
+        self.assertEqual(len(frame), 4)
+        self.assertEqual(frame.index[0].to_pydatetime().replace(tzinfo=None), start)
+        np.testing.assert_array_equal(frame["A"].to_numpy(), [1.0, 1.0, 2.0, 2.0])
+        np.testing.assert_array_equal(frame["B"].to_numpy(), [np.nan, 10.0, 10.0, 20.0])
+
+
+class TestOperatorPlanner(unittest.TestCase):
+    def setUp(self) -> None:
+        self.start = datetime(2024, 3, 1)
+
+    def test_bin_size_from_max_points(self):
+        end = self.start + timedelta(days=30)
+        # 30 days / 1000 points = 2592 s, rounded up to the next bin size
+        self.assertEqual(
+            plan_operator(self.start, end, max_points=1000),
+            ("mean_3600", timedelta(hours=1)),
+        )
+        self.assertEqual(
+            plan_operator(self.start, end, max_points=1000, binning="max"),
+            ("max_3600", timedelta(hours=1)),
+        )
+        self.assertEqual(
+            plan_operator(
+                self.start, self.start + timedelta(days=3650), max_points=100
+            ),
+            ("mean_3196800", timedelta(days=37)),
+        )
+
+    def test_target_resolution_sets_minimum_bin(self):
+        end = self.start + timedelta(minutes=10)
+        self.assertEqual(
+            plan_operator(self.start, end, max_points=10_000),
+            (None, None),
+        )
+        self.assertEqual(
+            plan_operator(
+                self.start,
+                end,
+                max_points=10_000,
+                target_resolution=timedelta(seconds=20),
+            ),
+            ("mean_30", timedelta(seconds=30)),
+        )
+
+    def test_invalid_arguments(self):
+        end = self.start + timedelta(days=1)
+        with self.assertRaises(ValueError):
+            plan_operator(self.start, end, max_points=10, binning="mode")
+        with self.assertRaises(ValueError):
+            plan_operator(self.start, end, max_points=0)
+        with self.assertRaises(ValueError):
+            get_values_over_time_range(
+                ["PV"], self.start, end, max_points=10, use_operator="mean_60"
+            )
+
+    @mock.patch("lcls_tools.common.data.archiver._get_session")
+    def test_chosen_operator_in_result_meta(self, mocked_get_session):
+        session = mocked_get_session.return_value
+        session.get.return_value = TestArchiver.MockResponse(
+            json.dumps(
+                [
+                    {"meta": {"name": "firstSample_600(PV:A)"}, "data": []},
+                    {"meta": {"name": "firstSample_600(PV:B)"}, "data": []},
+                ]
+            )
+        )
+
+        result = get_values_over_time_range(
+            ["PV:A", "PV:B"],
+            self.start,
+            self.start + timedelta(days=7),
+            max_points=2000,
+            binning="firstSample",
+        )
+
+        params = session.get.call_args.kwargs["params"]
+        self.assertEqual(
+            params["pv"], ["firstSample_600(PV:A)", "firstSample_600(PV:B)"]
+        )
+        self.assertEqual(
+            result.meta,
+            {"operator": "firstSample_600", "bin_size": timedelta(minutes=10)},
+        )
+        self.assertEqual(set(result), {"PV:A", "PV:B"})
+
+
+class TestRawRetrieval(unittest.TestCase):
+    data_location = "tests/datasets/archiver/"
+    payloads = [
+        "scalar_double",
+        "scalar_enum",
+        "scalar_string",
+        "waveform_double",
+        "waveform_short",
+        "waveform_short_unpacked",
+    ]
+
+    def setUp(self) -> None:
+        self.raw = {}
+        self.json = {}
+        for name in self.payloads:
+            with open(self.data_location + name + ".raw", "rb") as raw_file:
+                self.raw[name] = raw_file.read()
+            with open(self.data_location + name + ".json", "r") as json_file:
+                self.json[name] = json_file.read()
+        self.start = datetime(2024, 1, 1, 0, 0, 0)
+        self.end = datetime(2024, 1, 2, 0, 0, 0)
+        return super().setUp()
+
+    def _json_handler(self, name):
+        element = json.loads(self.json[name])[0]
+        return ColumnarArchiveDataHandler.from_records(
+            element["data"], meta=element["meta"]
+        )
+
+    def test_decode_matches_json(self):
+        for name in self.payloads:
+            with self.subTest(payload=name):
+                decoded = _decode_raw_response(self.raw[name])
+                expected = self._json_handler(name)
+                self.assertEqual(decoded, expected)
+                self.assertEqual(decoded.meta, expected.meta)
+                self.assertEqual(decoded.values, expected.values)
+
+    def test_waveform_decodes_to_2d_array(self):
+        decoded = _decode_raw_response(self.raw["waveform_double"])
+        self.assertEqual(decoded.val.shape, (50, 128))
+        self.assertEqual(decoded.val.dtype, np.float64)
+
+    def test_packed_and_unpacked_waveforms_agree(self):
+        packed = _decode_raw_response(self.raw["waveform_short"])
+        unpacked = _decode_raw_response(self.raw["waveform_short_unpacked"])
+        self.assertNotEqual(
+            self.raw["waveform_short"], self.raw["waveform_short_unpacked"]
+        )
+        self.assertEqual(packed.val.shape, (50, 16))
+        np.testing.assert_array_equal(packed.val, unpacked.val)
+
+    def test_unexpected_wire_type_raises_value_error(self):
+        # a double waveform whose values arrive as varints
+        with self.assertRaises(ValueError):
+            _parse_raw_range(
+                self.raw["waveform_short_unpacked"].replace(b"\x08\x08", b"\x08\x0d", 1)
+            )
+
+    def test_truncated_payload_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            _decode_raw_response(self.raw["scalar_string"][:-7])
+
+    def _session(self, raw_by_pv):
+        def get(url, timeout, params):
+            response = TestArchiver.MockResponse()
+            if url.endswith("getData.raw"):
+                response.content = raw_by_pv[params["pv"]]
+            else:
+                response.text = json.dumps(
+                    [
+                        dict(json.loads(self.json[name])[0], meta={"name": pv})
+                        for pv, name in self.json_by_pv.items()
+                        if pv in params["pv"]
+                    ]
+                )
+            return response
+
+        session = mock.MagicMock()
+        session.get.side_effect = get
+        return session
+
+    @mock.patch("lcls_tools.common.data.archiver._get_session")
+    def test_raw_retrieval_one_request_per_pv(self, mocked_get_session):
+        pvs = {"PV:DOUBLE": "scalar_double", "PV:WF": "waveform_double"}
+        session = self._session({pv: self.raw[name] for pv, name in pvs.items()})
+        mocked_get_session.return_value = session
+
+        result = get_values_over_time_range(
+            list(pvs), self.start, self.end, retrieval_format="raw"
+        )
+
+        self.assertEqual(session.get.call_count, 2)
+        for pv, name in pvs.items():
+            self.assertEqual(result[pv], self._json_handler(name))
+
+    @mock.patch("lcls_tools.common.data.archiver._get_session")
+    def test_raw_retrieval_falls_back_to_json(self, mocked_get_session):
+        self.json_by_pv = {"PV:BROKEN": "scalar_enum"}
+        session = self._session(
+            {"PV:DOUBLE": self.raw["scalar_double"], "PV:BROKEN": b"\x08"}
+        )
+        mocked_get_session.return_value = session
+
+        result = get_values_over_time_range(
+            ["PV:DOUBLE", "PV:BROKEN"], self.start, self.end, retrieval_format="raw"
+        )
+
+        urls = [c.kwargs["url"] for c in session.get.call_args_list]
+        self.assertTrue(urls[-1].endswith("getData.json"))
+        self.assertEqual(result["PV:DOUBLE"], self._json_handler("scalar_double"))
+        self.assertEqual(result["PV:BROKEN"], self._json_handler("scalar_enum"))
+
+    def test_unknown_retrieval_format(self):
+        with self.assertRaises(ValueError):
+            get_values_over_time_range(
+                ["PV:A"], self.start, self.end, retrieval_format="csv"
+            )
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,246 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+import unittest.mock as mock
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from zoneinfo import ZoneInfo
+
+try:
+    import aiohttp  # noqa: F401
+except ImportError:
+    raise unittest.SkipTest("aiohttp is not installed, see the async extra")
+
+from lcls_tools.common.data import archiver, archiver_async
+from lcls_tools.common.data.archiver import ArchiverError, ArchiverTimeoutError
+from lcls_tools.common.data.archiver_async import AsyncArchiverClient
+
+PACIFIC = ZoneInfo("America/Los_Angeles")
+START = datetime(2024, 4, 1, 14, 0, 0)
+START_SECS = int(START.replace(tzinfo=PACIFIC).timestamp())
+RECORDS = [
+    {"secs": START_SECS + 10 * i, "nanos": 0, "val": float(i), "severity": 0}
+    for i in range(-6, 360)
+]
+SLOW_PV = "SLOW:PV"
+MISSING_PV = "MISSING:PV"
+BUSY_PV = "BUSY:PV"
+
+
+class StubArchiverHandler(BaseHTTPRequestHandler):
+    """Answers getDataAtTime and getData(ForPVs).json like the appliance does"""
+
+    protocol_version = "HTTP/1.1"
+    lock = threading.Lock()
+    in_flight = 0
+    max_in_flight = 0
+    delay = 0.0
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _track(self, pv_list, respond):
+        cls = StubArchiverHandler
+        if SLOW_PV in pv_list:
+            # outlives the client's timeout; not counted, it may outlive a test
+            time.sleep(2.0)
+            return self._reply(200, respond())
+        with cls.lock:
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        try:
+            time.sleep(cls.delay)
+            if MISSING_PV in pv_list:
+                self._reply(404, {})
+            elif BUSY_PV in pv_list:
+                self._reply(503, {})
+            else:
+                self._reply(200, respond())
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+    def do_POST(self):
+        query = parse_qs(urlparse(self.path).query)
+        at = datetime.fromisoformat(query["at"][0]).timestamp()
+        length = int(self.headers["Content-Length"])
+        pv_list = parse_qs(self.rfile.read(length).decode())["pv"][0].split(",")
+        before = [r for r in RECORDS if r["secs"] <= at][-1]
+        self._track(pv_list, lambda: {pv: before for pv in pv_list})
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        t0 = datetime.fromisoformat(query["from"][0]).timestamp()
+        t1 = datetime.fromisoformat(query["to"][0]).timestamp()
+        before = [r for r in RECORDS if r["secs"] < t0][-1:]
+        inside = [r for r in RECORDS if t0 <= r["secs"] <= t1]
+        self._track(
+            query["pv"],
+            lambda: [
+                {"meta": {"name": pv}, "data": before + inside} for pv in query["pv"]
+            ],
+        )
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestAsyncArchiverClient(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubArchiverHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        url = f"http://127.0.0.1:{cls.server.server_port}/retrieval/data/{{SUFFIX}}"
+        cls.url_patch = mock.patch.object(archiver, "ARCHIVER_URL_FORMATTER", url)
+        cls.url_patch.start()
+        return super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.url_patch.stop()
+        cls.server.shutdown()
+        cls.server.server_close()
+        return super().tearDownClass()
+
+    def setUp(self) -> None:
+        self.pv_lst = ["ACCL:L0B:0110:DFBEST", "ACCL:L0B:0110:AACTMEAN"]
+        StubArchiverHandler.max_in_flight = 0
+        StubArchiverHandler.delay = 0.0
+        return super().setUp()
+
+    async def test_many_lookups_share_the_pool(self):
+        StubArchiverHandler.delay = 0.01
+        times = [START + timedelta(seconds=5 * i) for i in range(200)]
+        async with AsyncArchiverClient(max_concurrency=8) as client:
+            results = await asyncio.gather(
+                *(client.get_data_at_time(self.pv_lst, t) for t in times)
+            )
+
+        self.assertEqual(len(results), 200)
+        self.assertEqual(results[0][self.pv_lst[0]].val, 0.0)
+        self.assertEqual(results[-1][self.pv_lst[1]].val, 99.0)
+        self.assertLessEqual(StubArchiverHandler.max_in_flight, 8)
+        self.assertGreater(StubArchiverHandler.max_in_flight, 1)
+
+    async def test_range_matches_sync_client(self):
+        end = START + timedelta(minutes=30)
+        async with AsyncArchiverClient() as client:
+            result = await client.get_values_over_time_range(self.pv_lst, START, end)
+        expected = await asyncio.to_thread(
+            archiver.get_values_over_time_range, self.pv_lst, START, end
+        )
+
+        for pv in self.pv_lst:
+            self.assertEqual(len(result[pv]), 182)
+            self.assertEqual(result[pv], expected[pv])
+
+    async def test_time_interval(self):
+        end = START + timedelta(minutes=1)
+        async with AsyncArchiverClient() as client:
+            result = await client.get_data_with_time_interval(
+                self.pv_lst, START, end, timedelta(seconds=15)
+            )
+        self.assertEqual(result[self.pv_lst[0]].values, [0.0, 1.0, 3.0, 4.0])
+
+    async def test_timeout(self):
+        async with AsyncArchiverClient(timeout=0.2) as client:
+            with self.assertRaises(ArchiverTimeoutError):
+                await client.get_data_at_time([SLOW_PV], START)
+
+    async def test_cancellation_releases_slot(self):
+        async with AsyncArchiverClient(max_concurrency=1) as client:
+            task = asyncio.create_task(client.get_data_at_time([SLOW_PV], START))
+            await asyncio.sleep(0.1)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            result = await asyncio.wait_for(
+                client.get_data_at_time(self.pv_lst, START), timeout=1.0
+            )
+        self.assertEqual(result[self.pv_lst[0]].val, 0.0)
+
+    @mock.patch.object(archiver_async, "BACKOFF_FACTOR", 0.5)
+    async def test_backoff_releases_slot(self):
+        async with AsyncArchiverClient(max_concurrency=1, retries=1) as client:
+            busy = asyncio.create_task(client.get_data_at_time([BUSY_PV], START))
+            await asyncio.sleep(0.1)
+            # served while the busy request is backing off
+            result = await asyncio.wait_for(
+                client.get_data_at_time(self.pv_lst, START), timeout=0.3
+            )
+            await busy
+        self.assertEqual(result[self.pv_lst[0]].val, 0.0)
+
+    @mock.patch.object(archiver_async, "BACKOFF_FACTOR", 0.3)
+    async def test_latency_excludes_waiting_and_backoff(self):
+        StubArchiverHandler.delay = 0.2
+        records = []
+        archiver.add_metrics_hook(records.append)
+        self.addCleanup(archiver.remove_metrics_hook, records.append)
+        async with AsyncArchiverClient(max_concurrency=1, retries=1) as client:
+            await asyncio.gather(
+                client.get_data_at_time(self.pv_lst, START),
+                client.get_data_at_time([BUSY_PV], START),
+            )
+        # each waited 0.2 s for the slot, the busy one backed off 0.3 s
+        self.assertEqual(len(records), 2)
+        for record in records:
+            self.assertLess(record.latency, 0.35)
+
+    def test_client_can_be_reused_on_another_loop(self):
+        client = AsyncArchiverClient(max_concurrency=1)
+
+        async def lookups():
+            try:
+                return await asyncio.gather(
+                    *(client.get_data_at_time(self.pv_lst, START) for _ in range(3))
+                )
+            finally:
+                await client.close()
+
+        for _ in range(2):
+            results = asyncio.run(lookups())
+            self.assertEqual(results[-1][self.pv_lst[0]].val, 0.0)
+
+    @mock.patch.object(archiver, "MAX_PVS_PER_REQUEST", 1)
+    async def test_failed_shard_returns_partial_result(self):
+        progress = []
+        async with AsyncArchiverClient(retries=0) as client:
+            result = await client.get_values_over_time_range(
+                self.pv_lst + [MISSING_PV],
+                START,
+                START + timedelta(minutes=1),
+                progress_callback=lambda done, total: progress.append(done),
+            )
+
+        self.assertEqual(list(result.errors), [MISSING_PV])
+        self.assertEqual(len(result[MISSING_PV]), 0)
+        self.assertEqual(len(result[self.pv_lst[0]]), 8)
+        self.assertEqual(sorted(progress), [1, 2, 3])
+
+    async def test_resample_needs_time_delta(self):
+        async with AsyncArchiverClient() as client:
+            with self.assertRaises(ValueError):
+                await client.get_values_over_time_range(
+                    self.pv_lst, START, START + timedelta(minutes=1), resample=True
+                )
+
+    async def test_all_failed_raises_with_duplicate_pvs(self):
+        async with AsyncArchiverClient(retries=0) as client:
+            with self.assertRaises(ArchiverError):
+                await client.get_values_over_time_range(
+                    [MISSING_PV, MISSING_PV], START, START + timedelta(minutes=1)
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
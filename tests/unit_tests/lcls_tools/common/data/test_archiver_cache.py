@@ -0,0 +1,229 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+import unittest.mock as mock
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from lcls_tools.common.data import archiver
+from lcls_tools.common.data.archiver import (
+    ColumnarArchiveDataHandler,
+    get_values_over_time_range,
+)
+from lcls_tools.common.data.archiver_cache import ArchiverCache
+
+PACIFIC = ZoneInfo("America/Los_Angeles")
+START = datetime(2024, 4, 1, 14, 0, 0)
+START_SECS = int(START.replace(tzinfo=PACIFIC).timestamp())
+# one sample every 10 seconds for two hours, starting a minute before START
+RECORDS = [
+    {"secs": START_SECS + 10 * i, "nanos": 0, "val": float(i), "severity": 0}
+    for i in range(-6, 720)
+]
+
+
+class StubArchiverHandler(BaseHTTPRequestHandler):
+    """Answers getData.json/getDataForPVs.json like the appliance does"""
+
+    requests_seen = []
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        t0 = datetime.fromisoformat(query["from"][0]).timestamp()
+        t1 = datetime.fromisoformat(query["to"][0]).timestamp()
+        StubArchiverHandler.requests_seen.append((query["pv"], t0, t1))
+        before = [r for r in RECORDS if r["secs"] < t0][-1:]
+        inside = [r for r in RECORDS if t0 <= r["secs"] <= t1]
+        body = json.dumps(
+            [{"meta": {"name": pv}, "data": before + inside} for pv in query["pv"]]
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestArchiverCache(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubArchiverHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        url = f"http://127.0.0.1:{cls.server.server_port}/retrieval/data/{{SUFFIX}}"
+        cls.url_patch = mock.patch(
+            "lcls_tools.common.data.archiver.ARCHIVER_URL_FORMATTER", url
+        )
+        cls.url_patch.start()
+        return super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.url_patch.stop()
+        cls.server.shutdown()
+        cls.server.server_close()
+        return super().tearDownClass()
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ArchiverCache(directory=self.tmp.name)
+        self.pv_lst = ["ACCL:L0B:0110:DFBEST", "ACCL:L0B:0110:AACTMEAN"]
+        StubArchiverHandler.requests_seen = []
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+        return super().tearDown()
+
+    def test_only_missing_gap_is_fetched(self):
+        first_end = START + timedelta(minutes=30)
+        get_values_over_time_range(self.pv_lst, START, first_end, cache=self.cache)
+        self.assertEqual(len(StubArchiverHandler.requests_seen), 1)
+
+        second_start = START + timedelta(minutes=15)
+        second_end = START + timedelta(minutes=45)
+        cached = get_values_over_time_range(
+            self.pv_lst, second_start, second_end, cache=self.cache
+        )
+
+        self.assertEqual(len(StubArchiverHandler.requests_seen), 2)
+        _, gap_start, gap_end = StubArchiverHandler.requests_seen[-1]
+        self.assertEqual(gap_start, first_end.replace(tzinfo=PACIFIC).timestamp())
+        self.assertEqual(gap_end, second_end.replace(tzinfo=PACIFIC).timestamp())
+        self.assertEqual(self.cache.intervals(self.pv_lst[0]), [(START, second_end)])
+
+        direct = get_values_over_time_range(self.pv_lst, second_start, second_end)
+        for pv in self.pv_lst:
+            self.assertEqual(cached[pv], direct[pv])
+
+    def test_fully_cached_range_makes_no_request(self):
+        end = START + timedelta(hours=1)
+        get_values_over_time_range(self.pv_lst, START, end, cache=self.cache)
+        reopened = ArchiverCache(directory=self.tmp.name)
+
+        result = get_values_over_time_range(
+            self.pv_lst, START + timedelta(minutes=10), end, cache=reopened
+        )
+
+        self.assertEqual(len(StubArchiverHandler.requests_seen), 1)
+        # 301 samples in [start, end] plus the one the appliance carries over
+        self.assertEqual(len(result[self.pv_lst[0]]), 302)
+
+    def test_operator_is_part_of_the_key(self):
+        end = START + timedelta(minutes=10)
+        get_values_over_time_range(self.pv_lst, START, end, cache=self.cache)
+        get_values_over_time_range(
+            self.pv_lst, START, end, use_operator="mean_60", cache=self.cache
+        )
+
+        self.assertEqual(len(StubArchiverHandler.requests_seen), 2)
+        self.assertEqual(
+            StubArchiverHandler.requests_seen[-1][0],
+            [f"mean_60({pv})" for pv in self.pv_lst],
+        )
+
+    def test_lru_eviction(self):
+        end = START + timedelta(minutes=10)
+        get_values_over_time_range(["PV:A"], START, end, cache=self.cache)
+        get_values_over_time_range(["PV:B"], START, end, cache=self.cache)
+        get_values_over_time_range(["PV:A"], START, end, cache=self.cache)
+        # room for two entries only
+        self.cache.max_bytes = self.cache.size
+
+        get_values_over_time_range(["PV:C"], START, end, cache=self.cache)
+
+        self.assertEqual(self.cache.intervals("PV:B"), [])
+        self.assertNotEqual(self.cache.intervals("PV:A"), [])
+        self.assertNotEqual(self.cache.intervals("PV:C"), [])
+
+    def test_invalidate(self):
+        end = START + timedelta(minutes=10)
+        get_values_over_time_range(self.pv_lst, START, end, cache=self.cache)
+
+        self.cache.invalidate(self.pv_lst[0])
+        self.assertEqual(self.cache.intervals(self.pv_lst[0]), [])
+        self.assertNotEqual(self.cache.intervals(self.pv_lst[1]), [])
+
+        self.cache.invalidate()
+        self.assertEqual(self.cache.size, 0)
+        get_values_over_time_range(self.pv_lst, START, end, cache=self.cache)
+        self.assertEqual(len(StubArchiverHandler.requests_seen), 2)
+
+    def test_object_values_and_fields_are_stored_without_pickle(self):
+        handler = ColumnarArchiveDataHandler(
+            secs=[START_SECS, START_SECS + 1],
+            val=np.array([[1.0, 2.0], [3.0]], dtype=object),
+            meta={"name": "PV:A"},
+            fields={1: {"HIHI": "5.0"}},
+        )
+        self.cache._write_entry("PV:A", None, handler, [(0, 1)])
+        for filename in os.listdir(self.tmp.name):
+            np.load(os.path.join(self.tmp.name, filename), allow_pickle=False)
+
+        stored, intervals = ArchiverCache(self.tmp.name)._read_entry("PV:A", None)
+
+        self.assertEqual(intervals, [(0, 1)])
+        self.assertEqual(stored.values, [[1.0, 2.0], [3.0]])
+        self.assertEqual(stored.fields, {1: {"HIHI": "5.0"}})
+        self.assertEqual(stored.meta, {"name": "PV:A"})
+
+    def test_caches_sharing_a_directory_keep_each_others_entries(self):
+        other = ArchiverCache(directory=self.tmp.name)
+        end = START + timedelta(minutes=10)
+        get_values_over_time_range(["PV:A"], START, end, cache=self.cache)
+        get_values_over_time_range(["PV:B"], START, end, cache=other)
+        later = end + timedelta(minutes=10)
+        get_values_over_time_range(["PV:A"], end, later, cache=other)
+
+        self.assertEqual(self.cache.intervals("PV:B"), [(START, end)])
+        self.assertEqual(self.cache.intervals("PV:A"), [(START, later)])
+
+    def test_lock_is_not_held_while_fetching(self):
+        fetch = archiver.get_values_over_time_range
+        answered = []
+
+        def fetch_and_query(*args, **kwargs):
+            thread = threading.Thread(
+                target=lambda: answered.append(self.cache.intervals("PV:B"))
+            )
+            thread.start()
+            thread.join(timeout=5)
+            return fetch(*args, **kwargs)
+
+        with mock.patch.object(
+            archiver, "get_values_over_time_range", side_effect=fetch_and_query
+        ):
+            self.cache.get_values_over_time_range(
+                ["PV:A"], START, START + timedelta(minutes=1)
+            )
+        self.assertEqual(answered, [[]])
+
+    def test_gaps_are_requested_in_utc(self):
+        # 01:30 PST after clocks went back, a naive Pacific time can't tell it
+        # apart from 01:30 PDT an hour earlier
+        first_end = datetime(2024, 11, 3, 9, 30, tzinfo=timezone.utc)
+        get_values_over_time_range(
+            ["PV:A"], first_end - timedelta(hours=2), first_end, cache=self.cache
+        )
+        get_values_over_time_range(
+            ["PV:A"],
+            first_end - timedelta(hours=1),
+            first_end + timedelta(minutes=20),
+            cache=self.cache,
+        )
+
+        _, gap_start, _ = StubArchiverHandler.requests_seen[-1]
+        self.assertEqual(gap_start, first_end.timestamp())
+
+
+if __name__ == "__main__":
+    unittest.main()
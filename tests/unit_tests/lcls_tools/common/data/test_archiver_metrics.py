@@ -0,0 +1,147 @@
+import json
+import threading
+import unittest
+import unittest.mock as mock
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from lcls_tools.common.data import archiver
+from lcls_tools.common.data.archiver import (
+    ArchiverError,
+    get_data_at_time,
+    get_values_over_time_range,
+)
+from lcls_tools.common.data.archiver_metrics import ArchiverMetrics, Histogram
+
+FLAKY_PV = "FLAKY:PV"
+MISSING_PV = "MISSING:PV"
+
+
+class StubArchiverHandler(BaseHTTPRequestHandler):
+    """Serves three samples per PV; FLAKY:PV fails once with a 503 first"""
+
+    flaky_failures = 0
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        pv_list = parse_qs(urlparse(self.path).query)["pv"]
+        if MISSING_PV in pv_list:
+            return self._reply(404, {})
+        if FLAKY_PV in pv_list and StubArchiverHandler.flaky_failures < 1:
+            StubArchiverHandler.flaky_failures += 1
+            return self._reply(503, {})
+        data = [{"secs": 1711990800 + i, "nanos": 0, "val": 1.0} for i in range(3)]
+        self._reply(200, [{"meta": {"name": pv}, "data": data} for pv in pv_list])
+
+    def do_POST(self):
+        length = int(self.headers["Content-Length"])
+        pv_list = parse_qs(self.rfile.read(length).decode())["pv"][0].split(",")
+        sample = {"secs": 1711990800, "nanos": 0, "val": 1.0}
+        self._reply(200, {pv: sample for pv in pv_list})
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestArchiverMetrics(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubArchiverHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        url = f"http://127.0.0.1:{cls.server.server_port}/retrieval/data/{{SUFFIX}}"
+        cls.url_patch = mock.patch.object(archiver, "ARCHIVER_URL_FORMATTER", url)
+        cls.url_patch.start()
+        return super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.url_patch.stop()
+        cls.server.shutdown()
+        cls.server.server_close()
+        return super().tearDownClass()
+
+    def setUp(self) -> None:
+        self.start = datetime(2024, 4, 1, 10, 0, 0)
+        self.end = self.start + timedelta(minutes=1)
+        StubArchiverHandler.flaky_failures = 0
+        return super().setUp()
+
+    def test_disabled_by_default(self):
+        self.assertIs(archiver._observe("getData.json", 1), archiver._NULL_OBSERVATION)
+        with ArchiverMetrics():
+            self.assertIsNot(
+                archiver._observe("getData.json", 1), archiver._NULL_OBSERVATION
+            )
+        self.assertEqual(archiver._metrics_hooks, [])
+
+    def test_request_records(self):
+        with ArchiverMetrics(keep_records=True) as metrics:
+            get_values_over_time_range(["PV:A", "PV:B"], self.start, self.end)
+            get_data_at_time(["PV:A", "PV:B"], self.start)
+
+        range_record, point_record = metrics.records
+        self.assertEqual(range_record.endpoint, "getDataForPVs.json")
+        self.assertEqual(range_record.pv_count, 2)
+        self.assertEqual(range_record.samples, 6)
+        self.assertEqual(range_record.status, 200)
+        self.assertGreater(range_record.bytes_received, 0)
+        self.assertGreater(range_record.latency, 0)
+        self.assertGreaterEqual(range_record.latency, range_record.server_time)
+        self.assertEqual(point_record.endpoint, "getDataAtTime")
+        self.assertEqual(point_record.samples, 2)
+
+    def test_retries_come_from_urllib3(self):
+        with ArchiverMetrics(keep_records=True) as metrics:
+            result = get_values_over_time_range([FLAKY_PV], self.start, self.end)
+
+        self.assertEqual(len(result[FLAKY_PV]), 3)
+        self.assertEqual(metrics.records[0].retries, 1)
+        self.assertEqual(metrics.histogram("retries").total, 1)
+
+    def test_failed_request_and_json_export(self):
+        with ArchiverMetrics(keep_records=True) as metrics:
+            with self.assertRaises(ArchiverError):
+                get_values_over_time_range([MISSING_PV], self.start, self.end)
+            get_values_over_time_range(["PV:A"], self.start, self.end)
+
+        exported = json.loads(metrics.to_json())
+        self.assertEqual(exported["errors"], {"ArchiverError": 1})
+        self.assertEqual(exported["records"][0]["status"], 404)
+        endpoint = exported["endpoints"]["getData.json"]
+        self.assertEqual(endpoint["latency"]["count"], 2)
+        self.assertEqual(endpoint["samples"]["sum"], 3)
+        with self.assertLogs("lcls_tools.common.data.archiver_metrics") as logs:
+            metrics.log_summary()
+        self.assertIn("getData.json: 2 requests", "\n".join(logs.output))
+
+    def test_failing_hook_does_not_break_request(self):
+        hook = mock.Mock(side_effect=RuntimeError)
+        archiver.add_metrics_hook(hook)
+        try:
+            with self.assertLogs("lcls_tools.common.data.archiver", "ERROR"):
+                result = get_values_over_time_range(["PV:A"], self.start, self.end)
+        finally:
+            archiver.remove_metrics_hook(hook)
+        self.assertEqual(len(result["PV:A"]), 3)
+        hook.assert_called_once()
+
+    def test_histogram_quantiles(self):
+        histogram = Histogram([1, 2, 5, 10])
+        for value in [0.5, 0.5, 1.5, 3, 20]:
+            histogram.add(value)
+        self.assertEqual(histogram.counts, [2, 1, 1, 0, 1])
+        self.assertEqual(histogram.quantile(0.5), 2)
+        self.assertEqual(histogram.quantile(0.99), 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
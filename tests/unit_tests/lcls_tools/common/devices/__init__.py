@@ -0,0 +1,25 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from lcls_tools.common.devices.index import (
+    CACHE_LOCATION_VARIABLE,
+    set_device_index,
+    set_enum_string_cache,
+)
+
+
+def use_temporary_cache(test_case: unittest.TestCase) -> str:
+    """
+    Keep the default device index and enum string stores in a temporary
+    directory until test_case is done, instead of in the user's cache.
+    """
+    directory = tempfile.TemporaryDirectory()
+    test_case.addCleanup(directory.cleanup)
+    environment = patch.dict(os.environ, {CACHE_LOCATION_VARIABLE: directory.name})
+    environment.start()
+    test_case.addCleanup(environment.stop)
+    test_case.addCleanup(set_device_index, set_device_index(None))
+    test_case.addCleanup(set_enum_string_cache, set_enum_string_cache(None))
+    return directory.name
@@ -1,6 +1,10 @@
+import copy
 import unittest
+from unittest.mock import patch
+
 import yaml
 from lcls_tools.common.devices.area import Area
+from lcls_tools.common.devices.screen import ScreenCollection
 
 
 class TestArea(unittest.TestCase):
@@ -19,3 +23,43 @@ class TestArea(unittest.TestCase):
         area = Area(name="mock_area", **mock_screen_data)
         self.assertIsNone(area.magnet_collection)
         self.assertIsNone(area.magnets)
+
+    def test_loaded_fields_are_plain_attributes(self):
+        with open(
+            "tests/datasets/devices/config/screen/typical_screen.yaml", "r"
+        ) as file:
+            mock_screen_data = {"screens": yaml.safe_load(file)}
+        eager = Area(name="mock_area", **copy.deepcopy(mock_screen_data))
+        lazy = Area(name="mock_area", lazy=True, **mock_screen_data)
+        with patch("lcls_tools.common.pydantic._deferred_lock") as mock_lock:
+            eager.screen_collection
+            eager.magnet_collection
+            mock_lock.__enter__.assert_not_called()
+            lazy.screen_collection
+            mock_lock.__enter__.assert_called_once()
+            lazy.screen_collection
+            mock_lock.__enter__.assert_called_once()
+
+    def test_lazy_area_creates_collections_on_first_access(self):
+        with open(
+            "tests/datasets/devices/config/screen/typical_screen.yaml", "r"
+        ) as file:
+            mock_screen_data = {"screens": yaml.safe_load(file)}
+        original = copy.deepcopy(mock_screen_data)
+        with patch(
+            "lcls_tools.common.devices.area.ScreenCollection",
+            wraps=ScreenCollection,
+        ) as mock_collection:
+            area = Area(name="mock_area", lazy=True, **mock_screen_data)
+            mock_collection.assert_not_called()
+            self.assertFalse(area.is_loaded("screen_collection"))
+            screens = area.screens
+            self.assertIs(area.screens, screens)
+        mock_collection.assert_called_once()
+        self.assertTrue(area.is_loaded("screen_collection"))
+        self.assertIsNone(area.magnet_collection)
+        self.assertEqual(mock_screen_data, original)
+        self.assertEqual(
+            area.model_dump(),
+            Area(name="mock_area", **copy.deepcopy(original)).model_dump(),
+        )
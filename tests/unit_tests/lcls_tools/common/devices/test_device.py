@@ -1,3 +1,4 @@
+import gc
 import os
 import unittest
 from unittest.mock import MagicMock, patch
@@ -5,14 +6,23 @@ from pydantic import ValidationError
 from lcls_tools.common.devices.device import (
     Device,
     ApplyDeviceCallbackError,
+    LazyPV,
+    PVSet,
     RemoveDeviceCallbackError,
 )
 from epics import PV
+from lcls_tools.common.controls.pyepics.simulation import SimulatedIOC, SimulatedPV
+from lcls_tools.common.controls.pyepics.utils import CachedPV
+import numpy as np
 import yaml
 
+from lcls_tools.common.devices.reader import create_bpm
+from tests.unit_tests.lcls_tools.common.devices import use_temporary_cache
+
 
 class TestDevice(unittest.TestCase):
     def setUp(self) -> None:
+        use_temporary_cache(self)
         self.config_location = "./tests/datasets/devices/config/"
         self.config_filename = os.path.join(self.config_location, "base_device.yaml")
         with open(self.config_filename, "r") as file:
@@ -270,3 +280,132 @@ class TestDevice(unittest.TestCase):
         # Check callback has been removed
         self.assertEqual(len(self.pv_obj.callbacks), 0)
         self.assertEqual(self.pv_obj.callbacks, {})
+
+
+class ExamplePVSet(PVSet):
+    bact: PV
+    bdes: PV
+
+
+class TestLazyPV(unittest.TestCase):
+    def setUp(self) -> None:
+        self.pv_set = ExamplePVSet(bact="SOLN:GUNB:212:BACT", bdes="SOLN:GUNB:212:BDES")
+        return super().setUp()
+
+    @patch("lcls_tools.common.devices.device.PV")
+    def test_no_channel_until_used(self, mock_pv: MagicMock):
+        pv_set = ExamplePVSet(bact="SOLN:GUNB:212:BACT", bdes="SOLN:GUNB:212:BDES")
+        self.assertIsInstance(pv_set.bact, PV)
+        self.assertEqual(pv_set.bact.pvname, "SOLN:GUNB:212:BACT")
+        self.assertEqual(
+            pv_set.model_dump(),
+            {"bact": "SOLN:GUNB:212:BACT", "bdes": "SOLN:GUNB:212:BDES"},
+        )
+        mock_pv.assert_not_called()
+
+        pv_set.bact.get()
+        pv_set.bact.get()
+        mock_pv.assert_called_once_with("SOLN:GUNB:212:BACT")
+        mock_pv.return_value.get.assert_called_with()
+
+    def test_repr_before_creation(self):
+        self.assertEqual(
+            repr(self.pv_set.bdes), "<PV 'SOLN:GUNB:212:BDES': not created>"
+        )
+
+    def test_equal_pvs_hash_alike(self):
+        pv = LazyPV("SOLN:GUNB:212:BACT")
+        same = LazyPV("SOLN:GUNB:212:BACT")
+        self.assertEqual(pv, same)
+        self.assertEqual(hash(pv), hash(same))
+        self.assertIn(same, {pv})
+        self.assertEqual({pv: 1}[same], 1)
+        self.assertEqual(len({pv, same, LazyPV("SOLN:GUNB:212:BDES")}), 2)
+        self.assertIsNone(pv._pv)
+
+    @patch("lcls_tools.common.devices.device.PV")
+    def test_hashable_and_collected_without_channel(self, mock_pv: MagicMock):
+        pv = LazyPV("SOLN:GUNB:212:BACT")
+        self.assertIn(pv, {pv})
+        pv.disconnect()
+        del pv
+        gc.collect()
+        mock_pv.assert_not_called()
+
+    def test_materialize_returns_created_pv(self):
+        pv = LazyPV.materialize(self.pv_set.bact)
+        self.assertIs(type(pv), PV)
+        self.assertIs(LazyPV.materialize(self.pv_set.bact), pv)
+        self.assertIs(LazyPV.materialize(pv), pv)
+        self.assertEqual(self.pv_set.bact, pv)
+
+    @patch("lcls_tools.common.devices.device.PV")
+    def test_connect_all_creates_every_channel(self, mock_pv: MagicMock):
+        mock_pv.return_value.wait_for_connection.return_value = True
+        pv_set = ExamplePVSet(bact="SOLN:GUNB:212:BACT", bdes="SOLN:GUNB:212:BDES")
+        self.assertTrue(pv_set.connect_all(timeout=0.1))
+        self.assertEqual(mock_pv.call_count, 2)
+        mock_pv.return_value.wait_for_connection.assert_called_with(timeout=0.1)
+
+    @patch("lcls_tools.common.devices.device.CachedPV")
+    @patch("lcls_tools.common.devices.device.PV")
+    def test_enable_cache_before_use(self, mock_pv: MagicMock, mock_cached: MagicMock):
+        pv_set = ExamplePVSet(bact="SOLN:GUNB:212:BACT", bdes="SOLN:GUNB:212:BDES")
+        pv_set.enable_cache(max_age=0.5)
+        mock_cached.assert_not_called()
+        pv_set.bact.get()
+        mock_cached.assert_called_once_with("SOLN:GUNB:212:BACT", max_age=0.5)
+        mock_pv.assert_not_called()
+
+        pv_set.enable_cache(max_age=None)
+        pv_set.bdes.get()
+        mock_pv.assert_called_once_with("SOLN:GUNB:212:BDES")
+
+    def test_enable_cache_keeps_callbacks_of_pv_in_use(self):
+        def callback(**kwargs):
+            pass
+
+        self.pv_set.bact.add_callback(callback)
+        self.pv_set.enable_cache(max_age=0.5)
+        pv = LazyPV.materialize(self.pv_set.bact)
+        self.assertIsInstance(pv, CachedPV)
+        self.assertEqual(pv.max_age, 0.5)
+        self.assertEqual(pv.callbacks[1], (callback, {}))
+        self.assertEqual(len(pv.callbacks), 2)
+        self.assertEqual(self.pv_set.cache_stats(), {"hits": 0, "misses": 0})
+
+
+class TestReadPVs(unittest.TestCase):
+    def setUp(self) -> None:
+        use_temporary_cache(self)
+        self.ioc = SimulatedIOC(seed=0)
+        installed = self.ioc.installed()
+        installed.__enter__()
+        self.addCleanup(installed.__exit__, None, None, None)
+        self.bpms = create_bpm(area="BYP")
+        return super().setUp()
+
+    def test_bpm_snapshot_is_aligned_with_device_names(self):
+        names = self.bpms.device_names
+        for i, name in enumerate(names):
+            pvs = self.bpms.bpms[name].controls_information.PVs
+            self.ioc.set(pvs.tmit.pvname, float(i))
+        snapshot = self.bpms.snapshot(["x", "tmit"], timeout=0.5)
+        np.testing.assert_array_equal(snapshot["tmit"], np.arange(len(names)))
+        self.assertEqual(self.ioc.gets, 2 * len(names))
+
+    def test_reads_go_through_device_pvs(self):
+        name = self.bpms.device_names[0]
+        tmit = self.bpms.bpms[name].controls_information.PVs.tmit
+        self.ioc.disconnect(tmit.pvname)
+        values = self.bpms.snapshot(["tmit"], timeout=0.01)["tmit"]
+        self.assertTrue(np.isnan(values[0]))
+        self.assertIsInstance(LazyPV.materialize(tmit), SimulatedPV)
+
+    def test_waveforms_come_back_as_objects(self):
+        count = len(self.bpms.device_names)
+        for bpm in self.bpms.bpms.values():
+            self.ioc.set(bpm.controls_information.PVs.x.pvname, np.zeros(3))
+        values = self.bpms.get_all("x")
+        self.assertEqual(values.dtype, object)
+        self.assertEqual(values.shape, (count,))
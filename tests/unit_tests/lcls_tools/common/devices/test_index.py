@@ -0,0 +1,216 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import yaml
+
+from lcls_tools.common.devices.beampath import Beampath
+from lcls_tools.common.devices.index import (
+    CACHE_LOCATION_VARIABLE,
+    get_device_index,
+    get_enum_string_cache,
+    set_device_index,
+    set_enum_string_cache,
+    DeviceIndex,
+    DeviceLookup,
+    EnumStringCache,
+    DEFAULT_YAML_LOCATION,
+)
+from lcls_tools.common.devices.reader import _device_data
+from tests.unit_tests.lcls_tools.common.devices import use_temporary_cache
+
+
+class TestDeviceIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.yaml_location = os.path.join(self.tmp.name, "yaml")
+        os.makedirs(self.yaml_location)
+        for area in ["GUNB", "L0B"]:
+            shutil.copy(
+                os.path.join(DEFAULT_YAML_LOCATION, area + ".yaml"),
+                self.yaml_location,
+            )
+        self.gunb = os.path.join(self.yaml_location, "GUNB.yaml")
+        self.index_file = os.path.join(self.tmp.name, "index.pickle")
+        self.index = DeviceIndex(self.index_file, self.yaml_location)
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+        return super().tearDown()
+
+    def test_file_is_parsed_once(self):
+        with patch("yaml.load", wraps=yaml.load) as mock_load:
+            first = self.index.load(self.gunb)
+            second = self.index.load(self.gunb)
+        self.assertEqual(mock_load.call_count, 1)
+        self.assertIs(first, second)
+        self.assertIn("SOL1B", first["magnets"])
+
+    def test_store_is_reused_by_new_index(self):
+        self.index.compile()
+        reopened = DeviceIndex(self.index_file, self.yaml_location)
+        with patch("yaml.load") as mock_load:
+            data = reopened.load(os.path.join(self.yaml_location, "L0B.yaml"))
+        mock_load.assert_not_called()
+        self.assertIn("bpms", data)
+
+    def test_store_is_written_once_per_batch(self):
+        with patch.object(DeviceIndex, "_write_store", autospec=True) as mock_write:
+            DeviceLookup(self.index).get("SOL1B")
+            self.assertEqual(mock_write.call_count, 1)
+            self.index.compile()
+            self.assertEqual(mock_write.call_count, 1)
+            # nothing was stored, so every file is parsed and changed again
+            self.index.clear()
+            self.index.compile()
+            self.assertEqual(mock_write.call_count, 2)
+            self.index.load(self.gunb)
+            self.assertEqual(mock_write.call_count, 2)
+
+    def test_default_stores_follow_cache_variable(self):
+        directory = use_temporary_cache(self)
+        self.assertEqual(
+            get_device_index().index_file,
+            os.path.join(directory, "device_index.pickle"),
+        )
+        self.assertEqual(
+            get_enum_string_cache().cache_file,
+            os.path.join(directory, "enum_strs.pickle"),
+        )
+        with patch.dict(os.environ, {CACHE_LOCATION_VARIABLE: ""}):
+            set_device_index(None)
+            set_enum_string_cache(None)
+            self.assertIsNone(get_device_index().index_file)
+            self.assertIsNone(get_enum_string_cache().cache_file)
+
+    def test_changed_file_is_parsed_again(self):
+        self.index.load(self.gunb)
+        with open(self.gunb, "a") as file:
+            file.write("extra: 1\n")
+        self.assertEqual(self.index.load(self.gunb)["extra"], 1)
+
+    def test_touched_file_is_validated_by_hash(self):
+        self.index.load(self.gunb)
+        stat = os.stat(self.gunb)
+        os.utime(self.gunb, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        with patch("yaml.load") as mock_load:
+            self.index.load(self.gunb)
+        mock_load.assert_not_called()
+
+    def test_corrupt_store_is_rebuilt(self):
+        with open(self.index_file, "wb") as file:
+            file.write(b"not a pickle")
+        self.assertIn("magnets", self.index.load(self.gunb))
+        self.assertIn(
+            os.path.abspath(self.gunb),
+            DeviceIndex(self.index_file, self.yaml_location).entries,
+        )
+
+    def test_missing_file_raises(self):
+        with self.assertRaises(FileNotFoundError):
+            self.index.load(os.path.join(self.yaml_location, "NOPE.yaml"))
+
+    def test_reader_hands_out_copies(self):
+        with (
+            patch(
+                "lcls_tools.common.devices.reader.get_device_index",
+                return_value=self.index,
+            ),
+            patch(
+                "lcls_tools.common.devices.reader._find_yaml_file",
+                return_value=self.gunb,
+            ),
+        ):
+            magnet = _device_data(area="GUNB", device_type="magnets", name="SOL1B")
+            magnet["name"] = "SOL1B"
+            again = _device_data(area="GUNB", device_type="magnets", name="SOL1B")
+        self.assertNotIn("name", again)
+
+
+class TestEnumStringCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_file = os.path.join(self.tmp.name, "enum_strs.pickle")
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+        return super().tearDown()
+
+    def test_entries_are_shared_through_the_store(self):
+        EnumStringCache(self.cache_file).update({"A:CTRL": ["Ready", "TRIM"]})
+        other = EnumStringCache(self.cache_file)
+        other.update({"B:CTRL": ("Ready",)})
+        reopened = EnumStringCache(self.cache_file)
+        self.assertEqual(reopened.get("A:CTRL"), ("Ready", "TRIM"))
+        self.assertEqual(reopened.get("B:CTRL"), ("Ready",))
+        self.assertIsNone(reopened.get("C:CTRL"))
+
+    def test_old_entries_are_ignored(self):
+        cache = EnumStringCache(self.cache_file, max_age=60)
+        with patch("time.time", return_value=1000.0):
+            cache.update({"A:CTRL": ("Ready",)})
+        with patch("time.time", return_value=1030.0):
+            self.assertEqual(cache.get("A:CTRL"), ("Ready",))
+        with patch("time.time", return_value=1061.0):
+            self.assertIsNone(cache.get("A:CTRL"))
+
+
+class TestDeviceLookup(unittest.TestCase):
+    def setUp(self) -> None:
+        use_temporary_cache(self)
+        self.tmp = tempfile.TemporaryDirectory()
+        for area in ["GUNB", "L0B"]:
+            shutil.copy(
+                os.path.join(DEFAULT_YAML_LOCATION, area + ".yaml"), self.tmp.name
+            )
+        self.lookup = DeviceLookup(DeviceIndex(None, self.tmp.name))
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+        return super().tearDown()
+
+    def test_get_by_name(self):
+        record = self.lookup.get("SOL1B")
+        self.assertEqual(record.area, "GUNB")
+        self.assertEqual(record.device_type, "magnets")
+        self.assertEqual(record.control_name, "SOLN:GUNB:212")
+        self.assertEqual(record.type, "SOLE")
+        self.assertIsNone(self.lookup.get("NOPE"))
+
+    def test_name_for_control_name(self):
+        self.assertEqual(self.lookup.name_for_control_name("BPMS:L0B:0183"), "CMB01")
+        self.assertIsNone(self.lookup.name_for_control_name("NOPE:NOPE:1"))
+
+    def test_between_is_sorted_and_inclusive(self):
+        z = self.lookup.get("SOL1B").sum_l_meters
+        found = self.lookup.between(z, z + 10)
+        self.assertEqual(found[0].sum_l_meters, z)
+        positions = [record.sum_l_meters for record in found]
+        self.assertEqual(positions, sorted(positions))
+        self.assertTrue(all(z <= position <= z + 10 for position in positions))
+
+    def test_between_filters_types_and_beampath(self):
+        bpms = self.lookup.between(types="bpms", beampath="SC_HXR")
+        self.assertTrue(bpms)
+        self.assertTrue(all(record.device_type == "bpms" for record in bpms))
+        self.assertTrue(all("SC_HXR" in record.beam_path for record in bpms))
+        quads_and_bpms = self.lookup.between(types=["QUAD", "bpms"])
+        self.assertEqual({record.type for record in quads_and_bpms}, {"QUAD", "BPM"})
+        self.assertEqual(self.lookup.between(beampath="NOPE"), [])
+
+    def test_beampath_devices_between(self):
+        with patch(
+            "lcls_tools.common.devices.beampath.get_device_lookup",
+            return_value=self.lookup,
+        ):
+            found = Beampath(name="SC_HXR").devices_between(0, 1000, types="SOLE")
+        self.assertIn("SOL1B", [record.name for record in found])
+
+
+if __name__ == "__main__":
+    unittest.main()
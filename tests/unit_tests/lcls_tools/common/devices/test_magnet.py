@@ -5,14 +5,29 @@ import datetime
 from unittest import TestCase
 from unittest.mock import Mock, patch, PropertyMock
 import inspect
+import os
+import tempfile
+import threading
+
+import numpy as np
 
 # Local imports
+from lcls_tools.common.controls.pyepics.simulation import SimulatedIOC
+from lcls_tools.common.controls.pyepics.utils import PVGroup
+from lcls_tools.common.devices.index import EnumStringCache
 from lcls_tools.common.devices.reader import create_magnet
-from lcls_tools.common.devices.magnet import MagnetCollection, Magnet
+from lcls_tools.common.devices.magnet import (
+    MagnetCollection,
+    Magnet,
+    MagnetTimeoutError,
+    SettleResult,
+)
+from tests.unit_tests.lcls_tools.common.devices import use_temporary_cache
 
 
 class MagnetTest(TestCase):
     def setUp(self) -> None:
+        use_temporary_cache(self)
         # Set up some mocks that are needed for all test-cases.
         self.options_and_getter_function = {
             "TRIM": None,
@@ -283,6 +298,38 @@ class MagnetTest(TestCase):
         mock_bdes.return_value = 0.01
         self.assertFalse(self.magnet.is_bact_settled(b_tolerance=0.001))
 
+    @patch("epics.PV.get", new_callable=Mock)
+    @patch("epics.PV.put", new_callable=Mock)
+    @patch("lcls_tools.common.devices.magnet.Magnet.trim", new_callable=Mock)
+    def test_set_bdes_with_validation_wakes_on_bact_update(
+        self, mock_trim, mock_put, mock_get
+    ) -> None:
+        mock_get.return_value = 0.0
+        bact = self.magnet.controls_information.PVs.bact
+
+        def monitor_update():
+            for callback, kwargs in list(bact.callbacks.values()):
+                callback(value=0.5, **kwargs)
+
+        timer = threading.Timer(0.1, monitor_update)
+        timer.start()
+        self.magnet.set_bdes_with_validation(0.5, settle_timeout_in_seconds=5)
+        timer.join()
+        mock_put.assert_called_once_with(value=0.5)
+        mock_trim.assert_called_once()
+        self.assertEqual(bact.callbacks, {})
+
+    @patch("epics.PV.get", new_callable=Mock)
+    @patch("epics.PV.put", new_callable=Mock)
+    @patch("lcls_tools.common.devices.magnet.Magnet.trim", new_callable=Mock)
+    def test_set_bdes_with_validation_timeout(
+        self, mock_trim, mock_put, mock_get
+    ) -> None:
+        mock_get.return_value = 0.0
+        with self.assertRaises(MagnetTimeoutError):
+            self.magnet.set_bdes_with_validation(0.5, settle_timeout_in_seconds=0.1)
+        self.assertEqual(self.magnet.controls_information.PVs.bact.callbacks, {})
+
     @patch("epics.PV.put", new_callable=Mock)
     @patch(
         "lcls_tools.common.devices.magnet.Magnet.ctrl",
@@ -309,6 +356,7 @@ class MagnetTest(TestCase):
 
 class MagnetCollectionTest(TestCase):
     def setUp(self) -> None:
+        use_temporary_cache(self)
         self.options = [
             "TRIM",
             "PERTURB",
@@ -614,3 +662,166 @@ class MagnetCollectionTest(TestCase):
         # create magnet from info dict
         new_magnet = Magnet(**info)
         self.assertEqual(magnet, new_magnet)
+
+    @patch("epics.PV.get", new_callable=Mock)
+    @patch("epics.PV.put", new_callable=Mock)
+    @patch("lcls_tools.common.devices.magnet.Magnet.trim", new_callable=Mock)
+    def test_set_bdes_concurrently_waits_for_all_magnets(
+        self, mock_trim, mock_put, mock_get
+    ) -> None:
+        # BACT is far away until a monitor update brings SOL1B in tolerance
+        mock_get.return_value = 0.0
+        sol1b_bact = self.magnet_collection.magnets[
+            "SOL1B"
+        ].controls_information.PVs.bact
+
+        def monitor_update():
+            for callback, kwargs in list(sol1b_bact.callbacks.values()):
+                callback(value=0.1, **kwargs)
+
+        timer = threading.Timer(0.1, monitor_update)
+        timer.start()
+        report = self.magnet_collection.set_bdes(
+            {"SOL1B": 0.1, "SOL2B": 0.1, "BAD-MAG": 0.3},
+            settle_timeout_in_seconds={"SOL1B": 5, "SOL2B": 0.2},
+            concurrent=True,
+        )
+        timer.join()
+        self.assertEqual(mock_put.call_count, 2)
+        self.assertEqual(mock_trim.call_count, 2)
+        self.assertEqual(list(report), ["SOL1B", "SOL2B"])
+        self.assertTrue(report["SOL1B"].settled)
+        self.assertLess(report["SOL1B"].seconds, 5)
+        self.assertEqual(report["SOL2B"], SettleResult(0.1, False, 0.2))
+        # the settle callbacks are gone again
+        self.assertEqual(sol1b_bact.callbacks, {})
+
+    @patch("epics.PV.get", new_callable=Mock)
+    @patch("epics.PV.put", new_callable=Mock)
+    @patch("lcls_tools.common.devices.magnet.Magnet.trim", new_callable=Mock)
+    def test_set_bdes_concurrently_when_already_settled(
+        self, mock_trim, mock_put, mock_get
+    ) -> None:
+        mock_get.return_value = 0.1
+        report = self.magnet_collection.set_bdes({"SOL1B": 0.1}, concurrent=True)
+        self.assertTrue(report["SOL1B"].settled)
+
+    @patch("epics.PV.get", new_callable=Mock)
+    @patch("epics.PV.put", new_callable=Mock)
+    @patch("lcls_tools.common.devices.magnet.Magnet.trim", new_callable=Mock)
+    def test_set_bdes_concurrently_skips_magnets_without_ctrl_options(
+        self, mock_trim, mock_put, mock_get
+    ) -> None:
+        mock_get.return_value = 0.1
+        self.magnet_collection.magnets["SOL1B"].controls_information.set_enum_strs(
+            "ctrl", ("Ready", "TRIM")
+        )
+        self.mock_ctrl_options.return_value = None
+        report = self.magnet_collection.set_bdes(
+            {"SOL2B": 0.1, "SOL1B": 0.1}, concurrent=True
+        )
+        # SOL2B keeps its BDES, it could not have been trimmed
+        self.assertEqual(mock_put.call_count, 1)
+        self.assertEqual(mock_trim.call_count, 1)
+        self.assertEqual(list(report), ["SOL2B", "SOL1B"])
+        self.assertEqual(report["SOL2B"], SettleResult(0.1, False, 0.0))
+        self.assertTrue(report["SOL1B"].settled)
+
+    def test_ctrl_options_are_read_on_first_use(self) -> None:
+        self.mock_ctrl_options.reset_mock()
+        magnets = create_magnet(area="GUNB")
+        self.mock_ctrl_options.assert_not_called()
+        self.assertEqual(magnets.magnets["SOL1B"].ctrl_options["TRIM"], 0)
+        self.assertEqual(magnets.magnets["SOL1B"].ctrl_options["DEGAUSS"], 12)
+        self.mock_ctrl_options.assert_called_once_with(timeout=1)
+
+    def test_ctrl_options_are_read_again_after_failure(self) -> None:
+        self.mock_ctrl_options.return_value = None
+        magnet = self.magnet_collection.magnets["SOL1B"]
+        with self.assertRaises(TimeoutError):
+            magnet.ctrl_options
+        with patch("epics.PV.put", new_callable=Mock) as mock_put:
+            # like a missing option, the action is skipped with a message
+            self.assertIsNone(magnet.trim())
+        mock_put.assert_not_called()
+        self.mock_ctrl_options.return_value = {"enum_strs": ("Ready",)}
+        self.assertEqual(magnet.ctrl_options, {"Ready": 0})
+
+    def test_prefetch_enum_options_uses_shared_cache(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache_file = os.path.join(tmp, "enum_strs.pickle")
+            self.mock_ctrl_options.reset_mock()
+            failed = self.magnet_collection.prefetch_enum_options(
+                cache=EnumStringCache(cache_file), max_workers=4
+            )
+            self.assertEqual(failed, [])
+            count = len(self.magnet_collection.device_names)
+            self.assertEqual(self.mock_ctrl_options.call_count, count)
+            for magnet in self.magnet_collection.magnets.values():
+                self.assertEqual(magnet.ctrl_options["TRIM"], 0)
+            self.assertEqual(self.mock_ctrl_options.call_count, count)
+            # another process finds them in the cache
+            self.mock_ctrl_options.reset_mock()
+            magnets = create_magnet(area="GUNB")
+            magnets.prefetch_enum_options(cache=EnumStringCache(cache_file))
+            self.mock_ctrl_options.assert_not_called()
+            self.assertEqual(magnets.magnets["SOL1B"].ctrl_options["RESET"], 9)
+
+    def test_pv_group_follows_device_names(self) -> None:
+        group = self.magnet_collection.pv_group(["bdes", "bact"], timeout=0.5)
+        names = self.magnet_collection.device_names
+        self.assertEqual(len(group), 2 * len(names))
+        self.assertEqual(
+            group.pvnames[len(names)],
+            self.magnet_collection.magnets[
+                names[0]
+            ].controls_information.PVs.bact.pvname,
+        )
+        self.assertEqual(group.timeout, 0.5)
+
+    def test_pv_group_writes_through_device_pvs(self) -> None:
+        with SimulatedIOC(seed=0).installed() as ioc:
+            magnets = create_magnet(area="GUNB")
+            group = magnets.pv_group(["bdes"])
+            status = group.put([0.5] * len(group), wait=True)
+            self.assertEqual(set(status.values()), {1})
+            self.assertEqual(ioc.puts, len(group))
+            self.assertEqual(ioc.get(group.pvnames[0]), 0.5)
+
+    @patch.object(PVGroup, "get", autospec=True)
+    def test_get_all_reads_every_magnet_at_once(self, mock_get):
+        names = self.magnet_collection.device_names
+        mock_get.side_effect = lambda group: {
+            pvname: float(i) for i, pvname in enumerate(group.pvnames)
+        }
+        bact = self.magnet_collection.get_all("bact")
+        mock_get.assert_called_once()
+        group = mock_get.call_args.args[0]
+        self.assertEqual(
+            group.pvnames,
+            [
+                self.magnet_collection.magnets[
+                    name
+                ].controls_information.PVs.bact.pvname
+                for name in names
+            ],
+        )
+        self.assertEqual(group.timeout, 1.0)
+        self.assertIs(
+            group.pvs[group.pvnames[0]],
+            self.magnet_collection.magnets[names[0]].controls_information.PVs.bact,
+        )
+        np.testing.assert_array_equal(bact, np.arange(len(names), dtype=float))
+
+    @patch.object(PVGroup, "get", autospec=True)
+    def test_snapshot_marks_unread_values(self, mock_get):
+        count = len(self.magnet_collection.device_names)
+        mock_get.side_effect = lambda group: {
+            pvname: None if i == len(group.pvnames) - 1 else 1.0
+            for i, pvname in enumerate(group.pvnames)
+        }
+        snapshot = self.magnet_collection.snapshot(["bact", "bdes"])
+        self.assertEqual(list(snapshot), ["bact", "bdes"])
+        self.assertEqual(len(mock_get.call_args.args[0].pvnames), 2 * count)
+        np.testing.assert_array_equal(snapshot["bact"], np.ones(count))
+        self.assertTrue(np.isnan(snapshot["bdes"][-1]))
@@ -1,12 +1,19 @@
-from lcls_tools.common.devices.reader import create_magnet, _find_yaml_file
+from lcls_tools.common.devices.reader import (
+    create_beampath,
+    create_magnet,
+    _find_yaml_file,
+)
+from lcls_tools.common.devices.area import Area
 from lcls_tools.common.devices.magnet import Magnet, MagnetCollection
 import unittest
 from unittest.mock import patch, MagicMock
 import os
+from tests.unit_tests.lcls_tools.common.devices import use_temporary_cache
 
 
 class TestMagnetReader(unittest.TestCase):
     def setUp(self) -> None:
+        use_temporary_cache(self)
         self.config_location = "./tests/datasets/devices/config/magnet/"
         self.typical_config = os.path.join(self.config_location, "typical_magnet.yaml")
         self.bad_config = os.path.join(self.config_location, "bad_magnet.yaml")
@@ -63,3 +70,50 @@ class TestMagnetReader(unittest.TestCase):
         )
         self.assertNotIsInstance(result, MagnetCollection)
         self.assertIsInstance(result, Magnet)
+
+
+class TestBeampathReader(unittest.TestCase):
+    def setUp(self) -> None:
+        use_temporary_cache(self)
+        return super().setUp()
+
+    @patch("lcls_tools.common.devices.reader._build_area")
+    def test_lazy_beampath_answers_from_definitions(self, mock_build_area):
+        beampath = create_beampath("SC_HXR", lazy=True)
+        self.assertEqual(beampath.area_names[:3], ["GUNB", "L0B", "HTR"])
+        self.assertEqual(
+            beampath.contains_areas(["L0B", "SPS"]), {"L0B": True, "SPS": False}
+        )
+        self.assertEqual(beampath.contains_areas("BYP"), {"BYP": True})
+        mock_build_area.assert_not_called()
+
+    def test_lazy_beampath_creates_areas_once(self):
+        beampath = create_beampath("SC_HXR", lazy=True)
+        with patch(
+            "lcls_tools.common.devices.reader._build_area",
+            side_effect=lambda area, lazy: Area(name=area, lazy=lazy),
+        ) as mock_build_area:
+            self.assertFalse(beampath.is_loaded("areas"))
+            areas = beampath.areas
+            self.assertIs(beampath.areas, areas)
+        self.assertEqual(mock_build_area.call_count, len(beampath.area_names))
+        self.assertEqual(list(areas), beampath.area_names)
+        mock_build_area.assert_called_with(area="FEEH", lazy=True)
+
+    def test_beampath_keeps_order_and_reports_failures(self):
+        area_names = create_beampath("SC_HXR", lazy=True).area_names
+
+        def build_area(area, lazy):
+            if area == "HTR":
+                raise FileNotFoundError(area)
+            return Area(name=area, lazy=True)
+
+        with patch(
+            "lcls_tools.common.devices.reader._build_area", side_effect=build_area
+        ):
+            beampath = create_beampath("SC_HXR")
+        self.assertEqual(
+            list(beampath.areas), [area for area in area_names if area != "HTR"]
+        )
+        self.assertEqual(list(beampath.failed_areas), ["HTR"])
+        self.assertIsInstance(beampath.failed_areas["HTR"], FileNotFoundError)
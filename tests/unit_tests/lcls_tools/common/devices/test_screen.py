@@ -1,37 +1,47 @@
-from datetime import datetime, timedelta
+from datetime import datetime
+import gc
 import os
+import tempfile
 import time
 import unittest
-from unittest.mock import PropertyMock, patch
+import weakref
+from unittest.mock import MagicMock, patch
+from lcls_tools.common.controls.pyepics.simulation import SimulatedIOC
 from lcls_tools.common.devices.reader import create_screen
 import h5py
 import numpy as np
 
-from lcls_tools.common.devices.screen import Screen
+from lcls_tools.common.devices.screen import (
+    ImageHDF5Writer,
+    ImageRingBuffer,
+    Screen,
+)
+from tests.unit_tests.lcls_tools.common.devices import use_temporary_cache
 
 
 class TestScreen(unittest.TestCase):
     def setUp(self) -> None:
+        use_temporary_cache(self)
         self.screen_collection = create_screen("BC1")
         self.screen = self.screen_collection.screens["OTR11"]
         super().setUp()
 
-    @patch(
-        "lcls_tools.common.devices.screen.Screen.image",
-        new_callable=PropertyMock,
-    )
-    @patch(
-        "lcls_tools.common.devices.screen.Screen.image_timestamp",
-        new_callable=PropertyMock,
-    )
-    def test_hdf5_saving(self, mock_timestamp, mock_image):
+    def simulate(self) -> SimulatedIOC:
+        """Serve this screen from a simulated IOC with small, fast images"""
+        ioc = SimulatedIOC(update_rate=500, waveform_shape=(20, 30), seed=0)
+        installed = ioc.installed()
+        installed.__enter__()
+        self.addCleanup(ioc.stop)
+        self.addCleanup(installed.__exit__, None, None, None)
+        self.screen = create_screen("BC1").screens["OTR11"]
+        save_location = tempfile.TemporaryDirectory()
+        self.addCleanup(save_location.cleanup)
+        self.screen.hdf_save_location = save_location.name
+        return ioc
+
+    def test_hdf5_saving(self):
+        self.simulate()
         num_capture = 100
-        mock_image.return_value = np.zeros(shape=(2000, 2000))
-        t0 = datetime.now()
-        # return an incrementing timestamp each time .image_timestamp is accessed.
-        mock_timestamp.side_effect = [
-            t0 + timedelta(seconds=i) for i in range(0, num_capture * 10)
-        ]
         for is_threaded in [True, False]:
             self.screen.save_images(num_to_capture=num_capture, threaded=is_threaded)
             while self.screen.is_saving_images:
@@ -42,35 +52,23 @@ class TestScreen(unittest.TestCase):
             )
             # Open the file we have saved and check the contents
             with h5py.File(self.screen.last_save_filepath, "r") as f:
-                # check we have the correct number of images
-                self.assertEqual(len(f), num_capture)
-                # check metadata is stored as attributes in HDF5.
-                for dataset in f:
-                    self.assertSetEqual(
-                        set(f[dataset].attrs.keys()),
-                        set(self.screen.metadata.model_dump().keys()),
-                    )
-                    # check dataset content for shape
-                    self.assertTrue(
-                        np.array_equal(np.zeros(shape=(2000, 2000)), f[dataset])
-                    )
-
-    @patch(
-        "lcls_tools.common.devices.screen.Screen.image",
-        new_callable=PropertyMock,
-    )
-    @patch(
-        "lcls_tools.common.devices.screen.Screen.image_timestamp",
-        new_callable=PropertyMock,
-    )
-    def test_hdf5_with_user_metadata(self, mock_timestamp, mock_image):
+                # check we have the correct number and shape of images
+                self.assertEqual(f["images"].shape, (num_capture, 20, 30))
+                self.assertEqual(f["images"].dtype, np.ushort)
+                # check metadata is stored once as attributes in HDF5.
+                self.assertSetEqual(
+                    set(f["images"].attrs.keys()),
+                    set(self.screen.metadata.model_dump().keys()) | {"skipped"},
+                )
+                # check every capture is a different frame
+                frames = {image.tobytes() for image in f["images"]}
+                self.assertEqual(len(frames), num_capture)
+                self.assertTrue(np.all(np.diff(f["timestamps"]) > 0))
+                self.assertEqual(f["pulse_ids"].shape, (num_capture,))
+
+    def test_hdf5_with_user_metadata(self):
+        self.simulate()
         num_capture = 100
-        mock_image.return_value = np.zeros(shape=(2000, 2000))
-        t0 = datetime.now()
-        # return an incrementing timestamp each time .image_timestamp is accessed.
-        mock_timestamp.side_effect = [
-            t0 + timedelta(seconds=i) for i in range(0, num_capture * 10)
-        ]
         user_metadata_for_scan = {
             "Comments": "Emittance Scan for HTR.",
             "QUAD1_BACT": 0.23,
@@ -92,18 +90,13 @@ class TestScreen(unittest.TestCase):
             # Open the file we have saved and check the contents
             with h5py.File(self.screen.last_save_filepath, "r") as f:
                 # check we have the correct number of images
-                self.assertEqual(len(f), num_capture)
+                self.assertEqual(f["images"].shape, (num_capture, 20, 30))
                 user_metadata_for_scan.update(**self.screen.metadata.model_dump())
-                # check metadata is stored as attributes in HDF5.
-                for dataset in f:
-                    self.assertSequenceEqual(
-                        sorted(list(f[dataset].attrs.keys())),
-                        sorted(list(user_metadata_for_scan.keys())),
-                    )
-                    # check dataset content for shape
-                    self.assertTrue(
-                        np.array_equal(np.zeros(shape=(2000, 2000)), f[dataset])
-                    )
+                # check metadata is stored once as attributes in HDF5.
+                self.assertSequenceEqual(
+                    sorted(list(f["images"].attrs.keys())),
+                    sorted(list(user_metadata_for_scan.keys()) + ["skipped"]),
+                )
 
     def test_serialization(self):
         info = self.screen.model_dump()
@@ -115,3 +108,142 @@ class TestScreen(unittest.TestCase):
         # create screen from info dict
         new_screen = Screen(**info)
         self.assertEqual(self.screen, new_screen)
+
+    def test_get_images_returns_unique_frames(self):
+        self.simulate()
+        images = self.screen.get_images(5, timeout=1)
+        self.assertEqual(images.shape, (5, 20, 30))
+        self.assertEqual(len({image.tobytes() for image in images}), 5)
+
+    def test_get_images_times_out(self):
+        ioc = self.simulate()
+        ioc.update_rate = 0.1
+        with self.assertRaises(TimeoutError):
+            self.screen.get_images(1, timeout=0.05)
+
+    def test_ring_buffer_skips_repeated_frames(self):
+        self.simulate()
+        frame = np.arange(600, dtype=np.uint16)
+        buffer = ImageRingBuffer(self.screen, n=2, dtype=np.uint16)
+        for timestamp in [1.0, 1.0, 2.0, 3.0]:
+            buffer._on_image(value=frame + int(timestamp), timestamp=timestamp)
+        self.assertTrue(buffer.wait(timeout=0))
+        np.testing.assert_array_equal(buffer.timestamps, [1.0, 2.0])
+        # frames are flipped like Screen.image
+        np.testing.assert_array_equal(
+            buffer.images[1], self.screen.flip_image((frame + 2).reshape(20, 30))
+        )
+        # the same pulse ID arriving again is a duplicate too
+        buffer = ImageRingBuffer(self.screen, n=2, dedupe="pulse_id")
+        buffer._on_image(value=frame, timestamp=1.0, nanoseconds=(1 << 17) + 7)
+        buffer._on_image(value=frame, timestamp=2.0, nanoseconds=(2 << 17) + 7)
+        self.assertEqual(buffer.count, 1)
+        self.assertEqual(buffer.pulse_ids[0], 7)
+
+    def test_overlapping_buffers_restore_auto_monitor(self):
+        self.simulate()
+        # not connected yet, so pyepics has not decided on a monitor
+        pv = MagicMock(auto_monitor=None, timestamp=None)
+        first = ImageRingBuffer(self.screen, n=1)
+        second = ImageRingBuffer(self.screen, n=1)
+        first._pv = second._pv = pv
+        with first:
+            self.assertIs(pv.auto_monitor, True)
+            with second:
+                pass
+            self.assertIs(pv.auto_monitor, True)
+        self.assertIsNone(pv.auto_monitor)
+        with second:
+            first.__enter__()
+        # the first buffer is still running
+        self.assertIs(pv.auto_monitor, True)
+        first.__exit__(None, None, None)
+        self.assertIsNone(pv.auto_monitor)
+
+    def test_image_reads_only_the_waveform(self):
+        ioc = self.simulate()
+        self.assertEqual(self.screen.image.shape, (20, 30))
+        gets = ioc.gets
+        self.screen.image
+        self.assertEqual(ioc.gets - gets, 1)
+
+    def test_camera_geometry_follows_monitors(self):
+        ioc = self.simulate()
+        pvs = self.screen.controls_information.PVs
+        self.assertEqual(self.screen.camera_geometry.n_columns, 20)
+        ioc.set(pvs.n_col.pvname, 10)
+        ioc.set(pvs.n_row.pvname, 60)
+        ioc.set(pvs.resolution.pvname, 5.0)
+        self.assertEqual(self.screen.image.shape, (10, 60))
+        self.assertEqual(self.screen.resolution, 5.0)
+
+    def test_camera_geometry_monitors_are_removed(self):
+        self.simulate()
+        pvs = self.screen.controls_information.PVs
+        self.screen.camera_geometry
+        self.assertEqual(len(pvs.n_col.callbacks), 1)
+        self.screen.stop_camera_geometry_monitors()
+        self.assertEqual(pvs.n_col.callbacks, {})
+        # the monitors do not keep a screen alive, and go with it
+        self.screen.camera_geometry
+        screen = weakref.ref(self.screen)
+        del self.screen
+        gc.collect()
+        self.assertIsNone(screen())
+        self.assertEqual(pvs.n_col.callbacks, {})
+        self.assertEqual(pvs.resolution.callbacks, {})
+
+    def test_new_orientation_reads_orientation_pvs(self):
+        ioc = self.simulate()
+        pvs = self.screen.controls_information.PVs
+        # BC1.yaml caches OTR11 as Negative in both planes
+        self.assertEqual(self.screen.orient_x, "Negative")
+        self.screen.new_orientation = True
+        self.assertEqual(self.screen.orient_x, "Positive")
+        ioc.set(pvs.orient_y.pvname, 1)
+        self.assertEqual(self.screen.orient_y, "Negative")
+
+    def test_save_images_streams_through_few_slots(self):
+        self.simulate()
+        with patch.object(Screen, "IMAGE_STREAM_SLOTS", 2):
+            self.screen.save_images(
+                num_to_capture=20, threaded=False, compression="lzf"
+            )
+        with h5py.File(self.screen.last_save_filepath, "r") as f:
+            self.assertEqual(f["images"].shape, (20, 20, 30))
+            self.assertEqual(f["images"].compression, "lzf")
+            self.assertEqual(len({image.tobytes() for image in f["images"]}), 20)
+
+    def test_save_images_records_skipped_frames(self):
+        self.simulate()
+        stream = ImageRingBuffer.stream
+
+        def lossy_stream(buffer, timeout):
+            buffer.skipped = 3
+            yield from stream(buffer, timeout)
+
+        with patch.object(ImageRingBuffer, "stream", lossy_stream):
+            self.screen.save_images(num_to_capture=5, threaded=False)
+        with h5py.File(self.screen.last_save_filepath, "r") as f:
+            self.assertEqual(f["images"].shape, (5, 20, 30))
+            self.assertEqual(f["images"].attrs["skipped"], 3)
+
+    def test_hdf5_writer_grows_and_trims(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "images.h5")
+            images = np.arange(5 * 4 * 3).reshape(5, 4, 3)
+            with ImageHDF5Writer(
+                filename, shape=(4, 3), attrs={"name": "OTR11"}, grow_by=2
+            ) as writer:
+                for i, image in enumerate(images):
+                    writer.append(image, timestamp=float(i), pulse_id=i)
+                writer.skipped = 2
+            with h5py.File(filename, "r") as f:
+                np.testing.assert_array_equal(f["images"], images)
+                np.testing.assert_array_equal(f["timestamps"], np.arange(5.0))
+                np.testing.assert_array_equal(f["pulse_ids"], np.arange(5))
+                self.assertEqual(f["images"].chunks, (1, 4, 3))
+                self.assertEqual(f["images"].attrs["name"], "OTR11")
+                self.assertEqual(f["images"].attrs["skipped"], 2)
+        with self.assertRaises(ValueError):
+            ImageHDF5Writer(filename, shape=(4, 3), compression="zstd")
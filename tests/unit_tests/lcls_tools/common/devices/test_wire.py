@@ -7,10 +7,12 @@ import inspect
 # Local imports
 from lcls_tools.common.devices.reader import create_wire
 from lcls_tools.common.devices.wire import WireMetadata
+from tests.unit_tests.lcls_tools.common.devices import use_temporary_cache
 
 
 class WireTest(TestCase):
     def setUp(self) -> None:
+        use_temporary_cache(self)
         # 1) Patch PV ctrlvars before wire construction
         self.ctrl_options_patch = patch("epics.PV.get_ctrlvars", new_callable=Mock)
         self.mock_ctrl_options = self.ctrl_options_patch.start()
@@ -15,10 +15,12 @@ from lcls_tools.common.measurements.screen_profile import (
     ScreenBeamProfileMeasurement,
     ScreenBeamProfileMeasurementResult,
 )
+from tests.unit_tests.lcls_tools.common.devices import use_temporary_cache
 
 
 class EmittanceMeasurementTest(TestCase):
     def setUp(self) -> None:
+        use_temporary_cache(self)
         self.options = [
             "TRIM",
             "PERTURB",
@@ -20,6 +20,9 @@ class TestScreenBeamProfileMeasurement(unittest.TestCase):
             return image
 
         type(self.screen).image = property(mock_get_image)
+        self.screen.get_images.side_effect = lambda n: np.stack(
+            [mock_get_image() for _ in range(n)]
+        )
 
     def test_measure(self):
         measurement = ScreenBeamProfileMeasurement(beam_profile_device=self.screen)